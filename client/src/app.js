@@ -40,6 +40,7 @@ class SalesAgentClient {
     this.rtviClient = null;
     this.isSpeaking = false;
     this.authenticated = false;
+    this.sessionToken = null;
     this.selectedLlmType = "gemini";
     this.selectedModel = "gemini-2.0-flash";
     
@@ -189,12 +190,12 @@ class SalesAgentClient {
 
     // Add window beforeunload event to clean up any active calls
     window.addEventListener('beforeunload', () => {
-      // Notify server that call is ending
+      // Notify server that call is ending; /analyze only queues the job, so a
+      // beacon is enough and does not hold up the page unload.
       try {
-        const xhr = new XMLHttpRequest();
-        xhr.open('POST', '/analyze', false);
-        xhr.setRequestHeader('Content-Type', 'application/json');
-        xhr.send(JSON.stringify({}));
+        if (this.sessionToken) {
+          navigator.sendBeacon(`/analyze?session_token=${encodeURIComponent(this.sessionToken)}`);
+        }
       } catch (e) {
         console.error('Error in beforeunload:', e);
       }
@@ -208,6 +209,7 @@ class SalesAgentClient {
     this.authPanel.classList.remove('hidden');
     this.mainApp.classList.add('hidden');
     this.authenticated = false;
+    this.sessionToken = null;
   }
 
   /**
@@ -238,6 +240,8 @@ class SalesAgentClient {
       console.log('Login response status:', response.status);
       
       if (response.ok) {
+        const data = await response.json();
+        this.sessionToken = data.sessionToken;
         this.authenticated = true;
         this.showMainApp();
         this.log('Login successful');
@@ -307,6 +311,8 @@ class SalesAgentClient {
       console.log('Registration response status:', response.status);
       
       if (response.ok) {
+        const data = await response.json();
+        this.sessionToken = data.sessionToken;
         this.authenticated = true;
         this.showMainApp();
         this.log('Registration successful');
@@ -494,7 +500,7 @@ class SalesAgentClient {
           // Pass LLM params to the /connect endpoint RTVIClient will call
           baseUrl: window.location.origin, 
           endpoints: {
-            connect: `/connect?llm_type=${this.selectedLlmType}&model_name=${encodeURIComponent(this.selectedModel)}`,
+            connect: `/connect?llm_type=${this.selectedLlmType}&model_name=${encodeURIComponent(this.selectedModel)}&session_token=${encodeURIComponent(this.sessionToken)}`,
           }
         },
         enableMic: true,
@@ -629,12 +635,14 @@ class SalesAgentClient {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'X-Session-Token': this.sessionToken,
         },
-        body: JSON.stringify({}) // Empty object since server tracks everything internally
+        body: JSON.stringify({}) // Empty object since the session token identifies the call
       });
       
       if (response.ok) {
-        this.log('Call analysis completed');
+        const data = await response.json();
+        this.log(`Call analysis queued (job ${data.job_id})`);
       } else {
         this.log(`Error analyzing call: ${response.statusText}`);
       }
@@ -20,6 +20,10 @@ export default defineConfig({
                 target: 'http://0.0.0.0:7860',
                 changeOrigin: true,
             },
+            '/jobs': {
+                target: 'http://0.0.0.0:7860',
+                changeOrigin: true,
+            },
             '/join': {
                 target: 'http://0.0.0.0:7860',
                 changeOrigin: true,
@@ -1,9 +1,10 @@
 import os
 import sys
+import time
 import asyncio
 import argparse
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 from loguru import logger
 from dotenv import load_dotenv
@@ -11,11 +12,14 @@ from dotenv import load_dotenv
 from google import genai
 from google.genai import types
 
-from firestore_db import VoiceAgentDB
+from firestore_db import AsyncVoiceAgentDB
+from sqlite_db import AsyncSQLiteVoiceAgentDB
+from highlight_store import CallHighlightStore
+from stage_graph import StageGraph
 
 load_dotenv(dotenv_path=Path(__file__).parent.parent / '.env')
 
-logger.remove(0)
+logger.remove()
 logger.add(sys.stderr, level="INFO")
 
 INSTRUCTION_FILE = Path(__file__).parent.parent / "prompts" / "analyst_system_prompt.txt"
@@ -45,10 +49,17 @@ else:
         HIGHLIGHT_INSTRUCTION = f.read()
 
 client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
-db = VoiceAgentDB()
+db = AsyncVoiceAgentDB()
+sqlite_db = AsyncSQLiteVoiceAgentDB()
+highlight_store = CallHighlightStore()
 
 async def read_transcript(call_id: str) -> str:
     try:
+        transcript = await sqlite_db.get_call_transcript_text(call_id)
+        if transcript:
+            logger.info(f"Read transcript with {len(transcript.splitlines())} lines for call {call_id}")
+            return transcript
+
         transcript_file = Path(__file__).parent.parent / "logs" / f"{call_id}.txt"
         if not transcript_file.exists():
             logger.warning(f"Transcript file not found: {transcript_file}")
@@ -63,34 +74,37 @@ async def read_transcript(call_id: str) -> str:
         logger.error(f"Error reading transcript: {e}")
         return ""
 
+def format_previous_calls(calls: List[Dict[str, Any]]) -> str:
+    """Format calls (Firestore or SQLite history with transcripts) for the analysis prompt"""
+    previous_data = []
+    for call in calls:
+        transcript = call.get('transcript')
+        if not transcript:
+            continue
+        formatted_transcript = "\n".join([
+            f"[{entry.get('timestamp', entry.get('ts', ''))}] {entry.get('speaker', entry.get('role', ''))}: {entry.get('content', '')}"
+            for entry in transcript
+        ])
+        
+        call_date = call.get('startTime') or call.get('timestamp') or 'unknown date'
+        previous_data.append(f"--- PREVIOUS CALL ({call_date}) ---\n{formatted_transcript}\n\n")
+    
+    if previous_data:
+        return "\n\n=== PREVIOUS CALL HISTORY ===\n\n" + "\n".join(previous_data)
+    return ""
+
 async def get_previous_calls_data(client_id: str, max_calls: int = 3) -> str:
     try:
-        previous_calls = db.get_call_history(client_id, limit=max_calls)
+        previous_calls = await db.get_call_history_with_transcripts(client_id, limit=max_calls)
+        if not previous_calls:
+            # Firestore may be unreachable or behind; the local store has the same calls
+            previous_calls = await sqlite_db.get_call_history_with_transcripts(client_id, limit=max_calls)
         
         if not previous_calls:
             logger.info(f"No previous calls found for client {client_id}")
             return ""
         
-        previous_data = []
-        for call in previous_calls:
-            call_id = call.get('callId')
-            if not call_id:
-                continue
-                
-            transcript = db.get_call_transcript(call_id)
-            if not transcript:
-                continue
-            formatted_transcript = "\n".join([
-                f"[{entry.get('timestamp', '')}] {entry.get('speaker', '')}: {entry.get('content', '')}"
-                for entry in transcript
-            ])
-            
-            call_date = call.get('startTime', 'unknown date')
-            previous_data.append(f"--- PREVIOUS CALL ({call_date}) ---\n{formatted_transcript}\n\n")
-        
-        if previous_data:
-            return "\n\n=== PREVIOUS CALL HISTORY ===\n\n" + "\n".join(previous_data)
-        return ""
+        return format_previous_calls(previous_calls)
         
     except Exception as e:
         logger.error(f"Error fetching previous calls: {e}")
@@ -143,20 +157,13 @@ async def generate_call_highlight(transcript: str, client_id: str) -> str:
         logger.error(f"Error generating call highlights: {e}")
         return f"Error generating call highlights: {str(e)}"
 
-async def write_call_highlight(highlight: str, client_id: str) -> None:
-    """Write call highlights to a client-specific file"""
-    try:
-        # Ensure call_highlights directory exists
-        highlight_dir = Path(__file__).parent.parent / "call_highlights"
-        os.makedirs(highlight_dir, exist_ok=True)
-        
-        # Write to the client-specific highlight file
-        highlight_file = highlight_dir / f"{client_id}_highlights.txt"
-        with open(highlight_file, "w") as f:
-            f.write(highlight)
-        logger.info(f"Call highlights written to {highlight_file}")
-    except Exception as e:
-        logger.error(f"Error writing call highlights: {e}")
+async def write_call_highlight(highlight: str, client_id: str, call_id: str) -> None:
+    """Store the call highlight on the call's record in the highlight store"""
+    if not highlight or highlight == "No transcript data available for highlights." or highlight.startswith("Error generating"):
+        logger.warning(f"No call highlight to store for call {call_id}")
+        return
+    if await asyncio.to_thread(highlight_store.upsert, call_id, client_id, highlight=highlight):
+        logger.info(f"Call highlight stored for call {call_id}")
 
 async def read_previous_call_highlight(client_id: str) -> str:
     """Read previous call highlight for this client if it exists"""
@@ -230,42 +237,53 @@ async def write_analysis(analysis: str, client_id: str) -> None:
     except Exception as e:
         logger.error(f"Error writing analysis: {e}")
 
-async def main() -> None:
-    print("#"*30, "ANALYZER CALLED", "#"*30)
-    parser = argparse.ArgumentParser(description="Analyze conversation transcript")
-    parser.add_argument("--call_id", type=str, required=True, help="Call ID")
-    parser.add_argument("--client_id", type=str, required=True, help="Client ID")
-    
-    args = parser.parse_args()
-    
-    call_id = args.call_id
-    client_id = args.client_id
-    
+async def run_analysis(call_id: str, client_id: str) -> bool:
+    """Generate the call highlight and expert analysis for a finished call.
+
+    Returns False when there is no transcript to analyze.
+    """
     logger.info(f"Starting conversation analysis for call {call_id}, client {client_id}")
 
     # Get current transcript
     transcript = await read_transcript(call_id)
     if not transcript:
         logger.error(f"No transcript found for call {call_id}")
-        return
+        return False
     
-    # Get previous calls data
-    previous_data = await get_previous_calls_data(client_id)
-    
-    # Get previous expert suggestion if available
-    previous_suggestion = await read_previous_expert_suggestion(client_id)
-    
-    # Generate and save call highlights
-    highlight = await generate_call_highlight(transcript, client_id)
-    await write_call_highlight(highlight, client_id)
-    
-    # Analyze the conversation
-    analysis = await analyze_conversation(transcript, client_id, previous_data, previous_suggestion)
+    # The highlight only needs the transcript, so it runs alongside the
+    # history fetches; the analysis starts once all three of its inputs are in.
+    # The previous expert suggestion is read before write_analysis replaces it.
+    graph = StageGraph()
+    graph.add("previous_data", lambda: get_previous_calls_data(client_id))
+    graph.add("previous_suggestion", lambda: read_previous_expert_suggestion(client_id))
+    graph.add("highlight", lambda: generate_call_highlight(transcript, client_id))
+    graph.add("write_highlight", lambda highlight: write_call_highlight(highlight, client_id, call_id), "highlight")
+    graph.add(
+        "analysis",
+        lambda previous_data, previous_suggestion: analyze_conversation(
+            transcript, client_id, previous_data, previous_suggestion
+        ),
+        "previous_data", "previous_suggestion",
+    )
+    graph.add("write_analysis", lambda analysis: write_analysis(analysis, client_id), "analysis")
+
+    start = time.perf_counter()
+    await graph.run()
+    total = time.perf_counter() - start
+
+    stage_timings = ", ".join(f"{name}={elapsed:.2f}s" for name, elapsed in graph.timings.items())
+    logger.info(f"Conversation analysis completed in {total:.2f}s ({stage_timings})")
+    return True
+
+async def main() -> None:
+    print("#"*30, "ANALYZER CALLED", "#"*30)
+    parser = argparse.ArgumentParser(description="Analyze conversation transcript")
+    parser.add_argument("--call_id", type=str, required=True, help="Call ID")
+    parser.add_argument("--client_id", type=str, required=True, help="Client ID")
     
-    # Write the analysis to client-specific file
-    await write_analysis(analysis, client_id)
+    args = parser.parse_args()
     
-    logger.info("Conversation analysis completed")
+    await run_analysis(args.call_id, args.client_id)
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -6,12 +6,11 @@ from typing import List, Optional, Dict, Literal
 
 import argparse
 
-import aiohttp
 from dotenv import load_dotenv
 from loguru import logger
 
 from pipecat.audio.vad.silero import SileroVADAnalyzer
-from pipecat.frames.frames import TranscriptionMessage, TranscriptionUpdateFrame
+from pipecat.frames.frames import TranscriptionMessage, TranscriptionUpdateFrame, TTSSpeakFrame
 from pipecat.pipeline.pipeline import Pipeline
 from pipecat.pipeline.runner import PipelineRunner
 from pipecat.pipeline.task import PipelineParams, PipelineTask
@@ -24,7 +23,6 @@ from pipecat.adapters.schemas.function_schema import FunctionSchema
 from pipecat.utils.text.markdown_text_filter import MarkdownTextFilter
 
 from pipecat.transports.services.daily import DailyParams, DailyTransport
-from pipecat.services.deepgram.stt import DeepgramSTTService
 
 from pipecat.services.google.llm import GoogleLLMService
 from pipecat.services.google.rtvi import GoogleRTVIObserver
@@ -36,6 +34,23 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from runner import configure
 from interruption_observer import BotInterruptionObserver
+from latency_observer import LATENCY_TRACING_ENABLED, TurnLatencyObserver
+from transcript_sink import TRANSCRIPT_SQLITE_STREAMING, TranscriptSink
+from incremental_processor import INCREMENTAL_POST_CALL, IncrementalCallProcessor
+from greetings import initial_greeting_for, load_call_highlight
+from prompt_compiler import CompiledPrompt, PromptCompiler, PromptFragment
+from context_cache import ContextCacheRegistry, create_context_cache_provider
+from cached_google_llm import CachedPrefixGoogleLLMService
+from context_window import CONTEXT_WINDOW_ENABLED, RollingContextWindow
+from knowledge_index import load_or_build_index
+from tts_cache import (
+    CARTESIA_EMOTION, CARTESIA_MODEL, CARTESIA_SPEED, CARTESIA_VOICE_ID, TTS_CACHE_ENABLED, TTS_SAMPLE_RATE, TTSAudioCache
+)
+from cached_cartesia_tts import CachedCartesiaTTSService
+from preconnected_services import PreconnectedCartesiaTTSService, PreconnectedDeepgramSTTService
+from connection_warmup import CONNECTION_WARMUP_ENABLED, ConnectionWarmup
+from knowledge_retriever import KNOWLEDGE_MARKER, KNOWLEDGE_RETRIEVAL_ENABLED, KnowledgeRetriever
+from speculative_llm import SPECULATIVE_LLM_ENABLED, SpeculativeLLM
 
 load_dotenv(dotenv_path=Path(__file__).parent.parent / '.env')
 
@@ -48,26 +63,18 @@ CONVERSATION_STRATEGY_FILE = Path(__file__).parent.parent / "prompts" / "convers
 NEW_CLIENT_GREETING_FILE = Path(__file__).parent.parent / "prompts" / "new_client_greeting.txt"
 RETURNING_CLIENT_GREETING_FILE = Path(__file__).parent.parent / "prompts" / "returning_client_greeting.txt"
 
-if PERSONA_FILE.exists():
-    with open(PERSONA_FILE, "r") as f:
-        PERSONA = f.read()
-else:
-    PERSONA = ""
-    logger.warning(f"Persona file not found at {PERSONA_FILE}")
+# Persona, strategy and knowledge base are cached by the compiler and only
+# re-read when the files change.
+prompt_compiler = PromptCompiler()
 
-if KNOWLEDGE_BASE_FILE.exists():
-    with open(KNOWLEDGE_BASE_FILE, "r") as f:
-        KNOWLEDGE_BASE = f.read()
-else:
-    KNOWLEDGE_BASE = ""
-    logger.warning(f"Knowledge base file not found at {KNOWLEDGE_BASE_FILE}")
+for static_prompt_file in (PERSONA_FILE, KNOWLEDGE_BASE_FILE, CONVERSATION_STRATEGY_FILE):
+    if not static_prompt_file.exists():
+        logger.warning(f"Prompt file not found at {static_prompt_file}")
 
-if CONVERSATION_STRATEGY_FILE.exists():
-    with open(CONVERSATION_STRATEGY_FILE, "r") as f:
-        CONVERSATION_STRATEGY = f.read()
-else:
-    CONVERSATION_STRATEGY = ""
-    logger.warning(f"Conversation strategy file not found at {CONVERSATION_STRATEGY_FILE}")
+# With retrieval on, the knowledge base is served per turn from this index
+# instead of being inlined in the system prompt.
+KNOWLEDGE_INDEX = load_or_build_index(KNOWLEDGE_BASE_FILE) if KNOWLEDGE_RETRIEVAL_ENABLED else None
+KNOWLEDGE_RETRIEVAL_NOTE = f"\n\n# KNOWLEDGE BASE\nProduct and company facts relevant to the client's latest message are provided in a user message starting with \"{KNOWLEDGE_MARKER}\". Answer factual questions only from those excerpts and the information above; if they do not cover a question, say you will have the team follow up."
 
 if NEW_CLIENT_GREETING_FILE.exists():
     with open(NEW_CLIENT_GREETING_FILE, "r") as f:
@@ -84,51 +91,25 @@ else:
     logger.warning(f"Returning client greeting file not found at {RETURNING_CLIENT_GREETING_FILE}")
 
 EXPERT_SUGGESTION_DIR = Path(__file__).parent.parent / "expert_opinion"
-CALL_HIGHLIGHT_DIR = Path(__file__).parent.parent / "call_highlights"
 TRANSCRIPT_LOGDIR = Path(__file__).parent.parent / "logs"
 
-def load_call_highlight(client_id):
-    os.makedirs(CALL_HIGHLIGHT_DIR, exist_ok=True)
-    highlight_file = os.path.join(CALL_HIGHLIGHT_DIR, f"{client_id}_highlights.txt")
-    
-    if os.path.exists(highlight_file):
-        try:
-            with open(highlight_file, "r") as f:
-                highlight = f.read().strip()
-                if highlight:
-                    logger.info("Loaded previous call highlight")
-                    return highlight
-        except Exception as e:
-            logger.error(f"Error loading call highlight: {e}")
-    
-    logger.info("No previous call highlight found")
-    return ""
-
 def load_expert_suggestions(client_id):
-    os.makedirs(EXPERT_SUGGESTION_DIR, exist_ok=True)
     expert_suggestion_file = os.path.join(EXPERT_SUGGESTION_DIR, f"{client_id}_exp_opinion.txt")
     
-    if os.path.exists(expert_suggestion_file):
-        try:
-            with open(expert_suggestion_file, "r") as f:
-                expert_suggestions = f.read().strip()
-                if expert_suggestions:
-                    logger.info("Loaded expert suggestions")
-                    return expert_suggestions
-        except Exception as e:
-            logger.error(f"Error loading expert suggestions: {e}")
+    try:
+        fragment = prompt_compiler.file_fragment(
+            "expert_suggestions", expert_suggestion_file, header="\n\n# EXPERT SUGGESTIONS\n", strip=True
+        )
+        if fragment:
+            logger.info("Loaded expert suggestions")
+            return fragment
+    except Exception as e:
+        logger.error(f"Error loading expert suggestions: {e}")
     
     logger.info("No expert suggestions found")
-    return ""
+    return None
 
-def build_system_prompt(client_id, llm_type: str, client_name=None, is_returning_client=False, initial_greeting=None, client_info=None):
-    call_highlight = load_call_highlight(client_id)
-    expert_suggestion = load_expert_suggestions(client_id)
-    is_returning_client = is_returning_client or bool(call_highlight or expert_suggestion)
-    persona_content = PERSONA
-    prompt_parts = [persona_content]
-    
-    # Enhanced client information section
+def build_client_info_text(client_info=None, client_name=None):
     if client_info:
         client_info_text = f"\n\n# CLIENT INFORMATION\n"
         client_info_text += f"Client name: {client_info.get('first_name', '')} {client_info.get('last_name', '')}\n"
@@ -137,35 +118,91 @@ def build_system_prompt(client_id, llm_type: str, client_name=None, is_returning
         client_info_text += f"City: {client_info.get('city', '')}\n"
         client_info_text += f"Occupation: {client_info.get('job_business', '')}\n"
         client_info_text += f"Investor type: {client_info.get('investor_type', 'individual')}\n"
-        
-        prompt_parts.append(client_info_text)
+        return client_info_text
     elif client_name:
         # Fallback to just the name if we don't have detailed info
-        prompt_parts.append(f"\n\n# CLIENT INFORMATION\nClient name: {client_name}")
-    
-    if call_highlight:
-        prompt_parts.append("\n\n# PREVIOUS CALL HIGHLIGHT\n" + call_highlight)
+        return f"\n\n# CLIENT INFORMATION\nClient name: {client_name}"
+    return ""
+
+def compile_system_prompt(client_id, llm_type: str, client_name=None, is_returning_client=False, initial_greeting=None, client_info=None) -> CompiledPrompt:
+    call_highlight = load_call_highlight(client_id)
+    expert_suggestion = load_expert_suggestions(client_id)
+    is_returning_client = is_returning_client or bool(call_highlight or expert_suggestion)
     
-    if expert_suggestion:
-        prompt_parts.append("\n\n# EXPERT SUGGESTIONS\n" + expert_suggestion)
+    strategy = prompt_compiler.file_fragment("strategy", CONVERSATION_STRATEGY_FILE, header="\n\n# CONVERSATION STRATEGY\n")
+    if not strategy:
+        logger.warning(f"Conversation strategy file not found at {CONVERSATION_STRATEGY_FILE}, skipping.")
     
-    if CONVERSATION_STRATEGY:
-        prompt_parts.append("\n\n# CONVERSATION STRATEGY\n" + CONVERSATION_STRATEGY)
-    else:
-         logger.warning(f"Conversation strategy file not found at {CONVERSATION_STRATEGY_FILE}, skipping.")
-
-    if KNOWLEDGE_BASE:
-        prompt_parts.append("\n\n# KNOWLEDGE BASE\n" + KNOWLEDGE_BASE)
+    if KNOWLEDGE_INDEX:
+        knowledge_base = prompt_compiler.text_fragment("knowledge_base", KNOWLEDGE_RETRIEVAL_NOTE)
     else:
+        knowledge_base = prompt_compiler.file_fragment("knowledge_base", KNOWLEDGE_BASE_FILE, header="\n\n# KNOWLEDGE BASE\n")
+    if not knowledge_base:
         logger.warning(f"Knowledge base file not found at {KNOWLEDGE_BASE_FILE}, skipping.")
+    
+    greeting_text = ""
     if initial_greeting:
-        prompt_parts.append(f"\n\n# INITIAL GREETING - MANDATORY\nYou MUST use this EXACT greeting to start the conversation: \"{initial_greeting}\"\nDo not modify or rephrase this greeting in any way. Use it exactly as provided.\nYOUR FIRST RESPONSE MUST START WITH THIS EXACT GREETING.\n\nIMPORTANT FOR RETURNING CLIENTS: Always acknowledge you are calling them again and reference the previous conversation summary if provided.")
+        # The greeting is spoken directly by TTS and is already the first
+        # assistant message in the context; this only tells the model so.
+        greeting_text = f"\n\n# OPENING\nYou have already greeted the client with: \"{initial_greeting}\"\nDo not greet them again; continue the conversation from their reply.\n\nIMPORTANT FOR RETURNING CLIENTS: Always acknowledge you are calling them again and reference the previous conversation summary if provided."
     
-    final_prompt = "\n".join(prompt_parts)
-    return final_prompt
+    # Everything that is the same on every call goes first so providers can
+    # cache it as a prefix; per-client sections follow.
+    compiled = prompt_compiler.compile(
+        [
+            prompt_compiler.file_fragment("persona", PERSONA_FILE) or PromptFragment("persona", ""),
+            strategy,
+            knowledge_base,
+        ],
+        [
+            prompt_compiler.text_fragment("client_info", build_client_info_text(client_info, client_name)),
+            prompt_compiler.text_fragment("call_highlight", "\n\n# PREVIOUS CALL HIGHLIGHT\n" + call_highlight if call_highlight else ""),
+            expert_suggestion,
+            prompt_compiler.text_fragment("greeting", greeting_text),
+        ],
+    )
+    logger.info(f"System prompt: {compiled.report()}")
+    return compiled
+
+def build_system_prompt(client_id, llm_type: str, client_name=None, is_returning_client=False, initial_greeting=None, client_info=None):
+    return compile_system_prompt(client_id, llm_type, client_name, is_returning_client, initial_greeting, client_info).text
 
-def get_llm_service(llm_type: Literal["gemini", "groq"], model_name: str, system_prompt: str):
+_context_cache_registry = None
+
+def get_cached_prompt_model(model_name: str, compiled: CompiledPrompt):
+    """Return a Gemini model bound to a cached copy of the static prompt prefix, if available."""
+    global _context_cache_registry
+    try:
+        if _context_cache_registry is None:
+            provider = create_context_cache_provider()
+            if provider is None:
+                return None
+            _context_cache_registry = ContextCacheRegistry(provider)
+        # Below the provider's minimum (e.g. with knowledge retrieval on, which
+        # leaves only persona and strategy in the prefix) the full prompt is sent
+        handle = _context_cache_registry.get_or_create(
+            model_name, compiled.prefix_text, compiled.prefix_digest, compiled.prefix_tokens
+        )
+        if handle:
+            return _context_cache_registry.provider.model_for(handle)
+    except Exception as e:
+        logger.warning(f"Context cache unavailable, sending the full system prompt: {e}")
+    return None
+
+def get_llm_service(llm_type: Literal["gemini", "groq"], model_name: str, system_prompt: str,
+                    compiled_prompt: Optional[CompiledPrompt] = None, cached_model=None):
     if llm_type == "gemini":
+        if cached_model is not None and compiled_prompt is not None:
+            logger.info(f"Using cached static prompt prefix ({compiled_prompt.prefix_tokens} tokens)")
+            return CachedPrefixGoogleLLMService(
+                api_key=os.getenv("GOOGLE_API_KEY"),
+                model=model_name,
+                system_instruction=system_prompt,
+                cached_model=cached_model,
+                dynamic_suffix=compiled_prompt.suffix_text,
+                streaming=True,
+                tools=[],
+            )
         return GoogleLLMService(
             api_key=os.getenv("GOOGLE_API_KEY"),
             model=model_name,
@@ -184,26 +221,38 @@ def get_llm_service(llm_type: Literal["gemini", "groq"], model_name: str, system
         raise ValueError(f"Unsupported LLM type: {llm_type}")
 
 class TranscriptHandler:
-    def __init__(self, output_file: Optional[str]=None):
+    def __init__(self, sink: Optional[TranscriptSink]=None, incremental: Optional[IncrementalCallProcessor]=None):
         self.messages: List[TranscriptionMessage] = []
-        self.output_file: Optional[str] = output_file
+        self.sink: Optional[TranscriptSink] = sink
+        self.incremental: Optional[IncrementalCallProcessor] = incremental
         self.current_partial: Dict[str, str] = {}
         logger.debug(
-            f"TranscriptHandler initialized {'with output file=' + str(output_file) if output_file else 'with log output only'}"
+            f"TranscriptHandler initialized {'with output file=' + str(sink.text_path) if sink else 'with log output only'}"
         )
 
-    async def save_message(self, message: TranscriptionMessage):
+    async def save_message(self, message: TranscriptionMessage, interrupted: bool = False):
         timestamp = f"[{message.timestamp}] " if message.timestamp else ""
-        line = f"{timestamp}{message.role}: {message.content}"
+        marker = " [interrupted]" if interrupted else ""
+        line = f"{timestamp}{message.role}: {message.content}{marker}"
 
         logger.info(f"Transcript: {line}")
 
-        if self.output_file:
-            try:
-                with open(self.output_file, "a", encoding="utf-8") as f:
-                    f.write(line + '\n')
-            except Exception as e:
-                logger.error(f"Error saving transcript message to file: {e}")
+        if self.sink:
+            await self.sink.write(message.role, message.content, message.timestamp, interrupted)
+
+        if self.incremental:
+            self.incremental.add({
+                "role": message.role,
+                "ts": message.timestamp,
+                "content": message.content,
+                "interrupted": interrupted,
+            })
+
+    async def close(self):
+        if self.sink:
+            await self.sink.close()
+        if self.incremental:
+            await self.incremental.close()
 
     async def on_transcript_update(
         self, processor: TranscriptProcessor, frame: TranscriptionUpdateFrame
@@ -223,20 +272,68 @@ class TranscriptHandler:
 
         interrupted_msg = TranscriptionMessage(
             role='assistant',
-            content=f"{partial_text} [interrupted]",
+            content=partial_text,
             timestamp=timestamp,
             final=True
         )
 
         self.messages.append(interrupted_msg)
-        await self.save_message(interrupted_msg)
+        await self.save_message(interrupted_msg, interrupted=True)
 
         logger.info(f"Bot interrupted with partial text: {partial_text}")
         self.current_partial.pop('assistant', None)
 
+_tts_audio_cache = None
+
+def get_tts_audio_cache() -> TTSAudioCache:
+    """The process-wide TTS audio cache, shared by every call a pooled worker runs."""
+    global _tts_audio_cache
+    if _tts_audio_cache is None:
+        _tts_audio_cache = TTSAudioCache()
+    return _tts_audio_cache
+
+def create_stt_service() -> PreconnectedDeepgramSTTService:
+    return PreconnectedDeepgramSTTService(api_key=os.getenv("DEEPGRAM_API_KEY"))
+
+def create_tts_service() -> PreconnectedCartesiaTTSService:
+    tts_params = dict(
+        api_key=os.getenv("CARTESIA_API_KEY"),
+        voice_id=CARTESIA_VOICE_ID, 
+        model=CARTESIA_MODEL,
+        sample_rate=TTS_SAMPLE_RATE,
+        params=CartesiaTTSService.InputParams(
+            language=Language.EN,          
+            speed=CARTESIA_SPEED,                
+            emotion=CARTESIA_EMOTION                     
+        ),
+    )
+    if TTS_CACHE_ENABLED:
+        return CachedCartesiaTTSService(audio_cache=get_tts_audio_cache(), **tts_params)
+    return PreconnectedCartesiaTTSService(**tts_params)
+
+def create_connection_warmup() -> ConnectionWarmup:
+    """STT and TTS for one call, already connecting unless warm-up is disabled."""
+    warmup = ConnectionWarmup(create_stt_service(), create_tts_service())
+    if CONNECTION_WARMUP_ENABLED:
+        warmup.start()
+    return warmup
+
 async def main(call_id, client_id, llm_type="gemini", model_name="gemini-2.0-flash", 
-               client_name=None, returning_client=False, previous_summary=""):
-    """Main entry point for the bot."""
+               client_name=None, returning_client=False, previous_summary="",
+               room_url=None, token=None, vad_analyzer=None, client_info=None, warmup=None):
+    """Main entry point for the bot.
+
+    Pooled workers pass the room URL and bot token they were assigned along with
+    a pre-loaded VAD analyzer; the standalone CLI path leaves them unset and falls
+    back to ``configure`` and a fresh ``SileroVADAnalyzer``. The server also
+    hands over the client profile it already resolved; without one it is read
+    from the database. Pooled workers also pass the ``ConnectionWarmup`` that
+    has been holding their STT and TTS connections open; otherwise they start
+    connecting here, while the call is set up and the room joined.
+    """
+    warmup = warmup or create_connection_warmup()
+    warmup.begin_call(call_id)
+
     # Import needed at function level to avoid circular imports
     import sys
     sys.path.append(str(Path(__file__).parent))
@@ -245,49 +342,26 @@ async def main(call_id, client_id, llm_type="gemini", model_name="gemini-2.0-fla
     # Initialize database connection
     sqlite_db = SQLiteVoiceAgentDB()
     
-    # Get complete client information from database
-    client_info = sqlite_db.get_customer_by_id(client_id)
+    # Get complete client information from database unless the server passed it
+    if client_info is None:
+        client_info = sqlite_db.get_customer_by_id(client_id)
     
-    initial_greeting = ""
-    first_name = None
-    
-    # If we have client info, get first name from there
     if client_info:
-        first_name = client_info.get('first_name')
         logger.info(f"Retrieved client info from database: {client_info.get('first_name')} {client_info.get('last_name')}")
-    # Otherwise use the passed client_name parameter
-    elif client_name and client_name.strip():
-        name_parts = client_name.strip().split()
-        if name_parts:
-            first_name = name_parts[0]
-
-    if returning_client and not previous_summary:
-        call_highlight = load_call_highlight(client_id)
-        if call_highlight:
-            highlight_lines = call_highlight.split('\n')
-            for line in highlight_lines:
-                if line.strip() and not line.startswith('#'):
-                    previous_summary = line.strip()[:100]
-                    logger.info(f"Using extracted call highlight as summary: {previous_summary}")
-                    break
-    
-    if returning_client:
-        greeting_start = f"Hi {first_name}," if first_name else "Hi there,"
-        if previous_summary:
-            summary_snippet = previous_summary[:80] + ("..." if len(previous_summary) > 80 else "")
-            initial_greeting = f"{greeting_start} it's Neha from Mosaic Asset Management. Last time we spoke about: {summary_snippet}. How have you been?"
-        else:
-            initial_greeting = f"{greeting_start} it's Neha from Mosaic Asset Management calling you back. I hope things have been going well since we last spoke. How have you been?"
-            logger.warning("No previous summary found for returning client, using generic returning client greeting")
-    else:
-        greeting_start = f"Hello {first_name}," if first_name else "Hello,"
-        initial_greeting = f"{greeting_start} I'm Neha from Mosaic Asset Management, and I'm excited to connect with you today to discuss our exclusive alternate investment solutions. Is this a good time?"
+
+    initial_greeting, previous_summary = initial_greeting_for(
+        client_id, client_info, client_name, returning_client, previous_summary, load_highlight=load_call_highlight
+    )
     
-    system_prompt = build_system_prompt(client_id, llm_type, client_name, returning_client, initial_greeting, client_info)
+    compiled_prompt = compile_system_prompt(client_id, llm_type, client_name, returning_client, initial_greeting, client_info)
+    system_prompt = compiled_prompt.text
+    cached_model = None
+    if llm_type == "gemini":
+        cached_model = await asyncio.to_thread(get_cached_prompt_model, model_name, compiled_prompt)
     
-    transcript_logfile = os.path.join(TRANSCRIPT_LOGDIR, f"{call_id}.txt")
-    async with aiohttp.ClientSession() as session:
-        room_url, token = await configure(session)
+    # Pooled workers are handed a room and token; configure only calls Daily
+    # when running from the CLI without a token
+    room_url, token = await configure(room_url=room_url, token=token)
     
     logger.info(f"Room URL from configure: {room_url}")
     logger.info(f"Token obtained: {bool(token)}")
@@ -297,13 +371,16 @@ async def main(call_id, client_id, llm_type="gemini", model_name="gemini-2.0-fla
     logger.info(f"Previous summary: {previous_summary}")
     logger.info(f"Initial greeting: {initial_greeting}")
     
-    try:
-        if os.path.exists(transcript_logfile):
-            with open(transcript_logfile, "w") as f:
-                f.write("")
-            logger.info(f"Cleared previous transcript file: {transcript_logfile}")
-    except Exception as e:
-        logger.error(f"Failed to clear transcript file: {e}")
+    # Opening the sink truncates any transcript left over from a previous run
+    transcript_sink = TranscriptSink(
+        call_id, TRANSCRIPT_LOGDIR, sqlite_db=sqlite_db if TRANSCRIPT_SQLITE_STREAMING else None
+    )
+    await transcript_sink.open()
+
+    incremental = None
+    if INCREMENTAL_POST_CALL:
+        # The transcript reaches Firestore through the SQLite outbox
+        incremental = IncrementalCallProcessor(call_id, sqlite_db)
 
     transport = DailyTransport(
         room_url,
@@ -312,30 +389,18 @@ async def main(call_id, client_id, llm_type="gemini", model_name="gemini-2.0-fla
         DailyParams(
             audio_out_enabled=True,
             vad_enabled=True,  
-            vad_analyzer=SileroVADAnalyzer(),
+            vad_analyzer=vad_analyzer or SileroVADAnalyzer(),
             vad_audio_passthrough=True,
         ),
     )
     
-    stt = DeepgramSTTService(api_key=os.getenv("DEEPGRAM_API_KEY"))
-
-    tts = CartesiaTTSService(
-        api_key=os.getenv("CARTESIA_API_KEY"),
-        voice_id="f8f5f1b2-f02d-4d8e-a40d-fd850a487b3d", 
-        model="sonic-2-2025-04-16",
-        params=CartesiaTTSService.InputParams(
-            language=Language.EN,          
-            speed=-0.3,                
-            emotion=["positivity", "curiosity"]                     
-        ),
-        output_format={
-            "container": "mp3",
-            "sample_rate": 24000
-        }
-    )
+    stt = warmup.stt
+    tts = warmup.tts
 
     is_returning_client = returning_client
-    llm = get_llm_service(llm_type, model_name, system_prompt)
+    llm = get_llm_service(llm_type, model_name, system_prompt, compiled_prompt, cached_model)
+    if CONNECTION_WARMUP_ENABLED:
+        warmup.warm_llm(llm)
 
     if llm_type == "groq":
         context = OpenAILLMContext([
@@ -353,8 +418,13 @@ async def main(call_id, client_id, llm_type="gemini", model_name="gemini-2.0-fla
     context_aggregator = llm.create_context_aggregator(context)
     rtvi = RTVIProcessor(config=RTVIConfig(config=[]))
     transcript = TranscriptProcessor()
-    transcript_handler = TranscriptHandler(output_file=transcript_logfile)
+    transcript_handler = TranscriptHandler(sink=transcript_sink, incremental=incremental)
     interrupt_observer = BotInterruptionObserver(transcript_handler)
+    latency_observer = TurnLatencyObserver(call_id, sqlite_db) if LATENCY_TRACING_ENABLED else None
+    knowledge_retriever = KnowledgeRetriever(KNOWLEDGE_INDEX) if KNOWLEDGE_INDEX else None
+    speculative = None
+    if SPECULATIVE_LLM_ENABLED:
+        speculative = SpeculativeLLM(llm, context, context_hooks=[knowledge_retriever.inject] if knowledge_retriever else [])
 
     pipeline = Pipeline(
         [
@@ -362,7 +432,11 @@ async def main(call_id, client_id, llm_type="gemini", model_name="gemini-2.0-fla
             stt,
             rtvi,
             transcript.user(),
+            *([speculative.listener()] if speculative else []),
             context_aggregator.user(),
+            *([RollingContextWindow(ephemeral_markers=(KNOWLEDGE_MARKER,))] if CONTEXT_WINDOW_ENABLED else []),
+            *([knowledge_retriever] if knowledge_retriever else []),
+            *([speculative.gate()] if speculative else []),
             llm,
             tts,
             transport.output(),
@@ -376,7 +450,7 @@ async def main(call_id, client_id, llm_type="gemini", model_name="gemini-2.0-fla
         params=PipelineParams(
             allow_interruptions=True
         ), 
-        observers=[GoogleRTVIObserver(rtvi), interrupt_observer]
+        observers=[GoogleRTVIObserver(rtvi), interrupt_observer, warmup, *([latency_observer] if latency_observer else [])]
     )
 
     @rtvi.event_handler("on_client_ready")
@@ -384,28 +458,24 @@ async def main(call_id, client_id, llm_type="gemini", model_name="gemini-2.0-fla
         logger.info("RTVI client ready, setting bot ready")
         await rtvi.set_bot_ready()
         
-        logger.info(f"Using initial greeting: {initial_greeting}")
-        initial_context = context_aggregator.user().get_context_frame()
-        is_returning = "returning" if returning_client else "new"
-        instruction = f"""MANDATORY INSTRUCTION: BEGIN YOUR FIRST RESPONSE WITH THIS EXACT GREETING WITHOUT ANY MODIFICATION:
-
-"{initial_greeting}"
-
-This is a {is_returning} client outbound call. YOU MUST USE THE EXACT GREETING ABOVE as your first words.
-"""
-        
-        initial_context.content = instruction
-        
-        await task.queue_frames([initial_context])
+        logger.info(f"Speaking initial greeting: {initial_greeting}")
+        # Straight to TTS: the greeting is fixed, so there is nothing for the
+        # LLM to add but latency. The assistant aggregator only records LLM
+        # output, so the greeting is added to the context here.
+        context.add_messages([{"role": "assistant", "content": initial_greeting}])
+        await task.queue_frames([TTSSpeakFrame(initial_greeting)])
 
     @transport.event_handler("on_first_participant_joined")
     async def on_first_participant_joined(transport, participant):
         logger.info(f"First participant joined: {participant['id']}")
+        warmup.participant_joined()
         await transport.capture_participant_transcription(participant["id"])
         logger.info("Starting transcription capture")
 
     @transcript.event_handler("on_transcript_update")
     async def on_transcript_update(processor, frame):
+        if any(message.role == "user" for message in frame.messages):
+            warmup.first_user_turn()
         await transcript_handler.on_transcript_update(processor, frame)
 
     @transport.event_handler("on_participant_left")
@@ -415,7 +485,19 @@ This is a {is_returning} client outbound call. YOU MUST USE THE EXACT GREETING A
     
     
     runner = PipelineRunner()
-    await runner.run(task)
+    try:
+        await runner.run(task)
+    finally:
+        try:
+            await transcript_handler.close()
+        finally:
+            # Post-call processing waits for this, so it sees the last utterances
+            await asyncio.to_thread(sqlite_db.mark_transcript_closed, call_id)
+        await warmup.close()
+        if latency_observer:
+            await latency_observer.close()
+        if speculative:
+            speculative.close()
     
 
 if __name__ == "__main__":
@@ -0,0 +1,268 @@
+import os
+import sys
+import json
+import asyncio
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from loguru import logger
+
+BOT_POOL_MIN_SIZE = int(os.getenv("BOT_POOL_MIN_SIZE", "2"))
+BOT_POOL_MAX_SIZE = int(os.getenv("BOT_POOL_MAX_SIZE", "8"))
+BOT_POOL_ASSIGN_TIMEOUT = float(os.getenv("BOT_POOL_ASSIGN_TIMEOUT", "30"))
+BOT_POOL_SOCKET = os.getenv(
+    "BOT_POOL_SOCKET", os.path.join(tempfile.gettempdir(), f"vbot-pool-{os.getpid()}.sock")
+)
+# Workers that die during warm-up are respawned after an exponential backoff
+BOT_POOL_RESPAWN_BACKOFF_BASE = float(os.getenv("BOT_POOL_RESPAWN_BACKOFF_BASE", "1"))
+BOT_POOL_RESPAWN_BACKOFF_MAX = float(os.getenv("BOT_POOL_RESPAWN_BACKOFF_MAX", "60"))
+# After this many warm-up failures in a row the pool stops respawning in the
+# background and reports itself unhealthy; calls still start a worker on demand
+BOT_POOL_MAX_STARTUP_FAILURES = int(os.getenv("BOT_POOL_MAX_STARTUP_FAILURES", "5"))
+
+
+class BotWorkerPoolExhausted(Exception):
+    """Raised when no bot worker became available before the assignment timeout."""
+
+
+class _BotWorker:
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.state = "starting"
+        self.assignment: Optional[Dict[str, Any]] = None
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None and self.writer is not None and not self.writer.is_closing()
+
+
+class BotWorkerPool:
+    """
+    Pool of pre-warmed bot worker processes.
+
+    Workers are started with ``python -m bot_worker`` so the pipecat/Deepgram/
+    Cartesia/Google imports, prompt files and Silero VAD model are already loaded
+    when a call comes in. Each worker connects back to the pool over a local Unix
+    socket, receives a single call assignment as a JSON line and exits when the
+    call ends; the pool then tops itself back up to ``min_size`` idle workers.
+
+    A worker that exits before it is ready is replaced after a backoff that
+    doubles with every consecutive warm-up failure, up to
+    ``respawn_backoff_max``. After ``max_startup_failures`` in a row the pool
+    stops respawning in the background and ``healthy`` turns False until a
+    worker (started on demand by ``assign``) becomes ready again.
+
+    When a worker that was on a call exits, ``on_call_ended`` is called with
+    the call's assignment, so the server can release what the call held.
+    """
+
+    def __init__(self, min_size: int = BOT_POOL_MIN_SIZE, max_size: int = BOT_POOL_MAX_SIZE,
+                 socket_path: str = BOT_POOL_SOCKET, assign_timeout: float = BOT_POOL_ASSIGN_TIMEOUT,
+                 respawn_backoff_base: float = BOT_POOL_RESPAWN_BACKOFF_BASE,
+                 respawn_backoff_max: float = BOT_POOL_RESPAWN_BACKOFF_MAX,
+                 max_startup_failures: int = BOT_POOL_MAX_STARTUP_FAILURES,
+                 on_call_ended: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.min_size = max(0, min_size)
+        self.max_size = max(self.min_size, max_size, 1)
+        self.socket_path = socket_path
+        self.assign_timeout = assign_timeout
+        self.respawn_backoff_base = respawn_backoff_base
+        self.respawn_backoff_max = respawn_backoff_max
+        self.max_startup_failures = max(1, max_startup_failures)
+        self.on_call_ended = on_call_ended
+        self._workers: Dict[int, _BotWorker] = {}
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._watch_tasks = set()
+        # A worker is only counted once its process exists, so spawning is
+        # serialised to keep concurrent top-ups from overshooting the limits
+        self._spawn_lock = asyncio.Lock()
+        self._stopping = False
+
+        # Workers that exited during warm-up since the last one became ready
+        self.startup_failures = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def size(self) -> int:
+        return len(self._workers)
+
+    @property
+    def healthy(self) -> bool:
+        return self.startup_failures < self.max_startup_failures
+
+    def _count(self, state: str) -> int:
+        return sum(1 for worker in self._workers.values() if worker.state == state)
+
+    async def start(self):
+        """Open the IPC socket and pre-spawn ``min_size`` workers."""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._on_worker_connected, path=self.socket_path)
+        logger.info(f"Bot worker pool listening on {self.socket_path} (min={self.min_size}, max={self.max_size})")
+        await self._replenish()
+
+    async def stop(self):
+        """Terminate all workers and close the IPC socket."""
+        self._stopping = True
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for worker in list(self._workers.values()):
+            if worker.process.returncode is None:
+                worker.process.terminate()
+        for worker in list(self._workers.values()):
+            try:
+                await asyncio.wait_for(worker.process.wait(), timeout=10)
+            except asyncio.TimeoutError:
+                worker.process.kill()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy,
+            "size": self.size,
+            "idle": self._count("idle"),
+            "busy": self._count("busy"),
+            "starting": self._count("starting"),
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "startup_failures": self.startup_failures,
+            "last_error": self.last_error,
+        }
+
+    async def assign(self, assignment: Dict[str, Any]) -> int:
+        """
+        Hand a call to an idle worker, spawning one if the pool has headroom.
+
+        Args:
+            assignment: Call parameters (call_id, client_id, llm_type, model_name,
+                room_url, token, ...) forwarded verbatim to ``bot.main``
+
+        Returns:
+            The PID of the worker that accepted the call
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.assign_timeout
+
+        while True:
+            await self._spawn_on_demand()
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise BotWorkerPoolExhausted("Timed out waiting for an idle bot worker")
+            try:
+                worker = await asyncio.wait_for(self._idle.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                raise BotWorkerPoolExhausted("Timed out waiting for an idle bot worker")
+
+            if not worker.alive or worker.state != "idle":
+                continue
+
+            try:
+                worker.writer.write(json.dumps(assignment).encode() + b"\n")
+                await worker.writer.drain()
+                ack = await asyncio.wait_for(worker.reader.readline(), timeout=5)
+                if not ack or json.loads(ack).get("type") != "assigned":
+                    raise ConnectionError("worker did not acknowledge assignment")
+            except Exception as e:
+                logger.error(f"Bot worker {worker.pid} failed to accept call: {e}")
+                worker.state = "failed"
+                if worker.process.returncode is None:
+                    worker.process.terminate()
+                continue
+
+            worker.state = "busy"
+            worker.assignment = assignment
+            worker.writer.close()
+            logger.info(f"Assigned call {assignment.get('call_id')} to bot worker {worker.pid}")
+            await self._replenish()
+            return worker.pid
+
+    async def _replenish(self):
+        if self._stopping:
+            return
+        async with self._spawn_lock:
+            while (self._count("idle") + self._count("starting") < self.min_size
+                   and self.size < self.max_size):
+                await self._spawn()
+
+    async def _spawn_on_demand(self):
+        async with self._spawn_lock:
+            if self._idle.empty() and self._count("starting") == 0 and self.size < self.max_size:
+                logger.warning("No pre-warmed bot worker available, starting one on demand")
+                await self._spawn()
+
+    async def _spawn(self):
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "bot_worker", "--socket", self.socket_path,
+            cwd=str(Path(__file__).parent),
+        )
+        worker = _BotWorker(process)
+        self._workers[process.pid] = worker
+        task = asyncio.create_task(self._watch(worker))
+        self._watch_tasks.add(task)
+        task.add_done_callback(self._watch_tasks.discard)
+        logger.info(f"Started bot worker {process.pid}")
+
+    async def _watch(self, worker: _BotWorker):
+        returncode = await worker.process.wait()
+        self._workers.pop(worker.pid, None)
+        logger.info(f"Bot worker {worker.pid} exited with code {returncode} (state: {worker.state})")
+        if worker.state == "busy" and worker.assignment is not None and self.on_call_ended is not None:
+            try:
+                self.on_call_ended(worker.assignment)
+            except Exception as e:
+                logger.error(f"Error handling the end of call {worker.assignment.get('call_id')}: {e}")
+        if self._stopping:
+            return
+        if worker.state == "starting":
+            # Crashed during warm-up; back off so a broken environment does not
+            # turn into a tight respawn loop.
+            self.startup_failures += 1
+            self.last_error = f"Bot worker {worker.pid} exited with code {returncode} during warm-up"
+            if not self.healthy:
+                logger.error(
+                    f"{self.startup_failures} bot workers in a row failed to start, "
+                    f"no longer respawning in the background: {self.last_error}"
+                )
+                return
+            delay = self._respawn_delay()
+            logger.warning(f"Bot worker failed to start ({self.startup_failures} in a row), respawning in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            if self._stopping:
+                return
+        await self._replenish()
+
+    def _respawn_delay(self) -> float:
+        return min(self.respawn_backoff_max, self.respawn_backoff_base * 2 ** (self.startup_failures - 1))
+
+    async def _on_worker_connected(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            line = await reader.readline()
+            message = json.loads(line) if line else {}
+        except Exception as e:
+            logger.error(f"Invalid handshake from bot worker: {e}")
+            writer.close()
+            return
+
+        worker = self._workers.get(message.get("pid"))
+        if message.get("type") != "ready" or worker is None:
+            logger.error(f"Unexpected handshake from bot worker: {message}")
+            writer.close()
+            return
+
+        worker.reader = reader
+        worker.writer = writer
+        worker.state = "idle"
+        self.startup_failures = 0
+        await self._idle.put(worker)
+        logger.info(f"Bot worker {worker.pid} is ready ({self._count('idle')} idle)")
@@ -0,0 +1,58 @@
+import os
+import json
+import asyncio
+import argparse
+
+from loguru import logger
+
+# Importing bot pulls in pipecat, the service SDKs and the prompt files, which
+# is the bulk of the cold start we want to pay before a call is assigned.
+import bot
+from pipecat.audio.vad.silero import SileroVADAnalyzer
+
+
+async def serve(socket_path: str):
+    """Warm up, announce readiness to the pool and run exactly one call."""
+    vad_analyzer = SileroVADAnalyzer()
+    # STT and TTS connect, and are kept alive, while the worker waits for a call
+    warmup = bot.create_connection_warmup()
+    logger.info(f"Bot worker {os.getpid()} warmed up, connecting to pool at {socket_path}")
+
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    writer.write(json.dumps({"type": "ready", "pid": os.getpid()}).encode() + b"\n")
+    await writer.drain()
+
+    line = await reader.readline()
+    if not line:
+        logger.info(f"Bot worker {os.getpid()} released by pool without a call")
+        await warmup.close()
+        return
+
+    assignment = json.loads(line)
+    logger.info(f"Bot worker {os.getpid()} assigned call {assignment.get('call_id')}")
+    writer.write(json.dumps({"type": "assigned", "call_id": assignment.get("call_id")}).encode() + b"\n")
+    await writer.drain()
+    writer.close()
+
+    await bot.main(
+        assignment["call_id"],
+        assignment["client_id"],
+        assignment.get("llm_type", "gemini"),
+        assignment.get("model_name", "gemini-2.0-flash"),
+        assignment.get("client_name"),
+        bool(assignment.get("returning_client")),
+        assignment.get("previous_summary", ""),
+        room_url=assignment["room_url"],
+        token=assignment["token"],
+        vad_analyzer=vad_analyzer,
+        warmup=warmup,
+        client_info=assignment.get("client_info"),
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-warmed BFSI Sales Agent bot worker")
+    parser.add_argument("--socket", required=True, help="Unix socket path of the bot worker pool")
+    args = parser.parse_args()
+
+    asyncio.run(serve(args.socket))
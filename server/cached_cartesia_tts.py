@@ -0,0 +1,167 @@
+import uuid
+import asyncio
+from typing import AsyncGenerator, Dict, List, Optional
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    Frame,
+    LLMFullResponseEndFrame,
+    StartInterruptionFrame,
+    TTSAudioRawFrame,
+    TTSStartedFrame,
+    TTSStoppedFrame,
+    TTSTextFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection
+
+from preconnected_services import PreconnectedCartesiaTTSService
+from tts_cache import (
+    TTS_CACHE_MAX_TEXT_CHARS,
+    TTS_CACHE_PROMOTE_AFTER,
+    TTSAudioCache,
+    synthesize_cartesia,
+    tts_cache_key,
+)
+
+
+class CachedCartesiaTTSService(PreconnectedCartesiaTTSService):
+    """
+    Cartesia TTS service that plays recurring utterances from a TTSAudioCache.
+
+    A cached sentence is played from its own audio context, with a single
+    TTSTextFrame in place of Cartesia's word timestamps. Cached audio is only
+    used until the first uncached sentence of a response opens a Cartesia
+    context; the rest of that response is synthesized live, so playback stays
+    in order.
+
+    The cache is filled two ways: a Cartesia context that carried a single
+    utterance (e.g. the greeting) is stored as it streams in, and a sentence
+    that keeps being synthesized as part of longer responses is fetched on its
+    own over REST once seen ``promote_after`` times.
+    """
+
+    def __init__(self, *, audio_cache: TTSAudioCache, promote_after: int = TTS_CACHE_PROMOTE_AFTER,
+                 max_text_chars: int = TTS_CACHE_MAX_TEXT_CHARS, **kwargs):
+        super().__init__(**kwargs)
+        self._audio_cache = audio_cache
+        self._promote_after = max(1, promote_after)
+        self._max_text_chars = max_text_chars
+        self._cached_context_id: Optional[str] = None
+        # Live Cartesia contexts: the text sent and the audio received so far
+        self._context_texts: Dict[str, List[str]] = {}
+        self._context_audio: Dict[str, bytearray] = {}
+        self._promotions = set()
+
+    def cache_key(self, text: str) -> str:
+        return tts_cache_key(
+            text,
+            self._voice_id,
+            self.model_name,
+            self._settings["speed"],
+            self._settings["emotion"],
+            self._settings["output_format"],
+            self._settings["language"],
+        )
+
+    def _cacheable(self, text: str) -> bool:
+        return bool(text.strip()) and len(text) <= self._max_text_chars
+
+    async def run_tts(self, text: str) -> AsyncGenerator[Frame, None]:
+        audio = None
+        # Once a live context is open, cached audio would play out of order
+        if not self._context_id and self._cacheable(text):
+            audio = await asyncio.to_thread(self._audio_cache.get, self.cache_key(text))
+
+        if audio is None:
+            await self._close_cached_context()
+            async for frame in super().run_tts(text):
+                yield frame
+            if self._context_id in self._context_texts:
+                self._context_texts[self._context_id].append(text)
+            if self._cacheable(text):
+                self._note_miss(text)
+            return
+
+        logger.debug(f"{self}: Playing cached TTS [{text}]")
+        if not self._cached_context_id:
+            yield TTSStartedFrame()
+            self._cached_context_id = str(uuid.uuid4())
+            await self.create_audio_context(self._cached_context_id)
+        await self.append_to_audio_context(self._cached_context_id, TTSTextFrame(text))
+        await self.append_to_audio_context(
+            self._cached_context_id, TTSAudioRawFrame(audio=audio, sample_rate=self.sample_rate, num_channels=1)
+        )
+        yield None
+
+    async def _close_cached_context(self, end_of_response: bool = False):
+        if not self._cached_context_id:
+            return
+        if end_of_response:
+            # What a finished Cartesia context pushes through its word timestamps
+            await self.append_to_audio_context(self._cached_context_id, TTSStoppedFrame())
+            await self.append_to_audio_context(self._cached_context_id, LLMFullResponseEndFrame())
+        await self.remove_audio_context(self._cached_context_id)
+        self._cached_context_id = None
+
+    async def flush_audio(self):
+        await self._close_cached_context(end_of_response=True)
+        await super().flush_audio()
+
+    async def create_audio_context(self, context_id: str):
+        if context_id != self._cached_context_id:
+            # Registered before the text is sent, so no audio chunk is missed
+            self._context_texts[context_id] = []
+            self._context_audio[context_id] = bytearray()
+        await super().create_audio_context(context_id)
+
+    async def append_to_audio_context(self, context_id: str, frame: TTSAudioRawFrame):
+        captured = self._context_audio.get(context_id)
+        if captured is not None and isinstance(frame, TTSAudioRawFrame):
+            captured.extend(frame.audio)
+        await super().append_to_audio_context(context_id, frame)
+
+    async def remove_audio_context(self, context_id: str):
+        # Called when Cartesia reports the context done
+        texts = self._context_texts.pop(context_id, None)
+        audio = self._context_audio.pop(context_id, None)
+        if texts and len(texts) == 1 and audio and self._cacheable(texts[0]):
+            self.create_task(self._store(self.cache_key(texts[0]), bytes(audio)))
+        await super().remove_audio_context(context_id)
+
+    async def _store(self, key: str, audio: bytes):
+        try:
+            await asyncio.to_thread(self._audio_cache.put, key, audio)
+        except Exception as e:
+            logger.warning(f"{self}: Could not write TTS cache entry: {e}")
+
+    def _note_miss(self, text: str):
+        key = self.cache_key(text)
+        if self._audio_cache.note_miss(key) < self._promote_after or key in self._promotions:
+            return
+        self._promotions.add(key)
+        self.create_task(self._promote(key, text))
+
+    async def _promote(self, key: str, text: str):
+        try:
+            audio = await synthesize_cartesia(
+                text,
+                self._api_key,
+                voice_id=self._voice_id,
+                model=self.model_name,
+                speed=self._settings["speed"],
+                emotion=self._settings["emotion"],
+                output_format=self._settings["output_format"],
+                language=self._settings["language"],
+            )
+            await self._store(key, audio)
+            logger.debug(f"{self}: Cached recurring TTS [{text}]")
+        except Exception as e:
+            logger.warning(f"{self}: Could not cache recurring TTS [{text}]: {e}")
+
+    async def _handle_interruption(self, frame: StartInterruptionFrame, direction: FrameDirection):
+        # Cut-off contexts never complete, so nothing from them is stored
+        self._cached_context_id = None
+        self._context_texts.clear()
+        self._context_audio.clear()
+        await super()._handle_interruption(frame, direction)
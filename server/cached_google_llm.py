@@ -0,0 +1,131 @@
+import google.ai.generativelanguage as glm
+import google.generativeai as gai
+from loguru import logger
+
+from pipecat.services.google.llm import GoogleLLMService
+
+# Gemini rejects requests that set a system_instruction (or tools / tool_config)
+# alongside cached content, so the per-call part of the prompt goes in as an
+# opening exchange that the model is told to treat as instructions.
+DYNAMIC_SUFFIX_HEADER = (
+    "Call-specific instructions. Treat them as part of your system instructions; "
+    "they are not said by the caller.\n\n"
+)
+DYNAMIC_SUFFIX_ACK = "Understood."
+
+
+def _chunk_text(chunk) -> str:
+    try:
+        return "".join(part.text for part in chunk.parts if part.text)
+    except Exception:
+        return ""
+
+
+class _FallbackStream:
+    """
+    Streamed response from the cached model that falls back mid-stream.
+
+    If iterating the cached response fails before anything was produced, the
+    same request is sent to the uncached model and its stream served instead.
+    If it fails part way through, the text already streamed is sent along as
+    the model's partial reply, so the uncached model continues the answer
+    instead of starting it over.
+    """
+
+    def __init__(self, service: "CachedPrefixGoogleLLMService", response, contents, kwargs):
+        self._service = service
+        self._response = response
+        self._contents = contents
+        self._kwargs = kwargs
+
+    @property
+    def usage_metadata(self):
+        return self._response.usage_metadata
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        streamed = ""
+        try:
+            async for chunk in self._response:
+                streamed += _chunk_text(chunk)
+                yield chunk
+            return
+        except Exception as e:
+            logger.warning(
+                f"Cached prompt stream failed after {len(streamed)} characters, "
+                f"falling back to the full system instruction: {e}"
+            )
+
+        contents = list(self._contents)
+        if streamed:
+            contents.append(glm.Content(role="model", parts=[glm.Part(text=streamed)]))
+        self._response = await self._service.disable_context_cache().generate_content_async(
+            contents=contents, **self._kwargs
+        )
+        async for chunk in self._response:
+            yield chunk
+
+
+class _PrefixedCachedModel:
+    """
+    GenerativeModel stand-in that serves requests from a cached static prefix.
+
+    The cached content holds the static system prompt. The per-call part
+    cannot be sent as a system instruction next to it, so every request
+    starts with a user turn carrying it under ``DYNAMIC_SUFFIX_HEADER`` and a
+    short model acknowledgement, keeping it apart from what the caller says.
+    If the cached request fails (e.g. the cache was evicted), whether when it
+    is sent or while it streams, the service falls back to sending the full
+    system instruction for the rest of the call.
+    """
+
+    def __init__(self, service: "CachedPrefixGoogleLLMService", model, dynamic_suffix: str):
+        self._service = service
+        self._model = model
+        self._suffix_contents = [
+            glm.Content(role="user", parts=[glm.Part(text=DYNAMIC_SUFFIX_HEADER + dynamic_suffix)]),
+            glm.Content(role="model", parts=[glm.Part(text=DYNAMIC_SUFFIX_ACK)]),
+        ] if dynamic_suffix else []
+
+    async def generate_content_async(self, contents, **kwargs):
+        # Cached requests cannot carry tools or a tool config of their own
+        cached_kwargs = {k: v for k, v in kwargs.items() if k not in ("tools", "tool_config") or v}
+        prefixed = self._suffix_contents + list(contents)
+        try:
+            response = await self._model.generate_content_async(contents=prefixed, **cached_kwargs)
+        except Exception as e:
+            logger.warning(f"Cached prompt request failed, falling back to the full system instruction: {e}")
+            return await self._service.disable_context_cache().generate_content_async(contents=contents, **kwargs)
+        if not kwargs.get("stream"):
+            return response
+        return _FallbackStream(self._service, response, contents, kwargs)
+
+
+class CachedPrefixGoogleLLMService(GoogleLLMService):
+    """
+    GoogleLLMService that reuses a provider-side cache of the static prompt.
+
+    ``system_instruction`` is still the full prompt, so pipecat's "system
+    instruction changed" check keeps working; while it matches, requests go
+    through ``cached_model`` with only ``dynamic_suffix`` sent inline.
+    """
+
+    def __init__(self, *, system_instruction: str, cached_model=None, dynamic_suffix: str = "", **kwargs):
+        # _create_client runs inside the base constructor
+        self._cached_model = cached_model
+        self._cached_instruction = system_instruction
+        self._dynamic_suffix = dynamic_suffix
+        super().__init__(system_instruction=system_instruction, **kwargs)
+
+    def _create_client(self):
+        if self._cached_model is not None and self._system_instruction == self._cached_instruction:
+            self._client = _PrefixedCachedModel(self, self._cached_model, self._dynamic_suffix)
+        else:
+            super()._create_client()
+
+    def disable_context_cache(self) -> gai.GenerativeModel:
+        self._cached_model = None
+        super()._create_client()
+        return self._client
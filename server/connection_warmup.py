@@ -0,0 +1,208 @@
+import os
+import time
+import asyncio
+from typing import Any, Dict, Optional
+
+import google.generativeai as gai
+from loguru import logger
+
+from pipecat.frames.frames import StartFrame
+from pipecat.observers.base_observer import BaseObserver
+from pipecat.services.google.llm import GoogleLLMService
+
+from preconnected_services import PreconnectedCartesiaTTSService, PreconnectedDeepgramSTTService
+
+CONNECTION_WARMUP_ENABLED = os.getenv("CONNECTION_WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+# Under httpx's 5s idle expiry, so the OpenAI-compatible clients keep their connection
+WARMUP_KEEPALIVE_INTERVAL = float(os.getenv("WARMUP_KEEPALIVE_INTERVAL", "4"))
+# How long the LLM connection is kept warm waiting for the first user turn
+WARMUP_LLM_KEEPALIVE_SECONDS = float(os.getenv("WARMUP_LLM_KEEPALIVE_SECONDS", "120"))
+# How long a pooled worker keeps STT and TTS connected while waiting for a
+# call; they are closed after that and opened again once a call is assigned
+# (0 keeps them open until the call)
+WARMUP_MAX_IDLE_SECONDS = float(os.getenv("WARMUP_MAX_IDLE_SECONDS", "60"))
+# pipecat's default pipeline input rate, which the bot runs with
+WARMUP_STT_SAMPLE_RATE = 16000
+
+
+class ConnectionWarmup(BaseObserver):
+    """
+    Opens the STT, TTS and LLM connections of a call before the pipeline needs them.
+
+    Without it, the Deepgram and Cartesia websockets are opened one after the
+    other as the StartFrame reaches them, which only happens once the Daily
+    join has finished, and the first LLM request of the call pays for its own
+    TLS handshake. ``start`` pre-connects STT and TTS in the background, so
+    they are opened while the call is set up and the room joined; pooled
+    workers do it while waiting for a call. ``warm_llm`` sends a cheap
+    request through the LLM service's client and repeats it until the first
+    user turn, so the connection is still pooled when that turn arrives.
+    A worker that waits longer than ``max_idle`` seconds for its call closes
+    the STT and TTS connections instead of keeping them alive indefinitely,
+    and opens them again from ``begin_call``.
+
+    As an observer it times how long the StartFrame spent in each service
+    and logs that against the pre-connect times, with warm-up on or off, so
+    the setup time taken off the call shows up in the logs.
+    """
+
+    def __init__(self, stt: PreconnectedDeepgramSTTService, tts: PreconnectedCartesiaTTSService,
+                 call_id: Optional[str] = None, max_idle: float = WARMUP_MAX_IDLE_SECONDS):
+        self.stt = stt
+        self.tts = tts
+        self.call_id = call_id
+        self.max_idle = max_idle
+        self.call_started_at = time.monotonic()
+        self.timings: Dict[str, float] = {}
+        self._llm = None
+        self._llm_keepalive_until = 0.0
+        self._tasks = set()
+        self._keepalive_task: Optional[asyncio.Task] = None
+        self._start_frame_at: Dict[str, float] = {}
+        self._reported = False
+        self._sample_rate = WARMUP_STT_SAMPLE_RATE
+        self._preconnected_at: Optional[float] = None
+        self._awaiting_call = True
+        self._closed_idle = False
+
+    def start(self, sample_rate: int = WARMUP_STT_SAMPLE_RATE):
+        """Pre-connect STT and TTS in the background."""
+        self._sample_rate = sample_rate
+        self._preconnected_at = time.monotonic()
+        self._closed_idle = False
+        self._spawn(self._timed("stt", self.stt.preconnect(sample_rate)))
+        self._spawn(self._timed("tts", self.tts.preconnect()))
+        self._ensure_keepalive()
+
+    def warm_llm(self, llm):
+        """Open the LLM connection now and keep it pooled until the first user turn."""
+        self._llm = llm
+        self._llm_keepalive_until = time.monotonic() + WARMUP_LLM_KEEPALIVE_SECONDS
+        self._spawn(self._timed("llm", self._touch_llm()))
+        self._ensure_keepalive()
+
+    def begin_call(self, call_id: str):
+        """Time the report from here; a pooled worker warms up long before its call."""
+        self.call_id = call_id
+        self.call_started_at = time.monotonic()
+        self._awaiting_call = False
+        if self._closed_idle:
+            logger.info("Re-opening STT and TTS connections closed while waiting for the call")
+            self.start(self._sample_rate)
+
+    def first_user_turn(self):
+        self._llm_keepalive_until = 0.0
+
+    def participant_joined(self):
+        self.timings["participant_joined_ms"] = (time.monotonic() - self.call_started_at) * 1000
+        ready = [name for name in ("stt", "tts", "llm") if f"{name}_preconnect_ms" in self.timings]
+        logger.info(
+            f"Participant joined {self.timings['participant_joined_ms']:.0f}ms into the call, "
+            f"pre-connected: {', '.join(ready) or 'none'}"
+        )
+
+    async def close(self):
+        if self._keepalive_task:
+            self._keepalive_task.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._close_preconnections()
+
+    async def _close_preconnections(self):
+        # Only connections the pipeline never started are still ours to close
+        for service in (self.stt, self.tts):
+            try:
+                await service.close_preconnection()
+            except Exception as e:
+                logger.warning(f"Could not close pre-connected {service}: {e}")
+
+    def report(self) -> Dict[str, Any]:
+        report: Dict[str, Any] = {"call_id": self.call_id, "warmup_enabled": CONNECTION_WARMUP_ENABLED}
+        report.update({key: round(value, 1) for key, value in self.timings.items()})
+        saved = self.timings.get("llm_preconnect_ms", 0.0)
+        for name in ("stt", "tts"):
+            # A start that waited for a pre-connect in flight only saved the difference
+            preconnect = self.timings.get(f"{name}_preconnect_ms")
+            if preconnect is not None:
+                saved += max(0.0, preconnect - self.timings.get(f"{name}_start_ms", 0.0))
+        report["saved_ms"] = round(saved, 1)
+        return report
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _timed(self, name: str, coroutine):
+        started = time.monotonic()
+        try:
+            connected = await coroutine
+        except Exception as e:
+            logger.warning(f"Could not pre-connect {name}: {e}")
+            return
+        if connected is False:
+            logger.warning(f"Could not pre-connect {name}")
+            return
+        self.timings[f"{name}_preconnect_ms"] = (time.monotonic() - started) * 1000
+        logger.debug(f"Pre-connected {name} in {self.timings[f'{name}_preconnect_ms']:.0f}ms")
+
+    async def _touch_llm(self):
+        if isinstance(self._llm, GoogleLLMService):
+            # Every GenerativeModel shares the default async client, and its channel
+            await gai.GenerativeModel(self._llm.model_name).count_tokens_async("Hello")
+        else:
+            await self._llm._client.models.list()
+
+    def _ensure_keepalive(self):
+        if self._keepalive_task is None or self._keepalive_task.done():
+            self._keepalive_task = asyncio.create_task(self._keepalive())
+
+    def _idle_too_long(self) -> bool:
+        return (self._awaiting_call and self.max_idle > 0 and self._preconnected_at is not None
+                and time.monotonic() - self._preconnected_at >= self.max_idle)
+
+    async def _keepalive(self):
+        while not self.tts.started or time.monotonic() < self._llm_keepalive_until:
+            await asyncio.sleep(WARMUP_KEEPALIVE_INTERVAL)
+            if self._idle_too_long():
+                logger.info(f"No call after {self.max_idle:.0f}s, closing pre-connected STT and TTS")
+                # Let pre-connects still in flight finish so nothing is left open
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+                await self._close_preconnections()
+                if self._awaiting_call:
+                    self._closed_idle = True
+                    return
+                # The call was assigned while they were closing
+                self.start(self._sample_rate)
+                continue
+            try:
+                await self.tts.keep_alive()
+                if self._llm is not None and time.monotonic() < self._llm_keepalive_until:
+                    await self._touch_llm()
+            except Exception as e:
+                logger.warning(f"Connection keep-alive failed: {e}")
+
+    async def on_push_frame(self, src, dst, frame, direction, timestamp):
+        if not isinstance(frame, StartFrame) or self._reported:
+            return
+        now = time.monotonic()
+        for name, service in (("stt", self.stt), ("tts", self.tts)):
+            if dst is service:
+                self._start_frame_at[name] = now
+            elif src is service and name in self._start_frame_at:
+                self.timings[f"{name}_start_ms"] = (now - self._start_frame_at[name]) * 1000
+        if "stt" in self._start_frame_at and "pipeline_start_ms" not in self.timings:
+            # The StartFrame only reaches STT once the Daily join has finished
+            self.timings["pipeline_start_ms"] = (self._start_frame_at["stt"] - self.call_started_at) * 1000
+
+        if "tts_start_ms" in self.timings:
+            self._reported = True
+            report = self.report()
+            logger.info(
+                f"Pipeline started: STT took {report.get('stt_start_ms', 0):.0f}ms and TTS "
+                f"{report['tts_start_ms']:.0f}ms to start; pre-connected STT "
+                f"{report.get('stt_preconnect_ms', 0):.0f}ms, TTS {report.get('tts_preconnect_ms', 0):.0f}ms, "
+                f"LLM {report.get('llm_preconnect_ms', 0):.0f}ms; ~{report['saved_ms']:.0f}ms of setup saved "
+                f"({report.get('pipeline_start_ms', 0):.0f}ms into the call)"
+            )
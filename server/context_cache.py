@@ -0,0 +1,232 @@
+import os
+import abc
+import json
+import time
+import uuid
+import threading
+import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from tokens import estimate_tokens
+
+CONTEXT_CACHE_PROVIDER = os.getenv("CONTEXT_CACHE_PROVIDER", "gemini").lower()
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "3600"))
+# A handle is refreshed when less than this much lifetime is left, so it can
+# never expire in the middle of a call.
+CONTEXT_CACHE_REFRESH_MARGIN = int(os.getenv("CONTEXT_CACHE_REFRESH_MARGIN", "900"))
+# Gemini rejects cached contents below a minimum size
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "4096"))
+CONTEXT_CACHE_REGISTRY_FILE = Path(
+    os.getenv("CONTEXT_CACHE_REGISTRY_FILE", Path(__file__).parent.parent / "data" / "context_cache.json")
+)
+
+
+class ContextCacheProvider(abc.ABC):
+    """Interface to a provider-side cache of a model's static system prompt."""
+
+    name = "base"
+    min_tokens = CONTEXT_CACHE_MIN_TOKENS
+
+    @abc.abstractmethod
+    def create(self, model: str, system_instruction: str, ttl_seconds: int) -> str:
+        """Cache a system instruction for a model and return its handle."""
+
+    @abc.abstractmethod
+    def refresh(self, handle: str, ttl_seconds: int) -> None:
+        """Extend a handle's lifetime; raises if the handle no longer exists."""
+
+    @abc.abstractmethod
+    def delete(self, handle: str) -> None:
+        """Delete a handle; deleting one that no longer exists is not an error."""
+
+    @abc.abstractmethod
+    def model_for(self, handle: str):
+        """Return a generative model bound to the cached content."""
+
+
+class GeminiContextCacheProvider(ContextCacheProvider):
+    """Context caching through google.generativeai's CachedContent API."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None):
+        import google.generativeai as genai
+        from google.generativeai import caching
+
+        genai.configure(api_key=api_key or os.getenv("GOOGLE_API_KEY"))
+        self._genai = genai
+        self._caching = caching
+
+    def create(self, model: str, system_instruction: str, ttl_seconds: int) -> str:
+        cache = self._caching.CachedContent.create(
+            model=model if model.startswith("models/") else f"models/{model}",
+            display_name="vbot-static-prompt",
+            system_instruction=system_instruction,
+            ttl=datetime.timedelta(seconds=ttl_seconds),
+        )
+        return cache.name
+
+    def refresh(self, handle: str, ttl_seconds: int) -> None:
+        cache = self._caching.CachedContent.get(handle)
+        cache.update(ttl=datetime.timedelta(seconds=ttl_seconds))
+
+    def delete(self, handle: str) -> None:
+        self._caching.CachedContent.get(handle).delete()
+
+    def model_for(self, handle: str):
+        return self._genai.GenerativeModel.from_cached_content(cached_content=handle)
+
+
+class InMemoryContextCacheProvider(ContextCacheProvider):
+    """
+    Local stand-in for a provider cache, for tests and offline development.
+
+    Handles behave like real ones (they expire, can be refreshed and deleted)
+    but the model it returns simply carries the system instruction itself.
+    """
+
+    name = "memory"
+
+    def __init__(self, min_tokens: int = 0):
+        self.min_tokens = min_tokens
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.created = 0
+
+    def create(self, model: str, system_instruction: str, ttl_seconds: int) -> str:
+        handle = f"cachedContents/fake-{uuid.uuid4().hex[:12]}"
+        self.entries[handle] = {
+            "model": model,
+            "system_instruction": system_instruction,
+            "expires_at": time.time() + ttl_seconds,
+        }
+        self.created += 1
+        return handle
+
+    def _get(self, handle: str) -> Dict[str, Any]:
+        entry = self.entries.get(handle)
+        if entry is None or entry["expires_at"] <= time.time():
+            self.entries.pop(handle, None)
+            raise KeyError(f"Cached content {handle} not found")
+        return entry
+
+    def refresh(self, handle: str, ttl_seconds: int) -> None:
+        self._get(handle)["expires_at"] = time.time() + ttl_seconds
+
+    def delete(self, handle: str) -> None:
+        self.entries.pop(handle, None)
+
+    def model_for(self, handle: str):
+        import google.generativeai as genai
+
+        entry = self._get(handle)
+        return genai.GenerativeModel(entry["model"], system_instruction=entry["system_instruction"])
+
+
+def create_context_cache_provider(name: str = CONTEXT_CACHE_PROVIDER) -> Optional[ContextCacheProvider]:
+    """Build the configured provider, or None when caching is disabled."""
+    if name in ("", "none", "off", "false"):
+        return None
+    if name == "memory":
+        return InMemoryContextCacheProvider()
+    if name == "gemini":
+        return GeminiContextCacheProvider()
+    raise ValueError(f"Unknown context cache provider: {name}")
+
+
+class ContextCacheRegistry:
+    """
+    Maps (model, static prompt digest) to a live provider cache handle.
+
+    The registry is persisted as JSON so every bot worker process, and the
+    next server run, reuses the same handle until the prompt files change.
+    When the prefix for a model changes, the handle for the old prefix is
+    deleted.
+    """
+
+    def __init__(self, provider: ContextCacheProvider, path=CONTEXT_CACHE_REGISTRY_FILE,
+                 ttl_seconds: int = CONTEXT_CACHE_TTL_SECONDS,
+                 refresh_margin: int = CONTEXT_CACHE_REFRESH_MARGIN):
+        self.provider = provider
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin = min(refresh_margin, ttl_seconds // 2)
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable context cache registry {self.path}: {e}")
+            return {}
+
+    def _save(self, entries: Dict[str, Dict[str, Any]]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get_or_create(self, model: str, prefix: str, digest: str, tokens: Optional[int] = None) -> Optional[str]:
+        """
+        Return a cache handle for a static prompt prefix, creating one if needed.
+
+        Args:
+            model: Model name the cache is created for
+            prefix: Static system prompt text
+            digest: Content hash of ``prefix``
+            tokens: Token count of ``prefix``, if already known
+
+        Returns:
+            The handle, or None if the prefix is too small to cache or the
+            provider failed
+        """
+        if tokens is None:
+            tokens = estimate_tokens(prefix)
+        if tokens < self.provider.min_tokens:
+            logger.info(f"Static prompt prefix ({tokens} tokens) is below the {self.provider.min_tokens}-token caching minimum")
+            return None
+
+        key = f"{self.provider.name}:{model}:{digest}"
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(key)
+            now = time.time()
+
+            if entry and entry["expires_at"] - now > self.refresh_margin:
+                return entry["handle"]
+
+            if entry and entry["expires_at"] > now:
+                try:
+                    self.provider.refresh(entry["handle"], self.ttl_seconds)
+                    entry["expires_at"] = now + self.ttl_seconds
+                    self._save(entries)
+                    logger.info(f"Refreshed context cache {entry['handle']} for {model}")
+                    return entry["handle"]
+                except Exception as e:
+                    logger.warning(f"Could not refresh context cache {entry['handle']}: {e}")
+
+            try:
+                handle = self.provider.create(model, prefix, self.ttl_seconds)
+            except Exception as e:
+                logger.warning(f"Context caching unavailable for {model}: {e}")
+                return None
+
+            # The prompt files changed: drop handles for this model's old prefix
+            stale_prefix = f"{self.provider.name}:{model}:"
+            for stale_key in [k for k in entries if k.startswith(stale_prefix) and k != key]:
+                stale = entries.pop(stale_key)
+                try:
+                    self.provider.delete(stale["handle"])
+                except Exception as e:
+                    logger.debug(f"Could not delete stale context cache {stale['handle']}: {e}")
+
+            entries[key] = {"handle": handle, "tokens": tokens, "expires_at": now + self.ttl_seconds}
+            self._save(entries)
+            logger.info(f"Created context cache {handle} for {model} ({tokens} tokens)")
+            return handle
@@ -0,0 +1,226 @@
+import os
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from pipecat.frames.frames import Frame
+from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContextFrame
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from tokens import estimate_tokens
+
+CONTEXT_WINDOW_ENABLED = os.getenv("CONTEXT_WINDOW_ENABLED", "true").lower() in ("1", "true", "yes")
+CONTEXT_WINDOW_TURNS = int(os.getenv("CONTEXT_WINDOW_TURNS", "8"))
+CONTEXT_WINDOW_TOKEN_BUDGET = int(os.getenv("CONTEXT_WINDOW_TOKEN_BUDGET", "3000"))
+CONTEXT_SUMMARY_MODEL = os.getenv("CONTEXT_SUMMARY_MODEL", "gemini-2.0-flash-lite")
+
+SUMMARY_MARKER = "[Summary of the earlier part of this call]"
+
+CONTEXT_SUMMARY_PROMPT = """You keep a running summary of a live sales call between Neha (assistant) and a client (user).
+Fold the older lines of conversation below into the summary. Keep every fact the client shared, their questions, objections and any commitments made. Keep it under 150 words.
+
+CURRENT SUMMARY:
+{summary}
+
+OLDER CONVERSATION:
+{conversation}
+
+UPDATED SUMMARY:"""
+
+Summarizer = Callable[[str, str], Awaitable[str]]
+
+
+def message_text(message: Dict[str, Any]) -> str:
+    """Return the text of a standard-format message (string or parts content)."""
+    content = message.get("content")
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+    return ""
+
+
+def get_standard_messages(context) -> List[Dict[str, Any]]:
+    """
+    Return a context's messages in standard format, system prompt included.
+
+    Google contexts keep the system prompt outside the message list and, each
+    time their messages are restructured, append a user-role copy of it.
+    Those copies are dropped and the prompt is put back in front, so the
+    result is the conversation as the other LLM contexts hold it.
+    """
+    messages = context.get_messages_for_persistent_storage()
+    system_message = getattr(context, "system_message", None)
+    if system_message:
+        messages = [m for m in messages if not is_system_copy(m, system_message)]
+        if not any(m.get("role") == "system" for m in messages):
+            messages.insert(0, {"role": "system", "content": system_message})
+    return messages
+
+
+def set_standard_messages(context, messages: List[Dict[str, Any]]):
+    """
+    Replace a context's messages with standard-format ``messages``.
+
+    ``GoogleLLMContext.set_messages`` would move the system prompt out of the
+    list and append another user-role copy of it after the caller's latest
+    message, so Google contexts are given the conversation only and their
+    system prompt is set directly.
+    """
+    if not hasattr(context, "system_message"):
+        context.set_messages(messages)
+        return
+    system = [m for m in messages if m.get("role") == "system"]
+    context.set_messages([m for m in messages if m.get("role") != "system"])
+    if system:
+        context.system_message = message_text(system[0])
+
+
+def is_system_copy(message: Dict[str, Any], system_message: Optional[str]) -> bool:
+    """Whether ``message`` is a user-role copy of the system prompt added by a Google context."""
+    return bool(system_message) and message.get("role") == "user" and message_text(message) == system_message
+
+
+_genai = None
+
+
+async def summarize_with_gemini(summary: str, conversation: str, model_name: str = CONTEXT_SUMMARY_MODEL) -> str:
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        # The Groq pipeline never configures google.generativeai itself
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        _genai = genai
+
+    model = _genai.GenerativeModel(model_name)
+    prompt = CONTEXT_SUMMARY_PROMPT.format(summary=summary or "(none yet)", conversation=conversation)
+    response = await model.generate_content_async(prompt)
+    if not response.parts:
+        raise ValueError(f"Empty summary response: {response.prompt_feedback}")
+    return response.text.strip()
+
+
+class RollingContextWindow(FrameProcessor):
+    """
+    Keeps the LLM context bounded over long calls.
+
+    Sits between the user context aggregator and the LLM. Before each request
+    it keeps the last ``max_turns`` user turns verbatim (fewer if they exceed
+    ``token_budget``) and moves older messages out of the context. Moved-out
+    messages are folded into a running summary by ``summarizer`` in the
+    background; until that finishes they are carried verbatim inside the
+    summary message, so nothing is lost while the context stays small.
+
+    The context is trimmed in place, so the aggregators keep appending to the
+    trimmed history. Messages starting with one of ``ephemeral_markers``
+    (per-turn injections such as knowledge base excerpts) are not treated as
+    conversation and are dropped whenever the context is rewritten.
+    """
+
+    def __init__(self, max_turns: int = CONTEXT_WINDOW_TURNS, token_budget: int = CONTEXT_WINDOW_TOKEN_BUDGET,
+                 summarizer: Optional[Summarizer] = None, ephemeral_markers: Tuple[str, ...] = (), **kwargs):
+        super().__init__(**kwargs)
+        self.ephemeral_markers = (SUMMARY_MARKER, *ephemeral_markers)
+        self.max_turns = max(1, max_turns)
+        self.token_budget = token_budget
+        self.summarizer = summarizer or summarize_with_gemini
+        self.summary = ""
+        self._pending: List[Dict[str, Any]] = []
+        self._summary_task: Optional[asyncio.Task] = None
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, OpenAILLMContextFrame) and direction == FrameDirection.DOWNSTREAM:
+            try:
+                self._trim(frame.context)
+            except Exception as e:
+                logger.error(f"Error trimming LLM context: {e}")
+
+        await self.push_frame(frame, direction)
+
+    def _trim(self, context):
+        messages = get_standard_messages(context)
+        system = [m for m in messages if m.get("role") == "system"]
+        conversation = [
+            m for m in messages
+            if m.get("role") != "system" and not message_text(m).startswith(self.ephemeral_markers)
+        ]
+        current_summary = self._current_summary_text(messages)
+
+        cut = self._cut_index(conversation)
+        if cut:
+            self._pending.extend(conversation[:cut])
+            conversation = conversation[cut:]
+            # If summarizing keeps failing, the verbatim backlog must not
+            # become the new unbounded history
+            while len(self._pending) > 1 and self._tokens(self._pending) > self.token_budget:
+                self._pending.pop(0)
+            logger.debug(f"Moved {cut} messages out of the LLM context ({len(conversation)} kept)")
+            self._start_summary()
+
+        summary_message = self._summary_message()
+        summary_text = message_text(summary_message) if summary_message else ""
+        if not cut and summary_text == current_summary:
+            return
+
+        set_standard_messages(context, system + ([summary_message] if summary_message else []) + conversation)
+
+    def _cut_index(self, conversation: List[Dict[str, Any]]) -> int:
+        # Turns start at user messages; only cut on a turn boundary
+        turn_starts = [n for n, m in enumerate(conversation) if m.get("role") == "user"]
+        if len(turn_starts) <= 1:
+            return 0
+
+        keep = max(0, len(turn_starts) - self.max_turns)
+        cut = turn_starts[keep]
+        # Never drop the latest turn, however large
+        while cut < turn_starts[-1] and self._tokens(conversation[cut:]) > self.token_budget:
+            keep += 1
+            cut = turn_starts[keep]
+        return cut
+
+    def _tokens(self, messages: List[Dict[str, Any]]) -> int:
+        return sum(estimate_tokens(message_text(m)) for m in messages)
+
+    def _format(self, messages: List[Dict[str, Any]]) -> str:
+        return "\n".join(f"{m.get('role')}: {message_text(m)}" for m in messages if message_text(m))
+
+    def _summary_message(self) -> Optional[Dict[str, Any]]:
+        if not self.summary and not self._pending:
+            return None
+        text = SUMMARY_MARKER
+        if self.summary:
+            text += f"\n{self.summary}"
+        if self._pending:
+            text += f"\n{self._format(self._pending)}"
+        return {"role": "user", "content": text}
+
+    def _current_summary_text(self, messages: List[Dict[str, Any]]) -> str:
+        for m in messages:
+            if message_text(m).startswith(SUMMARY_MARKER):
+                return message_text(m)
+        return ""
+
+    def _start_summary(self):
+        if self._summary_task and not self._summary_task.done():
+            return
+        self._summary_task = self.create_task(self._summarize())
+
+    async def _summarize(self):
+        while self._pending:
+            batch = list(self._pending)
+            try:
+                self.summary = await self.summarizer(self.summary, self._format(batch))
+            except Exception as e:
+                logger.error(f"Error summarizing earlier conversation: {e}")
+                return
+            # Messages moved out while the summary was being written stay pending
+            self._pending = self._pending[len(batch):]
+            logger.debug(f"Context summary updated ({estimate_tokens(self.summary)} tokens)")
+
+    async def cleanup(self):
+        await super().cleanup()
+        if self._summary_task and not self._summary_task.done():
+            await self.cancel_task(self._summary_task)
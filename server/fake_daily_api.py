@@ -0,0 +1,118 @@
+"""
+Local stand-in for the parts of the Daily REST API the server uses.
+
+Run it and point the server (or a bot started from the CLI) at it to
+exercise room pooling without a Daily account:
+
+    python fake_daily_api.py --port 9000
+    DAILY_API_URL=http://localhost:9000 DAILY_API_KEY=fake python server.py
+
+Rooms and tokens live in memory. ``FAKE_DAILY_LATENCY`` adds a delay to
+every request to mimic real round trips, and ``failures`` makes the next
+requests to an endpoint fail, for tests of the pool's error handling.
+"""
+import os
+import time
+import uuid
+import asyncio
+import argparse
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+from fastapi import Body, FastAPI, HTTPException
+
+FAKE_DAILY_LATENCY = float(os.getenv("FAKE_DAILY_LATENCY", "0"))
+FAKE_DAILY_DOMAIN = os.getenv("FAKE_DAILY_DOMAIN", "https://fake.daily.co")
+
+app = FastAPI()
+rooms: Dict[str, Dict[str, Any]] = {}
+tokens: Dict[str, Dict[str, Any]] = {}
+request_counts: Dict[str, int] = {}
+# Endpoint name -> number of upcoming requests that fail with a 503
+failures: Dict[str, int] = {}
+
+
+def reset():
+    for state in (rooms, tokens, request_counts, failures):
+        state.clear()
+
+
+async def simulate_request(name: str):
+    request_counts[name] = request_counts.get(name, 0) + 1
+    if FAKE_DAILY_LATENCY:
+        await asyncio.sleep(FAKE_DAILY_LATENCY)
+    if failures.get(name, 0) > 0:
+        failures[name] -= 1
+        raise HTTPException(status_code=503, detail="Daily unavailable")
+
+
+@app.post("/rooms")
+async def create_room(data: Dict[str, Any] = Body(default={})) -> Dict[str, Any]:
+    await simulate_request("create_room")
+    name = data.get("name") or uuid.uuid4().hex[:12]
+    if name in rooms:
+        raise HTTPException(status_code=400, detail=f"Room {name} already exists")
+    rooms[name] = {
+        "id": str(uuid.uuid4()),
+        "name": name,
+        "api_created": True,
+        "privacy": data.get("privacy", "public"),
+        "url": f"{FAKE_DAILY_DOMAIN}/{name}",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": data.get("properties", {}),
+    }
+    return rooms[name]
+
+
+@app.get("/rooms")
+async def list_rooms() -> Dict[str, Any]:
+    await simulate_request("list_rooms")
+    return {"total_count": len(rooms), "data": list(rooms.values())}
+
+
+@app.get("/rooms/{name}")
+async def get_room(name: str) -> Dict[str, Any]:
+    await simulate_request("get_room")
+    if name not in rooms:
+        raise HTTPException(status_code=404, detail="not-found")
+    return rooms[name]
+
+
+@app.delete("/rooms/{name}")
+async def delete_room(name: str) -> Dict[str, Any]:
+    await simulate_request("delete_room")
+    if rooms.pop(name, None) is None:
+        raise HTTPException(status_code=404, detail="not-found")
+    return {"deleted": True, "name": name}
+
+
+@app.post("/meeting-tokens")
+async def create_token(data: Dict[str, Any] = Body(default={})) -> Dict[str, Any]:
+    await simulate_request("create_token")
+    properties = data.get("properties", {})
+    room_name = properties.get("room_name")
+    if room_name not in rooms:
+        raise HTTPException(status_code=400, detail=f"Unknown room {room_name}")
+    exp = properties.get("exp")
+    if exp and exp < time.time():
+        raise HTTPException(status_code=400, detail="Token expiry is in the past")
+    token = uuid.uuid4().hex
+    tokens[token] = properties
+    return {"token": token}
+
+
+@app.get("/stats")
+async def stats() -> Dict[str, Any]:
+    """Not part of the Daily API: request counts and live rooms, for checking the pool."""
+    return {"rooms": len(rooms), "tokens": len(tokens), "requests": request_counts}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake Daily REST API")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Host address")
+    parser.add_argument("--port", type=int, default=9000, help="Port number")
+    config = parser.parse_args()
+
+    uvicorn.run(app, host=config.host, port=config.port)
@@ -1,13 +1,104 @@
+import os
 import uuid
 import json
 import datetime
 from pathlib import Path
+from typing import Any, Dict, List, Set, Tuple
 import firebase_admin
 from firebase_admin import firestore
+from firebase_admin import firestore_async
 from firebase_admin import credentials
+from google.api_core.exceptions import NotFound
 
 SERVICE_ACCOUNT_KEY_PATH = Path(__file__).parent.parent / 'serviceAccountKey.json'
 
+# When set, AsyncVoiceAgentDB talks to the Firestore emulator instead
+FIRESTORE_EMULATOR_HOST = os.getenv("FIRESTORE_EMULATOR_HOST")
+FIRESTORE_PROJECT_ID = os.getenv("FIRESTORE_PROJECT_ID", "vbot-local")
+
+CLIENT_PROFILE_KEYS = [
+    'clientType', 'understandsCreditFunds', 'hasMinimumInvestment', 
+    'knowsManeesh', 'investorSophistication', 'attitudeTowardsOffering',
+    'wantsZoomCall', 'shouldCallAgain', 'interestedInSalesContact', 
+    'languagePreference', 'notes'
+]
+
+
+def _default_profile(customer_id):
+    return {
+        'customerId': customer_id,
+        'dateGenerated': firestore.SERVER_TIMESTAMP,
+        'lastUpdated': firestore.SERVER_TIMESTAMP,
+        'clientType': None,                    # 'distributor' or 'investor'
+        'understandsCreditFunds': None,        # True or False
+        'hasMinimumInvestment': None,          # True or False (1 cr)
+        'knowsManeesh': None,                  # True or False
+        'investorSophistication': None,        # 'sophisticated' or 'novice'
+        'attitudeTowardsOffering': None,       # 'optimistic' or 'skeptic'
+        'wantsZoomCall': None,                 # True or False
+        'shouldCallAgain': None,               # True or False
+        'interestedInSalesContact': None,      # True or False
+        'languagePreference': 'English',       # Default 'English' or other language
+        'notes': ''
+    }
+
+
+def _profile_updates(profile_data):
+    updates = {
+        'lastUpdated': firestore.SERVER_TIMESTAMP
+    }
+    for key in CLIENT_PROFILE_KEYS:
+        if key in profile_data and profile_data[key] is not None:
+            updates[key] = profile_data[key]
+    return updates
+
+
+def _end_call_updates(call_data, summary=None, tags=None):
+    update_data = {
+        'endTime': firestore.SERVER_TIMESTAMP,
+        'status': 'completed'
+    }
+    
+    duration = _call_duration(call_data.get('startTime'))
+    if duration is not None:
+        update_data['duration'] = duration
+        
+    if summary:
+        update_data['summary'] = summary
+        
+    if tags and isinstance(tags, list):
+        update_data['tags'] = tags
+    
+    return update_data
+
+
+def _parse_local_time(value):
+    """Parse a naive local ISO timestamp (as stored in SQLite) into an aware datetime."""
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value).astimezone()
+    except (TypeError, ValueError):
+        return None
+
+
+def _call_duration(start_time):
+    """Seconds since a call's startTime, or None if it can't be determined."""
+    if not start_time:
+        return None
+    try:
+        if isinstance(start_time, datetime.datetime):
+            if start_time.tzinfo is None:
+                start_time = start_time.replace(tzinfo=datetime.timezone.utc)
+            return (datetime.datetime.now(datetime.timezone.utc) - start_time).total_seconds()
+        if hasattr(start_time, 'seconds'):
+            start_seconds = start_time.seconds + (start_time.nanos / 1e9)
+            return datetime.datetime.now().timestamp() - start_seconds
+    except Exception as e:
+        print(f"Error calculating duration: {e}")
+    return None
+
+
 class VoiceAgentDB:
     def __init__(self, service_account_path=SERVICE_ACCOUNT_KEY_PATH):
         try:
@@ -181,6 +272,22 @@ class VoiceAgentDB:
             print(f"Error adding message: {e}")
             return False
     
+    # batched variant of add_message_to_call, used by the bot during the call
+    def add_messages_to_call(self, call_id, messages):
+        if not messages:
+            return True
+        
+        call_ref = self.db.collection('calls').document(call_id)
+        
+        try:
+            call_ref.update({
+                'transcript': firestore.ArrayUnion(list(messages))
+            })
+            return True
+        except Exception as e:
+            print(f"Error adding messages: {e}")
+            return False
+    
     #to be called in post proccesor 
     def end_call(self, call_id, summary=None, tags=None):
         call_ref = self.db.collection('calls').document(call_id)
@@ -191,33 +298,7 @@ class VoiceAgentDB:
             
         call_data = call_doc.to_dict()
         
-        duration = None
-        if 'startTime' in call_data and call_data['startTime']:
-            try:
-                if hasattr(call_data['startTime'], 'seconds'):
-                    start_seconds = call_data['startTime'].seconds + (call_data['startTime'].nanos / 1e9)
-                    current_seconds = datetime.datetime.now().timestamp()
-                    duration = current_seconds - start_seconds
-                else:
-                    pass
-            except Exception as e:
-                print(f"Error calculating duration: {e}")
-        
-        update_data = {
-            'endTime': firestore.SERVER_TIMESTAMP,
-            'status': 'completed'
-        }
-        
-        if duration is not None:
-            update_data['duration'] = duration
-            
-        if summary:
-            update_data['summary'] = summary
-            
-        if tags and isinstance(tags, list):
-            update_data['tags'] = tags
-            
-            
+        update_data = _end_call_updates(call_data, summary, tags)
         call_ref.update(update_data)
         
         return True
@@ -245,20 +326,7 @@ class VoiceAgentDB:
         if not profile_doc.exists:
             self._initialize_customer_profile(customer_id)
         
-        updates = {
-            'lastUpdated': firestore.SERVER_TIMESTAMP
-        }
-        
-        valid_keys = [
-            'clientType', 'understandsCreditFunds', 'hasMinimumInvestment', 
-            'knowsManeesh', 'investorSophistication', 'attitudeTowardsOffering',
-            'wantsZoomCall', 'shouldCallAgain', 'interestedInSalesContact', 
-            'languagePreference', 'notes'
-        ]
-        
-        for key in valid_keys:
-            if key in profile_data and profile_data[key] is not None:
-                updates[key] = profile_data[key]
+        updates = _profile_updates(profile_data)
         
         profile_ref.update(updates)
         return True
@@ -284,6 +352,14 @@ class VoiceAgentDB:
             print("If this is an index error, please create the required index using the link in the error message.")
             return []
     
+    # history plus transcripts for the analyzer; the call documents already
+    # hold the transcript, so this is a single query
+    def get_call_history_with_transcripts(self, customer_id, limit=10):
+        return [
+            {**call, 'transcript': call.get('transcript') or []}
+            for call in self.get_call_history(customer_id, limit)
+        ]
+    
     # to be called in analyzer after getting call history
     def get_call_transcript(self, call_id):
         call_ref = self.db.collection('calls').document(call_id)
@@ -389,21 +465,456 @@ class VoiceAgentDB:
     
     #should be done when the customer is created
     def _initialize_customer_profile(self, customer_id):
-        default_profile = {
-            'customerId': customer_id,
-            'dateGenerated': firestore.SERVER_TIMESTAMP,
-            'lastUpdated': firestore.SERVER_TIMESTAMP,
-            'clientType': None,                    # 'distributor' or 'investor'
-            'understandsCreditFunds': None,        # True or False
-            'hasMinimumInvestment': None,          # True or False (1 cr)
-            'knowsManeesh': None,                  # True or False
-            'investorSophistication': None,        # 'sophisticated' or 'novice'
-            'attitudeTowardsOffering': None,       # 'optimistic' or 'skeptic'
-            'wantsZoomCall': None,                 # True or False
-            'shouldCallAgain': None,               # True or False
-            'interestedInSalesContact': None,      # True or False
-            'languagePreference': 'English',       # Default 'English' or other language
-            'notes': ''
+        self.db.collection('clientProfiles').document(customer_id).set(_default_profile(customer_id))
+
+
+def _coalesce_value(previous, value):
+    """Combine two writes to one field into one, or raise ValueError if they can't be."""
+    if isinstance(value, firestore.ArrayUnion):
+        if isinstance(previous, firestore.ArrayUnion):
+            return firestore.ArrayUnion(list(previous.values) + [v for v in value.values if v not in previous.values])
+        if isinstance(previous, list):
+            return previous + [v for v in value.values if v not in previous]
+    elif isinstance(value, firestore.ArrayRemove):
+        if isinstance(previous, firestore.ArrayRemove):
+            return firestore.ArrayRemove(list(previous.values) + list(value.values))
+        if isinstance(previous, list):
+            return [v for v in previous if v not in value.values]
+    elif isinstance(value, firestore.Increment):
+        if isinstance(previous, firestore.Increment):
+            return firestore.Increment(previous.value + value.value)
+        if isinstance(previous, (int, float)) and not isinstance(previous, bool):
+            return previous + value.value
+    else:
+        # A plain value (or SERVER_TIMESTAMP / DELETE_FIELD) overwrites the field
+        return value
+    raise ValueError(f"Cannot combine {value!r} with {previous!r}")
+
+
+def _coalesce_fields(previous: Dict[str, Any], data: Dict[str, Any]):
+    """Fields of two writes to one document merged in order, or None if they can't be."""
+    merged = dict(previous)
+    for key, value in data.items():
+        if key not in merged:
+            merged[key] = value
+            continue
+        try:
+            merged[key] = _coalesce_value(merged[key], value)
+        except ValueError:
+            return None
+    return merged
+
+
+class FirestoreWriteBatch:
+    """
+    Collects writes and commits them as a single Firestore batch.
+
+    Writes to the same document are coalesced into one write, so ending a
+    call, storing its transcript and tagging it cost one document write and
+    one round trip. Transforms on a field already written in the batch are
+    combined (two ArrayUnions become one, an ArrayUnion onto a queued list
+    extends it); a write whose transforms cannot be combined is queued as a
+    separate write to the same document instead. The batch is atomic: if any
+    write fails, none is applied.
+
+    Use as ``async with db.batch() as batch: ...`` to commit on exit, or call
+    ``commit()`` directly.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._writes: List[Tuple[Any, str, Dict[str, Any]]] = []
+        # Index in _writes of the last write queued for each document path
+        self._latest: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self._writes)
+
+    def __contains__(self, ref):
+        return ref.path in self._latest
+
+    def queued_fields(self, ref) -> Set[str]:
+        """Names of the fields queued for a document."""
+        return {key for queued, _, data in self._writes if queued.path == ref.path for key in data}
+
+    def _add(self, ref, kind: str, data: Dict[str, Any]):
+        index = self._latest.get(ref.path)
+        if index is not None:
+            _, previous_kind, previous_data = self._writes[index]
+            if kind == "set":
+                # A plain set replaces whatever was queued
+                self._writes[index] = (ref, kind, data)
+                return
+            merged = _coalesce_fields(previous_data, data)
+            if merged is not None:
+                # The queued write keeps its "set" semantics if it had them
+                if previous_kind == "set" or kind == "update":
+                    kind = previous_kind
+                self._writes[index] = (ref, kind, merged)
+                return
+        self._latest[ref.path] = len(self._writes)
+        self._writes.append((ref, kind, data))
+
+    def set(self, ref, data: Dict[str, Any], merge: bool = False):
+        self._add(ref, "merge" if merge else "set", dict(data))
+
+    def update(self, ref, data: Dict[str, Any]):
+        self._add(ref, "update", dict(data))
+
+    async def commit(self) -> int:
+        """Commit the queued writes; returns the number of documents written."""
+        if not self._writes:
+            return 0
+        batch = self._client.batch()
+        for ref, kind, data in self._writes:
+            if kind == "update":
+                batch.update(ref, data)
+            else:
+                batch.set(ref, data, merge=(kind == "merge"))
+        await batch.commit()
+        count = len(self._latest)
+        self._writes.clear()
+        self._latest.clear()
+        return count
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.commit()
+
+
+class AsyncVoiceAgentDB:
+    """
+    Async counterpart of VoiceAgentDB on Firestore's AsyncClient.
+
+    Used by the FastAPI handlers and post-call processing so Firestore round
+    trips no longer block the event loop. Write methods take an optional
+    ``batch`` (from ``batch()``); queued writes are applied by its commit
+    instead of one request each.
+
+    With FIRESTORE_EMULATOR_HOST set the client connects to the Firestore
+    emulator without a service account. A ready-made client (e.g. an
+    in-memory fake with the AsyncClient interface) can be passed as ``client``.
+    """
+
+    def __init__(self, service_account_path=SERVICE_ACCOUNT_KEY_PATH, client=None):
+        if client is not None:
+            self.db = client
+        elif FIRESTORE_EMULATOR_HOST:
+            from google.cloud.firestore import AsyncClient
+            self.db = AsyncClient(project=FIRESTORE_PROJECT_ID)
+        else:
+            try:
+                firebase_admin.get_app()
+            except ValueError:
+                cred = credentials.Certificate(service_account_path)
+                firebase_admin.initialize_app(cred)
+            
+            self.db = firestore_async.client()
+    
+    def batch(self) -> FirestoreWriteBatch:
+        return FirestoreWriteBatch(self.db)
+    
+    async def _write(self, ref, data, batch=None, kind="update"):
+        if batch is not None:
+            if kind == "update":
+                batch.update(ref, data)
+            else:
+                batch.set(ref, data, merge=(kind == "merge"))
+        elif kind == "update":
+            await ref.update(data)
+        else:
+            await ref.set(data, merge=(kind == "merge"))
+    
+    async def add_customer_with_id(self, client_id: str, first_name: str, 
+                                   last_name: str, phone_number: str,
+                                   email: str = None, city: str = None, 
+                                   job_business: str = None, investor_type: str = "individual"):
+        """
+        Add a customer with a specific ID to Firestore.
+        
+        The customer and their initial profile are written in one batch.
+        
+        Returns:
+            The added customer's ID, or the existing ID for a known phone number
+        """
+        existing_id, _ = await self.get_customer_by_phone(phone_number)
+        if existing_id:
+            return existing_id
+            
+        customer_ref = self.db.collection('customers').document(client_id)
+        if (await customer_ref.get()).exists:
+            return client_id
+        
+        async with self.batch() as batch:
+            batch.set(customer_ref, {
+                'firstName': first_name,
+                'lastName': last_name,
+                'phoneNumber': phone_number,
+                'email': email or '',
+                'city': city or '',
+                'jobBusiness': job_business or '',
+                'investorType': investor_type,
+                'createdAt': firestore.SERVER_TIMESTAMP
+            })
+            batch.set(self.db.collection('clientProfiles').document(client_id), _default_profile(client_id))
+        
+        return client_id
+    
+    async def get_customer_by_phone(self, phone_number):
+        query = self.db.collection('customers').where(
+            filter=firestore.FieldFilter('phoneNumber', '==', phone_number)
+        ).limit(1)
+        
+        for doc in await query.get():
+            return doc.id, doc.to_dict()
+        
+        return None, None
+    
+    async def get_customer(self, customer_id):
+        doc = await self.db.collection('customers').document(customer_id).get()
+        
+        if doc.exists:
+            return doc.to_dict()
+        
+        return None
+    
+    async def update_customer(self, customer_id, update_data, batch=None):
+        if not update_data:
+            return False
+        
+        update_data = {**update_data, 'lastUpdated': firestore.SERVER_TIMESTAMP}
+        await self._write(self.db.collection('customers').document(customer_id), update_data, batch)
+        return True
+    
+    async def create_call(self, customer_id, agent_id=None, call_type="outbound", call_id=None):
+        """Create the call document and touch the customer's lastContacted in one batch."""
+        if not call_id:
+            call_id = str(uuid.uuid4())
+        
+        async with self.batch() as batch:
+            batch.set(self.db.collection('calls').document(call_id), {
+                'callId': call_id,
+                'customerId': customer_id,
+                'agentId': agent_id,
+                'callType': call_type,
+                'startTime': firestore.SERVER_TIMESTAMP,
+                'endTime': None,
+                'duration': None,
+                'status': 'active',
+                'transcript': [],
+                'summary': None,
+                'tags': []
+            })
+            await self.update_customer(customer_id, {'lastContacted': firestore.SERVER_TIMESTAMP}, batch=batch)
+        
+        return call_id
+    
+    async def add_messages_to_call(self, call_id, messages, batch=None):
+        if not messages:
+            return True
+        
+        try:
+            await self._write(
+                self.db.collection('calls').document(call_id),
+                {'transcript': firestore.ArrayUnion(list(messages))},
+                batch,
+            )
+            return True
+        except Exception as e:
+            print(f"Error adding messages: {e}")
+            return False
+    
+    async def end_call(self, call_id, summary=None, tags=None, batch=None):
+        call_ref = self.db.collection('calls').document(call_id)
+        call_doc = await call_ref.get()
+        
+        if not call_doc.exists:
+            return False
+        
+        await self._write(call_ref, _end_call_updates(call_doc.to_dict(), summary, tags), batch)
+        return True
+    
+    async def add_call_transcript(self, call_id, full_transcript, batch=None):
+        """
+        Replace a call's transcript.
+        
+        Unbatched, a missing call returns False; batched, it makes the batch's
+        commit fail.
+        """
+        call_ref = self.db.collection('calls').document(call_id)
+        try:
+            await self._write(call_ref, {'transcript': full_transcript}, batch)
+        except NotFound:
+            return False
+        return True
+    
+    async def update_client_profile(self, customer_id, profile_data, batch=None):
+        if not profile_data:
+            return False
+        
+        profile_ref = self.db.collection('clientProfiles').document(customer_id)
+        updates = _profile_updates(profile_data)
+        if (await profile_ref.get()).exists:
+            await self._write(profile_ref, updates, batch)
+        else:
+            await self._write(profile_ref, {**_default_profile(customer_id), **updates}, batch, kind="set")
+        return True
+    
+    # Replication writes. These apply the SQLite outbox (see
+    # firestore_replicator) and only ever queue set(merge=True) writes with
+    # values taken from the outbox entry, so replaying an entry is harmless.
+    # The baseline fields a new document starts with (an active call's empty
+    # transcript, a profile's unset flags) are only queued for fields the
+    # document has neither stored nor queued, so a replay never resets a
+    # later update.
+    
+    async def _missing_defaults(self, ref, defaults, batch):
+        """The fields of ``defaults`` that ``ref`` has neither stored nor queued in ``batch``."""
+        snapshot = await ref.get()
+        present = set(snapshot.to_dict() or {}) if snapshot.exists else set()
+        present |= batch.queued_fields(ref)
+        return {key: value for key, value in defaults.items() if key not in present}
+    
+    async def replicate_customer(self, customer, batch):
+        client_id = customer['client_id']
+        batch.set(self.db.collection('customers').document(client_id), {
+            'firstName': customer.get('first_name') or '',
+            'lastName': customer.get('last_name') or '',
+            'phoneNumber': customer.get('phone_number'),
+            'email': customer.get('email') or '',
+            'city': customer.get('city') or '',
+            'jobBusiness': customer.get('job_business') or '',
+            'investorType': customer.get('investor_type') or 'individual',
+            'createdAt': _parse_local_time(customer.get('created_at')) or firestore.SERVER_TIMESTAMP
+        }, merge=True)
+        profile_ref = self.db.collection('clientProfiles').document(client_id)
+        defaults = await self._missing_defaults(profile_ref, _default_profile(client_id), batch)
+        batch.set(profile_ref, {**defaults, 'customerId': client_id}, merge=True)
+    
+    async def replicate_call_start(self, call, batch):
+        started_at = _parse_local_time(call.get('started_at')) or firestore.SERVER_TIMESTAMP
+        call_ref = self.db.collection('calls').document(call['call_id'])
+        defaults = await self._missing_defaults(call_ref, {
+            'endTime': None,
+            'duration': None,
+            'status': 'active',
+            'transcript': [],
+            'summary': None,
+            'tags': []
+        }, batch)
+        batch.set(call_ref, {
+            **defaults,
+            'callId': call['call_id'],
+            'customerId': call['client_id'],
+            'agentId': None,
+            'callType': 'outbound',
+            'startTime': started_at
+        }, merge=True)
+        batch.set(self.db.collection('customers').document(call['client_id']), {
+            'lastContacted': started_at,
+            'lastUpdated': firestore.SERVER_TIMESTAMP
+        }, merge=True)
+    
+    async def replicate_call_end(self, call, batch):
+        update_data = {
+            'endTime': _parse_local_time(call.get('ended_at')) or firestore.SERVER_TIMESTAMP,
+            'status': 'completed',
+            'summary': call.get('summary'),
+            'tags': call.get('tags') or []
         }
+        if call.get('duration') is not None:
+            update_data['duration'] = call['duration']
+        if call.get('transcript') is not None:
+            update_data['transcript'] = call['transcript']
+        batch.set(self.db.collection('calls').document(call['call_id']), update_data, merge=True)
+    
+    async def replicate_call_messages(self, update, batch):
+        # A merge rather than an update, so it cannot fail with NotFound
+        batch.set(
+            self.db.collection('calls').document(update['call_id']),
+            {'transcript': firestore.ArrayUnion(update['messages'])},
+            merge=True
+        )
+    
+    async def replicate_client_profile(self, update, batch):
+        client_id = update['client_id']
+        profile_ref = self.db.collection('clientProfiles').document(client_id)
+        defaults = await self._missing_defaults(profile_ref, _default_profile(client_id), batch)
+        batch.set(
+            profile_ref,
+            {**defaults, 'customerId': client_id, **_profile_updates(update.get('profile') or {})},
+            merge=True
+        )
+    
+    async def get_call_history(self, customer_id, limit=10):
+        query = (self.db.collection('calls')
+                .where(filter=firestore.FieldFilter("customerId", "==", customer_id))
+                .order_by('startTime', direction=firestore.Query.DESCENDING)
+                .limit(limit))
+        
+        try:
+            return [doc.to_dict() for doc in await query.get()]
+        except Exception as e:
+            print(f"Error retrieving call history: {e}")
+            print("If this is an index error, please create the required index using the link in the error message.")
+            return []
+    
+    async def get_call_history_with_transcripts(self, customer_id, limit=10):
+        """
+        Get the last ``limit`` calls of a customer with their transcripts.
+        
+        The call documents already hold the transcript, so this is one query
+        instead of a history query plus one read per call.
+        """
+        return [
+            {**call, 'transcript': call.get('transcript') or []}
+            for call in await self.get_call_history(customer_id, limit)
+        ]
+    
+    async def get_call_transcript(self, call_id):
+        call = await self.db.collection('calls').document(call_id).get()
+        
+        if not call.exists:
+            return []
+            
+        return call.to_dict().get('transcript', [])
+    
+    async def get_customer_profile(self, customer_id):
+        profile = await self.db.collection('clientProfiles').document(customer_id).get()
+        
+        if profile.exists:
+            return profile.to_dict()
+        
+        return None
+    
+    async def get_latest_call_details(self, customer_id):
+        """
+        Get the details of the latest call for a client including summary.
         
-        self.db.collection('clientProfiles').document(customer_id).set(default_profile)
\ No newline at end of file
+        Returns:
+            Dictionary with call details or None if not found
+        """
+        try:
+            query = (self.db.collection('calls')
+                    .where(filter=firestore.FieldFilter("customerId", "==", customer_id))
+                    .order_by('startTime', direction=firestore.Query.DESCENDING)
+                    .limit(1))
+            
+            for doc in await query.get():
+                call_data = doc.to_dict()
+                return {
+                    "call_id": doc.id,
+                    "summary": call_data.get("summary"),
+                    "timestamp": call_data.get("startTime"),
+                    "duration": call_data.get("duration"),
+                    "tags": call_data.get("tags", [])
+                }
+            
+            return None
+            
+        except Exception as e:
+            print(f"Error retrieving latest call details: {e}")
+            return None
@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from sqlite_db import (
+    DB_PATH,
+    OUTBOX_CALL_END,
+    OUTBOX_CALL_MESSAGES,
+    OUTBOX_CALL_START,
+    OUTBOX_CLIENT_PROFILE,
+    OUTBOX_CUSTOMER,
+    SQLiteConnectionManager,
+    run_migrations,
+)
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "2"))
+OUTBOX_RETRY_MAX_SECONDS = float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "300"))
+# Entries that failed this many times stay in the outbox but are no longer retried
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "20"))
+
+
+class FirestoreReplicator:
+    """
+    Drains the SQLite Firestore outbox in the background.
+
+    SQLite is the system of record: request handlers and post-call processing
+    write locally and queue the matching Firestore writes in the same
+    transaction (see ``sqlite_db.enqueue_outbox``). This replicator reads due
+    entries in insertion order, applies up to ``batch_size`` of them as one
+    coalesced Firestore batch and deletes them once committed.
+
+    Every entry maps to idempotent merge writes, so a retry after a failed or
+    interrupted commit is safe. If a batch fails, its entries are retried one
+    by one so a single bad entry cannot hold back the rest; failing entries
+    back off exponentially and are given up on after ``max_attempts``.
+    """
+
+    def __init__(self, firestore_db, db_path=DB_PATH, batch_size: int = OUTBOX_BATCH_SIZE,
+                 poll_interval: float = OUTBOX_POLL_INTERVAL,
+                 retry_base_seconds: float = OUTBOX_RETRY_BASE_SECONDS,
+                 retry_max_seconds: float = OUTBOX_RETRY_MAX_SECONDS,
+                 max_attempts: int = OUTBOX_MAX_ATTEMPTS):
+        self.firestore_db = firestore_db
+        self.batch_size = max(1, batch_size)
+        self.poll_interval = poll_interval
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.max_attempts = max(1, max_attempts)
+        self._writers = {
+            OUTBOX_CUSTOMER: firestore_db.replicate_customer,
+            OUTBOX_CALL_START: firestore_db.replicate_call_start,
+            OUTBOX_CALL_END: firestore_db.replicate_call_end,
+            OUTBOX_CALL_MESSAGES: firestore_db.replicate_call_messages,
+            OUTBOX_CLIENT_PROFILE: firestore_db.replicate_client_profile,
+        }
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._connections = SQLiteConnectionManager.for_path(db_path)
+        run_migrations(self._connections)
+
+        self.replicated_total = 0
+        self.failed_attempts_total = 0
+        self.last_error: Optional[str] = None
+        self.last_replicated_at: Optional[float] = None
+        # Seconds between an entry being queued and its commit, for the last batch
+        self.last_batch_lag_seconds: Optional[float] = None
+
+    def notify(self):
+        """Wake the replicator after queueing writes, instead of waiting for the next poll."""
+        self._wakeup.set()
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the loop after one last attempt to drain what is due."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.drain_once()
+        except Exception as e:
+            logger.warning(f"Final Firestore outbox drain failed: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                replicated = await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Firestore outbox drain failed: {e}")
+                replicated = 0
+
+            # A full batch means more is probably waiting
+            if replicated >= self.batch_size:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def drain_once(self) -> int:
+        """Replicate one batch of due outbox entries; returns how many were applied."""
+        entries = await asyncio.to_thread(self._fetch_due)
+        if not entries:
+            return 0
+
+        try:
+            await self._commit(entries)
+            done, failed = entries, []
+        except Exception as e:
+            if len(entries) == 1:
+                done, failed = [], [(entries[0], str(e) or e.__class__.__name__)]
+            else:
+                logger.warning(f"Firestore outbox batch of {len(entries)} failed, retrying entries one by one: {e}")
+                done, failed = [], []
+                for entry in entries:
+                    try:
+                        await self._commit([entry])
+                        done.append(entry)
+                    except Exception as entry_error:
+                        failed.append((entry, str(entry_error) or entry_error.__class__.__name__))
+
+        await asyncio.to_thread(self._settle, done, failed)
+
+        now = time.time()
+        if done:
+            self.replicated_total += len(done)
+            self.last_replicated_at = now
+            self.last_batch_lag_seconds = now - min(entry["created_at"] for entry in done)
+        for entry, error in failed:
+            self.failed_attempts_total += 1
+            self.last_error = error
+            logger.error(f"Failed to replicate outbox entry {entry['id']} ({entry['op']}, attempt {entry['attempts'] + 1}): {error}")
+        return len(done)
+
+    async def _commit(self, entries: List[Dict[str, Any]]):
+        batch = self.firestore_db.batch()
+        for entry in entries:
+            writer = self._writers.get(entry["op"])
+            if writer is None:
+                raise ValueError(f"Unknown outbox operation {entry['op']}")
+            await writer(json.loads(entry["payload"]), batch)
+        await batch.commit()
+
+    def _fetch_due(self) -> List[Dict[str, Any]]:
+        rows = self._connections.connection().execute(
+            '''
+            SELECT id, op, payload, attempts, created_at FROM firestore_outbox
+            WHERE next_attempt_at <= ? AND attempts < ?
+            ORDER BY id LIMIT ?
+            ''',
+            (time.time(), self.max_attempts, self.batch_size)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _settle(self, done: List[Dict[str, Any]], failed: List[tuple]):
+        now = time.time()
+        with self._connections.transaction() as conn:
+            conn.executemany("DELETE FROM firestore_outbox WHERE id = ?", [(entry["id"],) for entry in done])
+            for entry, error in failed:
+                delay = min(self.retry_max_seconds, self.retry_base_seconds * (2 ** entry["attempts"]))
+                conn.execute(
+                    "UPDATE firestore_outbox SET attempts = attempts + 1, last_error = ?, next_attempt_at = ? WHERE id = ?",
+                    (error, now + delay, entry["id"])
+                )
+
+    def _select_stats(self) -> Dict[str, Any]:
+        row = self._connections.connection().execute(
+            '''
+            SELECT
+                SUM(attempts < ?) AS pending,
+                SUM(attempts >= ?) AS abandoned,
+                MIN(CASE WHEN attempts < ? THEN created_at END) AS oldest_created_at
+            FROM firestore_outbox
+            ''',
+            (self.max_attempts, self.max_attempts, self.max_attempts)
+        ).fetchone()
+        return dict(row)
+
+    async def stats(self) -> Dict[str, Any]:
+        """Outbox depth and replication lag, for monitoring."""
+        row = await asyncio.to_thread(self._select_stats)
+        now = time.time()
+        oldest = row["oldest_created_at"]
+        return {
+            "pending": row["pending"] or 0,
+            "abandoned": row["abandoned"] or 0,
+            "oldest_pending_age_seconds": round(now - oldest, 3) if oldest else 0.0,
+            "last_batch_lag_seconds": round(self.last_batch_lag_seconds, 3) if self.last_batch_lag_seconds is not None else None,
+            "seconds_since_last_replication": round(now - self.last_replicated_at, 3) if self.last_replicated_at else None,
+            "replicated_total": self.replicated_total,
+            "failed_attempts_total": self.failed_attempts_total,
+            "last_error": self.last_error,
+        }
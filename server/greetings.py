@@ -0,0 +1,111 @@
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from loguru import logger
+
+from highlight_store import HIGHLIGHT_TOKEN_BUDGET, CallHighlightStore
+from tokens import estimate_tokens, truncate_to_tokens
+
+CALL_HIGHLIGHT_DIR = Path(__file__).parent.parent / "call_highlights"
+
+
+def load_call_highlight(client_id: str) -> str:
+    """Highlight of the client's earlier calls within the prompt budget, or "" if there is none."""
+    try:
+        highlight = CallHighlightStore().render(client_id, HIGHLIGHT_TOKEN_BUDGET)
+        if highlight:
+            logger.info(f"Loaded previous call highlight (~{estimate_tokens(highlight)} tokens)")
+            return highlight
+    except Exception as e:
+        logger.error(f"Error loading call highlight: {e}")
+
+    # Clients whose last call predates the highlight store
+    highlight_file = os.path.join(CALL_HIGHLIGHT_DIR, f"{client_id}_highlights.txt")
+    if os.path.exists(highlight_file):
+        try:
+            with open(highlight_file, "r") as f:
+                highlight = truncate_to_tokens(f.read().strip(), HIGHLIGHT_TOKEN_BUDGET)
+                if highlight:
+                    logger.info("Loaded previous call highlight from legacy file")
+                    return highlight
+        except Exception as e:
+            logger.error(f"Error loading call highlight: {e}")
+
+    logger.info("No previous call highlight found")
+    return ""
+
+
+def client_first_name(client_info: Optional[Dict[str, Any]] = None, client_name: Optional[str] = None) -> Optional[str]:
+    """First name from the stored profile, else from the name given at login."""
+    if client_info:
+        return client_info.get('first_name')
+    if client_name and client_name.strip():
+        name_parts = client_name.strip().split()
+        if name_parts:
+            return name_parts[0]
+    return None
+
+
+def summary_from_highlight(call_highlight: str) -> str:
+    """First non-heading line of a rendered call highlight, as a short summary."""
+    for line in call_highlight.split('\n'):
+        if line.strip() and not line.startswith('#'):
+            return line.strip()[:100]
+    return ""
+
+
+def resolve_previous_summary(client_id: str, returning_client: bool, previous_summary: str = "",
+                             load_highlight: Optional[Callable[[str], str]] = None) -> str:
+    """
+    The previous-call summary the greeting refers to.
+
+    Falls back to the highlight store, then to the first line of the call
+    highlight returned by ``load_highlight`` (if given), when the caller did
+    not pass one.
+    """
+    if not returning_client or previous_summary:
+        return previous_summary
+
+    previous_summary = CallHighlightStore().latest_summary(client_id)[:100]
+    if previous_summary:
+        logger.info(f"Using previous call summary from highlight store: {previous_summary}")
+        return previous_summary
+
+    if load_highlight:
+        call_highlight = load_highlight(client_id)
+        if call_highlight:
+            previous_summary = summary_from_highlight(call_highlight)
+            if previous_summary:
+                logger.info(f"Using extracted call highlight as summary: {previous_summary}")
+    return previous_summary
+
+
+def build_initial_greeting(first_name: Optional[str], returning_client: bool, previous_summary: str = "") -> str:
+    if returning_client:
+        greeting_start = f"Hi {first_name}," if first_name else "Hi there,"
+        if previous_summary:
+            summary_snippet = previous_summary[:80] + ("..." if len(previous_summary) > 80 else "")
+            return f"{greeting_start} it's Neha from Mosaic Asset Management. Last time we spoke about: {summary_snippet}. How have you been?"
+        logger.warning("No previous summary found for returning client, using generic returning client greeting")
+        return f"{greeting_start} it's Neha from Mosaic Asset Management calling you back. I hope things have been going well since we last spoke. How have you been?"
+
+    greeting_start = f"Hello {first_name}," if first_name else "Hello,"
+    return f"{greeting_start} I'm Neha from Mosaic Asset Management, and I'm excited to connect with you today to discuss our exclusive alternate investment solutions. Is this a good time?"
+
+
+def initial_greeting_for(client_id: str, client_info: Optional[Dict[str, Any]] = None, client_name: Optional[str] = None,
+                         returning_client: bool = False, previous_summary: str = "",
+                         load_highlight: Optional[Callable[[str], str]] = None) -> Tuple[str, str]:
+    """
+    The scripted opening line of a call.
+
+    Used by the bot to speak it and by the server to pre-synthesize its audio
+    at /connect, so both must derive it from the same inputs.
+
+    Returns:
+        The greeting and the previous-call summary it was built from
+    """
+    previous_summary = resolve_previous_summary(client_id, returning_client, previous_summary, load_highlight)
+    greeting = build_initial_greeting(client_first_name(client_info, client_name), returning_client, previous_summary)
+    return greeting, previous_summary
@@ -0,0 +1,175 @@
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from sqlite_db import DB_PATH, SQLiteConnectionManager, run_migrations
+from tokens import estimate_tokens, truncate_to_tokens
+
+HIGHLIGHT_RETENTION = int(os.getenv("HIGHLIGHT_RETENTION", "5"))
+HIGHLIGHT_TOKEN_BUDGET = int(os.getenv("HIGHLIGHT_TOKEN_BUDGET", "600"))
+
+HIGHLIGHT_FIELDS = (
+    "client_type",
+    "has_minimum_investment",
+    "investor_sophistication",
+    "attitude",
+    "summary",
+    "notes",
+    "highlight",
+)
+
+
+class CallHighlightStore:
+    """
+    Per-call highlight records for each client, stored in SQLite.
+
+    The analyzer writes the LLM-generated highlight and the post-call processor
+    writes the profile fields, summary and notes; both upsert the same record
+    keyed by call ID. Only the newest ``retention`` records per client are kept.
+    ``render`` turns the records into the "PREVIOUS CALL HIGHLIGHT" prompt
+    section, newest call first, within a token budget.
+    """
+
+    def __init__(self, db_path=DB_PATH, retention: int = HIGHLIGHT_RETENTION):
+        self.retention = max(1, retention)
+        self._connections = SQLiteConnectionManager.for_path(db_path)
+        self._init_db()
+
+    def _init_db(self):
+        # The call_highlights table is created by the SQLite schema migrations
+        run_migrations(self._connections)
+
+    def upsert(self, call_id: str, client_id: str, **fields) -> bool:
+        """
+        Create or update the highlight record for a call.
+
+        Fields left as None keep their stored value, so the analyzer and the
+        post-call processor can each write their part in either order.
+
+        Args:
+            call_id: ID of the call
+            client_id: ID of the client
+            **fields: Any of HIGHLIGHT_FIELDS
+
+        Returns:
+            True if successful, False otherwise
+        """
+        unknown = set(fields) - set(HIGHLIGHT_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown highlight fields: {', '.join(sorted(unknown))}")
+
+        values = [fields.get(name) for name in HIGHLIGHT_FIELDS]
+        if values[1] is not None:
+            values[1] = int(bool(values[1]))
+        now = datetime.now().isoformat()
+
+        try:
+            with self._connections.transaction() as conn:
+                conn.execute(
+                    f'''
+                    INSERT INTO call_highlights (call_id, client_id, created_at, updated_at, {", ".join(HIGHLIGHT_FIELDS)})
+                    VALUES (?, ?, ?, ?, {", ".join("?" for _ in HIGHLIGHT_FIELDS)})
+                    ON CONFLICT(call_id) DO UPDATE SET
+                        updated_at = excluded.updated_at,
+                        {", ".join(f"{name} = COALESCE(excluded.{name}, call_highlights.{name})" for name in HIGHLIGHT_FIELDS)}
+                    ''',
+                    (call_id, client_id, now, now, *values)
+                )
+                self._compact(conn, client_id)
+            return True
+        except Exception as e:
+            logger.error(f"Error storing call highlight for call {call_id}: {e}")
+            return False
+
+    def _compact(self, conn, client_id: str):
+        removed = conn.execute(
+            '''
+            DELETE FROM call_highlights
+            WHERE client_id = ? AND call_id NOT IN (
+                SELECT call_id FROM call_highlights WHERE client_id = ?
+                ORDER BY created_at DESC LIMIT ?
+            )
+            ''',
+            (client_id, client_id, self.retention)
+        ).rowcount
+        if removed:
+            logger.info(f"Dropped {removed} old call highlights for client {client_id}")
+
+    def get_recent(self, client_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return the client's highlight records, newest first."""
+        rows = self._connections.connection().execute(
+            "SELECT * FROM call_highlights WHERE client_id = ? ORDER BY created_at DESC LIMIT ?",
+            (client_id, limit or self.retention)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def latest_summary(self, client_id: str) -> str:
+        """Return the summary of the client's most recent call, if any."""
+        row = self._connections.connection().execute(
+            '''
+            SELECT summary FROM call_highlights
+            WHERE client_id = ? AND summary IS NOT NULL AND summary != ''
+            ORDER BY created_at DESC LIMIT 1
+            ''',
+            (client_id,)
+        ).fetchone()
+        return row["summary"] if row else ""
+
+    def render(self, client_id: str, token_budget: int = HIGHLIGHT_TOKEN_BUDGET) -> str:
+        """
+        Render the client's highlights for the system prompt.
+
+        The profile comes from the newest record that has one; calls are then
+        added newest first until the token budget is used up. The newest call
+        is truncated rather than dropped if it does not fit on its own.
+
+        Args:
+            client_id: ID of the client
+            token_budget: Approximate maximum size of the rendered text
+
+        Returns:
+            The rendered highlight, or "" if the client has no records
+        """
+        records = self.get_recent(client_id)
+        if not records:
+            return ""
+
+        sections = []
+        profile = next((r for r in records if r["client_type"] or r["attitude"]), None)
+        if profile:
+            if profile["has_minimum_investment"] is None:
+                minimum_investment = "Unknown"
+            else:
+                minimum_investment = "Yes" if profile["has_minimum_investment"] else "No"
+            sections.append(
+                "# Client Profile\n"
+                f"Client Type: {profile['client_type'] or 'Unknown'}\n"
+                f"Minimum Investment Capacity: {minimum_investment}\n"
+                f"Investor Sophistication: {profile['investor_sophistication'] or 'Unknown'}\n"
+                f"Attitude: {profile['attitude'] or 'Unknown'}"
+            )
+
+        used = estimate_tokens("\n\n".join(sections))
+        for n, record in enumerate(records):
+            lines = [f"# Call on {record['created_at'][:10]}"]
+            if record["summary"]:
+                lines.append(f"Summary: {record['summary']}")
+            if record["notes"]:
+                lines.append(f"Notes: {record['notes']}")
+            if record["highlight"]:
+                lines.append(record["highlight"].strip())
+            if len(lines) == 1:
+                continue
+
+            section = "\n".join(lines)
+            remaining = token_budget - used
+            if estimate_tokens(section) > remaining:
+                if n == 0 and remaining > 0:
+                    sections.append(truncate_to_tokens(section, remaining))
+                break
+            sections.append(section)
+            used += estimate_tokens(section)
+
+        return "\n\n".join(sections)
@@ -0,0 +1,166 @@
+import os
+import asyncio
+import datetime
+from typing import Any, Dict, List, Optional
+
+import pytz
+from loguru import logger
+
+INCREMENTAL_POST_CALL = os.getenv("INCREMENTAL_POST_CALL", "true").lower() in ("1", "true", "yes")
+INCREMENTAL_SYNC_BATCH_SIZE = int(os.getenv("INCREMENTAL_SYNC_BATCH_SIZE", "4"))
+ROLLING_SUMMARY_EVERY = int(os.getenv("ROLLING_SUMMARY_EVERY", "10"))
+ROLLING_SUMMARY_MODEL = os.getenv("ROLLING_SUMMARY_MODEL", "gemini-2.0-flash-lite")
+
+INDIA_TZ = pytz.timezone('Asia/Kolkata')
+INTERRUPTED_MARKER = " [interrupted]"
+
+ROLLING_SUMMARY_PROMPT = """You maintain a running summary of a live sales call between Neha (assistant) and a client (user).
+Update the summary with the new lines of conversation. Keep it under 120 words and focus on the client's situation, interests and objections.
+
+CURRENT SUMMARY:
+{summary}
+
+NEW CONVERSATION:
+{conversation}
+
+UPDATED SUMMARY:"""
+
+
+def format_ist_timestamp(timestamp_str: Optional[str]) -> str:
+    """Render a transcript timestamp the way the post-call pipeline stores it."""
+    if not timestamp_str:
+        return ""
+    try:
+        timestamp = datetime.datetime.fromisoformat(timestamp_str.replace('T', ' ').replace('Z', '+00:00'))
+        return timestamp.astimezone(INDIA_TZ).strftime("%B %d, %Y at %I:%M:%S %p UTC+5:30")
+    except Exception as e:
+        logger.warning(f"Error parsing timestamp '{timestamp_str}': {e}")
+        return timestamp_str
+
+
+def format_transcript_entry(utterance: Dict[str, Any]) -> Dict[str, str]:
+    """Convert a stored utterance into a Firestore transcript entry."""
+    content = utterance["content"].strip()
+    if utterance.get("interrupted"):
+        content += INTERRUPTED_MARKER
+    return {
+        "content": content,
+        "speaker": utterance["role"],
+        "timestamp": format_ist_timestamp(utterance.get("ts")),
+    }
+
+
+class IncrementalCallProcessor:
+    """
+    Post-call work the bot can do while the call is still live.
+
+    Every utterance is formatted as it arrives and queued for the Firestore
+    call document through the SQLite outbox in batches of ``batch_size``,
+    together with the number of utterances queued so far, so the post-call
+    processor can skip the full transcript write. Going through the outbox
+    keeps these appends behind the call document's creation. Every ``summary_every`` utterances a rolling summary
+    is refreshed with a small model and stored on the call row, leaving only the
+    final structured synthesis for after hangup.
+
+    SQLite and LLM calls run in background tasks so the pipeline's
+    transcript handler never waits on them.
+    """
+
+    def __init__(self, call_id: str, sqlite_db,
+                 batch_size: int = INCREMENTAL_SYNC_BATCH_SIZE,
+                 summary_every: int = ROLLING_SUMMARY_EVERY,
+                 summary_model: str = ROLLING_SUMMARY_MODEL):
+        self.call_id = call_id
+        self.sqlite_db = sqlite_db
+        self.batch_size = max(1, batch_size)
+        self.summary_every = summary_every
+        self.summary_model = summary_model
+
+        self.utterance_count = 0
+        self.synced_count = 0
+        self.summary = ""
+        self._pending: List[Dict[str, str]] = []
+        self._unsummarized: List[Dict[str, Any]] = []
+        self._sync_lock = asyncio.Lock()
+        self._summary_lock = asyncio.Lock()
+        self._tasks = set()
+        self._genai = None
+
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if self.summary_every > 0 and api_key:
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            self._genai = genai
+        elif self.summary_every > 0:
+            logger.warning("GOOGLE_API_KEY not set, rolling call summaries disabled")
+
+    def add(self, utterance: Dict[str, Any]):
+        """Queue one utterance (role, ts, content, interrupted) for processing."""
+        self.utterance_count += 1
+
+        self._pending.append(format_transcript_entry(utterance))
+        if len(self._pending) >= self.batch_size:
+            self._spawn(self._sync())
+
+        if self._genai is not None:
+            self._unsummarized.append(utterance)
+            if len(self._unsummarized) >= self.summary_every:
+                self._spawn(self._summarize())
+
+    async def close(self):
+        """
+        Wait for in-flight work and sync whatever is still pending.
+
+        The bot marks the call's transcript closed only after this returns;
+        post-call processing trusts ``transcript_synced_count`` from then on.
+        """
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        await self._sync()
+        logger.info(
+            f"Incremental processing for call {self.call_id} finished: "
+            f"{self.synced_count}/{self.utterance_count} utterances queued for Firestore"
+        )
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _sync(self):
+        async with self._sync_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            synced_count = self.synced_count + len(batch)
+            try:
+                success = await asyncio.to_thread(
+                    self.sqlite_db.queue_transcript_sync, self.call_id, batch, synced_count
+                )
+            except Exception as e:
+                logger.error(f"Error queueing transcript sync for call {self.call_id}: {e}")
+                success = False
+            if not success:
+                # Leave the sync count where it is so post-call rewrites the
+                # full transcript.
+                logger.error(f"Failed to queue {len(batch)} utterances for Firestore for call {self.call_id}")
+                return
+            self.synced_count = synced_count
+
+    async def _summarize(self):
+        async with self._summary_lock:
+            if not self._unsummarized:
+                return
+            batch, self._unsummarized = self._unsummarized, []
+            conversation = "\n".join(f"{u['role']}: {u['content']}" for u in batch)
+            prompt = ROLLING_SUMMARY_PROMPT.format(summary=self.summary or "(none yet)", conversation=conversation)
+            try:
+                model = self._genai.GenerativeModel(self.summary_model)
+                response = await model.generate_content_async(prompt)
+                if not response.parts:
+                    return
+                self.summary = response.text.strip()
+                await asyncio.to_thread(self.sqlite_db.update_rolling_summary, self.call_id, self.summary)
+                logger.debug(f"Updated rolling summary for call {self.call_id}")
+            except Exception as e:
+                logger.error(f"Error updating rolling summary for call {self.call_id}: {e}")
@@ -0,0 +1,194 @@
+import os
+import uuid
+import time
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from sqlite_db import DB_PATH, SQLiteConnectionManager, run_migrations
+
+POST_CALL_WORKERS = int(os.getenv("POST_CALL_WORKERS", "2"))
+POST_CALL_MAX_ATTEMPTS = int(os.getenv("POST_CALL_MAX_ATTEMPTS", "3"))
+POST_CALL_RETRY_BASE_SECONDS = float(os.getenv("POST_CALL_RETRY_BASE_SECONDS", "5"))
+POST_CALL_POLL_INTERVAL = float(os.getenv("POST_CALL_POLL_INTERVAL", "2"))
+# A job waits for the bot to mark the call's transcript closed; past this it
+# runs anyway (the bot crashed or was killed before writing the marker)
+POST_CALL_TRANSCRIPT_WAIT_SECONDS = float(os.getenv("POST_CALL_TRANSCRIPT_WAIT_SECONDS", "120"))
+
+JobHandler = Callable[[str, str], Awaitable[None]]
+
+
+class PostCallJobQueue:
+    """
+    Persistent post-call work queue backed by the local SQLite database.
+
+    /analyze enqueues a job and returns immediately; ``workers`` async tasks
+    claim queued jobs and run ``handler(call_id, client_id)``. The client calls
+    /analyze as soon as it hangs up, while the bot may still be flushing the
+    transcript, so a job is only claimed once the bot has marked the call's
+    transcript closed, or ``transcript_wait_seconds`` after it was queued. A
+    job whose handler raises is retried with exponential backoff until
+    ``max_attempts`` is reached, after which it is marked ``failed``. Jobs
+    left ``running`` by a crashed server are re-queued on start. Queue reads
+    and writes run in a worker thread so they never block the event loop on
+    SQLite locks.
+    """
+
+    def __init__(self, handler: JobHandler, db_path=DB_PATH, workers: int = POST_CALL_WORKERS,
+                 max_attempts: int = POST_CALL_MAX_ATTEMPTS,
+                 retry_base_seconds: float = POST_CALL_RETRY_BASE_SECONDS,
+                 poll_interval: float = POST_CALL_POLL_INTERVAL,
+                 transcript_wait_seconds: float = POST_CALL_TRANSCRIPT_WAIT_SECONDS):
+        self.handler = handler
+        self.db_path = db_path
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base_seconds = retry_base_seconds
+        self.poll_interval = poll_interval
+        self.transcript_wait_seconds = transcript_wait_seconds
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._connections = SQLiteConnectionManager.for_path(db_path)
+        self._init_db()
+
+    def _init_db(self):
+        # The post_call_jobs table is created by the SQLite schema migrations
+        run_migrations(self._connections)
+
+    async def enqueue(self, call_id: str, client_id: str) -> str:
+        """
+        Queue post-call processing for a call.
+
+        Args:
+            call_id: ID of the finished call
+            client_id: ID of the client on the call
+
+        Returns:
+            The ID of the queued job
+        """
+        job_id = await asyncio.to_thread(self._insert_job, call_id, client_id)
+        self._wakeup.set()
+        return job_id
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the job row or None if not found."""
+        return await asyncio.to_thread(self._select_job, job_id)
+
+    def _insert_job(self, call_id: str, client_id: str) -> str:
+        job_id = str(uuid.uuid4())
+        now = datetime.now().isoformat()
+        with self._connections.transaction() as conn:
+            conn.execute(
+                '''
+                INSERT INTO post_call_jobs (id, call_id, client_id, status, attempts, next_run_at, created_at, updated_at)
+                VALUES (?, ?, ?, 'queued', 0, ?, ?, ?)
+                ''',
+                (job_id, call_id, client_id, time.time(), now, now)
+            )
+        return job_id
+
+    def _select_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connections.connection().execute("SELECT * FROM post_call_jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        conn = self._connections.connection()
+        try:
+            # BEGIN IMMEDIATE takes the write lock up front so two workers can
+            # never claim the same job.
+            conn.execute("BEGIN IMMEDIATE")
+            wait_cutoff = (datetime.now() - timedelta(seconds=self.transcript_wait_seconds)).isoformat()
+            row = conn.execute(
+                '''
+                SELECT j.*, c.transcript_closed_at FROM post_call_jobs j
+                LEFT JOIN calls c ON c.id = j.call_id
+                WHERE j.status = 'queued' AND j.next_run_at <= ?
+                  AND (c.transcript_closed_at IS NOT NULL OR j.created_at <= ?)
+                ORDER BY j.next_run_at LIMIT 1
+                ''',
+                (time.time(), wait_cutoff)
+            ).fetchone()
+            if not row:
+                conn.rollback()
+                return None
+            conn.execute(
+                "UPDATE post_call_jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (datetime.now().isoformat(), row["id"])
+            )
+            conn.commit()
+            job = dict(row)
+            job["attempts"] += 1
+            return job
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+
+    def _finish(self, job: Dict[str, Any], error: Optional[str] = None):
+        if error is None:
+            status, next_run_at = "succeeded", job["next_run_at"]
+        elif job["attempts"] >= self.max_attempts:
+            status, next_run_at = "failed", job["next_run_at"]
+        else:
+            status = "queued"
+            next_run_at = time.time() + self.retry_base_seconds * (2 ** (job["attempts"] - 1))
+
+        with self._connections.transaction() as conn:
+            conn.execute(
+                "UPDATE post_call_jobs SET status = ?, last_error = ?, next_run_at = ?, updated_at = ? WHERE id = ?",
+                (status, error, next_run_at, datetime.now().isoformat(), job["id"])
+            )
+        return status
+
+    def _requeue_running(self) -> int:
+        with self._connections.transaction() as conn:
+            return conn.execute(
+                "UPDATE post_call_jobs SET status = 'queued', updated_at = ? WHERE status = 'running'",
+                (datetime.now().isoformat(),)
+            ).rowcount
+
+    async def start(self):
+        """Re-queue interrupted jobs and start the worker tasks."""
+        recovered = await asyncio.to_thread(self._requeue_running)
+        if recovered:
+            logger.info(f"Re-queued {recovered} interrupted post-call jobs")
+
+        for n in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(n)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _worker(self, n: int):
+        while True:
+            job = await asyncio.to_thread(self._claim)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            logger.info(f"Post-call worker {n} running job {job['id']} for call {job['call_id']} (attempt {job['attempts']})")
+            if not job["transcript_closed_at"]:
+                logger.warning(f"Bot never closed the transcript of call {job['call_id']}, processing what was written")
+            try:
+                await self.handler(job["call_id"], job["client_id"])
+                error = None
+            except asyncio.CancelledError:
+                # Leave the job 'running'; it is re-queued on next start.
+                raise
+            except Exception as e:
+                error = str(e) or e.__class__.__name__
+
+            status = await asyncio.to_thread(self._finish, job, error)
+            if error:
+                logger.error(f"Post-call job {job['id']} attempt {job['attempts']} failed ({status}): {error}")
+            else:
+                logger.info(f"Post-call job {job['id']} succeeded")
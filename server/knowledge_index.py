@@ -0,0 +1,188 @@
+import os
+import re
+import json
+import math
+import hashlib
+import argparse
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+KNOWLEDGE_BASE_FILE = Path(__file__).parent.parent / "prompts" / "bot_knowledge.txt"
+KNOWLEDGE_INDEX_FILE = Path(
+    os.getenv("KNOWLEDGE_INDEX_FILE", Path(__file__).parent.parent / "data" / "kb_index.json")
+)
+KNOWLEDGE_CHUNK_CHARS = int(os.getenv("KNOWLEDGE_CHUNK_CHARS", "800"))
+
+INDEX_FORMAT_VERSION = 1
+
+STOPWORDS = {
+    "a", "about", "an", "and", "are", "as", "at", "be", "but", "by", "can", "do", "does", "for", "from",
+    "has", "have", "how", "i", "if", "in", "is", "it", "its", "me", "my", "of", "on", "or", "so", "that",
+    "the", "their", "there", "this", "to", "was", "we", "what", "when", "which", "who", "will", "with",
+    "would", "you", "your",
+}
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return [word for word in _WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def chunk_knowledge_base(text: str, max_chars: int = KNOWLEDGE_CHUNK_CHARS) -> List[str]:
+    """
+    Split a markdown knowledge base into retrieval chunks.
+
+    Chunks follow the heading structure; sections longer than ``max_chars``
+    are split between lines. Every chunk starts with the headings it sits
+    under, so it still makes sense on its own.
+    """
+    chunks = []
+    headings: List[str] = []
+    lines: List[str] = []
+
+    def flush():
+        body = [line for line in lines if line.strip()]
+        if not body:
+            return
+        prefix = "\n".join(headings)
+        budget = max(max_chars - len(prefix), max_chars // 2)
+        current: List[str] = []
+        size = 0
+        for line in body:
+            if current and size + len(line) > budget:
+                chunks.append("\n".join([prefix, *current]).strip())
+                current, size = [], 0
+            current.append(line)
+            size += len(line) + 1
+        if current:
+            chunks.append("\n".join([prefix, *current]).strip())
+
+    for line in text.splitlines():
+        match = _HEADING.match(line)
+        if match:
+            flush()
+            lines = []
+            level = len(match.group(1))
+            headings = [h for h in headings if len(h) - len(h.lstrip("#")) < level]
+            headings.append(line.strip())
+        else:
+            lines.append(line.rstrip())
+    flush()
+    return chunks
+
+
+class BM25Index:
+    """Okapi BM25 over knowledge-base chunks."""
+
+    def __init__(self, chunks: List[str], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(tokenize(chunk)) for chunk in chunks]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        doc_freqs: Counter = Counter()
+        for tf in self.term_freqs:
+            doc_freqs.update(tf.keys())
+        n = len(chunks)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freqs.items()}
+
+    def search(self, query: str, k: int = 3) -> List[Tuple[float, str]]:
+        """Return up to ``k`` (score, chunk) pairs with a positive score, best first."""
+        terms = set(tokenize(query))
+        if not terms or not self.chunks:
+            return []
+        scores = []
+        for n, tf in enumerate(self.term_freqs):
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[n] / (self.avg_length or 1))
+            score = sum(
+                self.idf[term] * tf[term] * (self.k1 + 1) / (tf[term] + norm)
+                for term in terms if term in tf
+            )
+            if score > 0:
+                scores.append((score, n))
+        scores.sort(reverse=True)
+        return [(score, self.chunks[n]) for score, n in scores[:k]]
+
+    def to_dict(self) -> Dict:
+        return {
+            "chunks": self.chunks,
+            "k1": self.k1,
+            "b": self.b,
+            "term_freqs": [dict(tf) for tf in self.term_freqs],
+            "lengths": self.lengths,
+            "avg_length": self.avg_length,
+            "idf": self.idf,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "BM25Index":
+        index = cls.__new__(cls)
+        index.chunks = data["chunks"]
+        index.k1 = data["k1"]
+        index.b = data["b"]
+        index.term_freqs = [Counter(tf) for tf in data["term_freqs"]]
+        index.lengths = data["lengths"]
+        index.avg_length = data["avg_length"]
+        index.idf = data["idf"]
+        return index
+
+
+def load_or_build_index(source=KNOWLEDGE_BASE_FILE, index_path=KNOWLEDGE_INDEX_FILE,
+                        max_chars: int = KNOWLEDGE_CHUNK_CHARS) -> Optional[BM25Index]:
+    """
+    Load the knowledge-base index from disk, rebuilding it if the source changed.
+
+    The stored index is keyed by the SHA-256 of the knowledge base file and
+    the chunking settings.
+
+    Returns:
+        The index, or None if the knowledge base file does not exist
+    """
+    source, index_path = Path(source), Path(index_path)
+    if not source.exists():
+        logger.warning(f"Knowledge base file not found at {source}")
+        return None
+
+    text = source.read_text()
+    digest = hashlib.sha256(f"{INDEX_FORMAT_VERSION}:{max_chars}:{text}".encode("utf-8")).hexdigest()
+
+    try:
+        with open(index_path, "r") as f:
+            stored = json.load(f)
+        if stored.get("digest") == digest:
+            return BM25Index.from_dict(stored["index"])
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Rebuilding unreadable knowledge index {index_path}: {e}")
+
+    index = BM25Index(chunk_knowledge_base(text, max_chars))
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = index_path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"digest": digest, "source": str(source), "index": index.to_dict()}, f, indent=2)
+    os.replace(tmp_path, index_path)
+    logger.info(f"Built knowledge index with {len(index.chunks)} chunks at {index_path}")
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the knowledge-base index")
+    parser.add_argument("query", nargs="?", help="Query to run against the index")
+    parser.add_argument("-k", type=int, default=3, help="Number of chunks to return")
+    args = parser.parse_args()
+
+    index = load_or_build_index()
+    if index and args.query:
+        for score, chunk in index.search(args.query, args.k):
+            print(f"--- {score:.2f}\n{chunk}\n")
+
+
+if __name__ == "__main__":
+    main()
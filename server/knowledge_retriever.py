@@ -0,0 +1,73 @@
+import os
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from pipecat.frames.frames import Frame
+from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContextFrame
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from context_window import get_standard_messages, message_text, set_standard_messages
+from knowledge_index import BM25Index
+
+KNOWLEDGE_RETRIEVAL_ENABLED = os.getenv("KNOWLEDGE_RETRIEVAL_ENABLED", "true").lower() in ("1", "true", "yes")
+KNOWLEDGE_TOP_K = int(os.getenv("KNOWLEDGE_TOP_K", "3"))
+# Chunks scoring below this are matches on incidental words; skip them
+KNOWLEDGE_MIN_SCORE = float(os.getenv("KNOWLEDGE_MIN_SCORE", "1.0"))
+
+KNOWLEDGE_MARKER = "[Relevant knowledge base excerpts for the next reply]"
+
+
+class KnowledgeRetriever(FrameProcessor):
+    """
+    Injects the knowledge-base chunks relevant to the caller's latest utterance.
+
+    Sits just before the LLM. On each request it searches the index with the
+    latest user message (and the assistant message it answers) and places the
+    top ``top_k`` chunks in a single message right before that user message.
+    The excerpts message from the previous turn is removed first, so only the
+    current excerpts are ever in the context.
+    """
+
+    def __init__(self, index: BM25Index, top_k: int = KNOWLEDGE_TOP_K, min_score: float = KNOWLEDGE_MIN_SCORE, **kwargs):
+        super().__init__(**kwargs)
+        self.index = index
+        self.top_k = top_k
+        self.min_score = min_score
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, OpenAILLMContextFrame) and direction == FrameDirection.DOWNSTREAM:
+            try:
+                self.inject(frame.context)
+            except Exception as e:
+                logger.error(f"Error injecting knowledge base excerpts: {e}")
+
+        await self.push_frame(frame, direction)
+
+    def inject(self, context):
+        """Replace the excerpts in ``context`` with those for its latest user message."""
+        messages = get_standard_messages(context)
+        stale = [m for m in messages if message_text(m).startswith(KNOWLEDGE_MARKER)]
+        messages = [m for m in messages if not message_text(m).startswith(KNOWLEDGE_MARKER)]
+
+        last_user = next((n for n in range(len(messages) - 1, -1, -1) if messages[n].get("role") == "user"), None)
+        excerpts = self._excerpts(messages, last_user) if last_user is not None else None
+
+        if excerpts:
+            messages.insert(last_user, {"role": "user", "content": f"{KNOWLEDGE_MARKER}\n{excerpts}"})
+        elif not stale:
+            return
+        set_standard_messages(context, messages)
+
+    def _excerpts(self, messages: List[Dict[str, Any]], last_user: int) -> Optional[str]:
+        query = message_text(messages[last_user])
+        if last_user > 0 and messages[last_user - 1].get("role") == "assistant":
+            query = f"{message_text(messages[last_user - 1])} {query}"
+
+        results = [(score, chunk) for score, chunk in self.index.search(query, self.top_k) if score >= self.min_score]
+        if not results:
+            return None
+        logger.debug(f"Retrieved {len(results)} knowledge chunks (best score {results[0][0]:.2f})")
+        return "\n\n".join(chunk for _, chunk in results)
@@ -0,0 +1,140 @@
+import os
+import time
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    BotInterruptionFrame,
+    BotStartedSpeakingFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+    StartInterruptionFrame,
+    TranscriptionFrame,
+    TTSAudioRawFrame,
+    TTSStartedFrame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.observers.base_observer import BaseObserver
+
+from sqlite_db import TURN_STAGES
+
+LATENCY_TRACING_ENABLED = os.getenv("LATENCY_TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Frame type -> stage recorded when the frame is first seen in a turn
+_BOT_STAGES = (
+    (LLMFullResponseStartFrame, "llm_start"),
+    (LLMTextFrame, "llm_first_token"),
+    (LLMFullResponseEndFrame, "llm_end"),
+    (TTSStartedFrame, "tts_start"),
+    (TTSAudioRawFrame, "tts_first_audio"),
+    (BotStartedSpeakingFrame, "audio_out"),
+)
+
+
+class TurnLatencyObserver(BaseObserver):
+    """
+    Records when each stage of a conversational turn happened.
+
+    A turn runs from the user starting to speak (or the bot speaking
+    unprompted, e.g. the greeting) until the next one begins. For each turn
+    it records VAD end, final transcript, LLM start, first LLM token, LLM
+    completion, TTS start, first TTS audio and bot audio start, using the
+    pipeline clock timestamps pipecat passes to observers. Frames are seen
+    at every hop, so bot-side stages keep the first sighting; user-side
+    stages keep the last one before the LLM starts, since the user may pause
+    and carry on.
+
+    Finished turns are written to the call_turn_metrics table in a worker
+    thread; ``close()`` writes the last one.
+    """
+
+    def __init__(self, call_id: str, sqlite_db=None):
+        self.call_id = call_id
+        self.sqlite_db = sqlite_db
+        self.turns: List[Dict[str, Any]] = []
+        self._turn: Optional[Dict[str, Any]] = None
+        self._turn_count = 0
+        self._write_tasks = set()
+
+    async def on_push_frame(self, src, dst, frame, direction, timestamp):
+        # Pipeline clock nanoseconds; fall back to our own clock if there is none
+        now = (timestamp or time.monotonic_ns()) / 1e9
+
+        if isinstance(frame, UserStartedSpeakingFrame):
+            if self._turn is None or self._bot_responded():
+                self._start_turn()
+            else:
+                # The user paused and carried on before the bot answered
+                self._turn["vad_end_at"] = None
+            return
+
+        if isinstance(frame, (UserStoppedSpeakingFrame, TranscriptionFrame)):
+            if self._turn is None or self._bot_responded():
+                self._start_turn()
+            stage = "vad_end_at" if isinstance(frame, UserStoppedSpeakingFrame) else "transcript_at"
+            self._turn[stage] = now
+            return
+
+        if isinstance(frame, (StartInterruptionFrame, BotInterruptionFrame)):
+            if self._turn is not None and self._turn.get("audio_out_at") is not None:
+                self._turn["interrupted"] = True
+            return
+
+        for frame_type, stage in _BOT_STAGES:
+            if isinstance(frame, frame_type):
+                # A second LLM response without user input is a new turn
+                if self._turn is None or (stage == "llm_start" and self._turn.get("llm_end_at") is not None):
+                    self._start_turn()
+                if self._turn.get(f"{stage}_at") is None:
+                    self._turn[f"{stage}_at"] = now
+                return
+
+    def _bot_responded(self) -> bool:
+        return self._turn is not None and self._turn.get("llm_start_at") is not None
+
+    def _start_turn(self):
+        self._finish_turn()
+        self._turn_count += 1
+        self._turn = {
+            "turn": self._turn_count,
+            "started_at": datetime.now().isoformat(),
+            "interrupted": False,
+        }
+
+    def _finish_turn(self):
+        turn, self._turn = self._turn, None
+        if turn is None or not any(turn.get(f"{stage}_at") is not None for stage in TURN_STAGES):
+            return
+        self.turns.append(turn)
+        self._log(turn)
+        if self.sqlite_db is not None:
+            task = asyncio.create_task(self._write([turn]))
+            self._write_tasks.add(task)
+            task.add_done_callback(self._write_tasks.discard)
+
+    def _log(self, turn: Dict[str, Any]):
+        def delta(start, end):
+            a, b = turn.get(f"{start}_at"), turn.get(f"{end}_at")
+            return f"{(b - a) * 1000:.0f}ms" if a is not None and b is not None else "-"
+
+        logger.debug(
+            f"Turn {turn['turn']} latency: voice-to-voice {delta('vad_end', 'audio_out')}, "
+            f"LLM TTFB {delta('llm_start', 'llm_first_token')}, TTS TTFB {delta('tts_start', 'tts_first_audio')}"
+        )
+
+    async def _write(self, turns: List[Dict[str, Any]]):
+        try:
+            await asyncio.to_thread(self.sqlite_db.add_call_turn_metrics, self.call_id, turns)
+        except Exception as e:
+            logger.error(f"Error writing turn latency metrics for call {self.call_id}: {e}")
+
+    async def close(self):
+        """Record the turn in progress and wait for pending writes."""
+        self._finish_turn()
+        if self._write_tasks:
+            await asyncio.gather(*list(self._write_tasks), return_exceptions=True)
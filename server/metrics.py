@@ -0,0 +1,127 @@
+import os
+import math
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, List
+
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "1024"))
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of ``values`` (``q`` in 0-100); 0.0 when empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class LatencyRecorder:
+    """
+    Rolling latency samples per operation name, summarised as percentiles.
+
+    Only the last ``window`` samples of each name are kept, so the summary
+    reflects recent behaviour and memory stays bounded. Failed operations
+    are counted and timed like successful ones; cancelled ones (e.g. the
+    losing side of a race) are not recorded at all.
+    """
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.window = max(1, window)
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, ok: bool = True):
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(seconds)
+            self._counts[name] = self._counts.get(name, 0) + 1
+            if not ok:
+                self._errors[name] = self._errors.get(name, 0) + 1
+
+    @contextmanager
+    def timer(self, name: str):
+        """Time the enclosed block (sync or awaiting) under ``name``."""
+        start = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except Exception:
+            ok = False
+            raise
+        except BaseException:
+            # Cancelled: the sample would only measure when we gave up
+            start = None
+            raise
+        finally:
+            if start is not None:
+                self.record(name, time.perf_counter() - start, ok)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per-name count, error count and p50/p95/p99/max latency in milliseconds."""
+        with self._lock:
+            snapshot = {name: list(samples) for name, samples in self._samples.items()}
+            counts = dict(self._counts)
+            errors = dict(self._errors)
+        return {
+            name: {
+                "count": counts.get(name, 0),
+                "errors": errors.get(name, 0),
+                "p50_ms": round(percentile(samples, 50) * 1000, 1),
+                "p95_ms": round(percentile(samples, 95) * 1000, 1),
+                "p99_ms": round(percentile(samples, 99) * 1000, 1),
+                "max_ms": round(max(samples) * 1000, 1) if samples else 0.0,
+            }
+            for name, samples in sorted(snapshot.items())
+        }
+
+
+# Shared by the server's request handlers
+latency_metrics = LatencyRecorder()
+
+
+# Turn latency segments: name -> (from stage, to stage), see sqlite_db.TURN_STAGES
+TURN_LATENCY_SEGMENTS = {
+    "voice_to_voice": ("vad_end", "audio_out"),
+    "transcript_after_vad": ("vad_end", "transcript"),
+    "vad_to_llm_start": ("vad_end", "llm_start"),
+    "llm_ttfb": ("llm_start", "llm_first_token"),
+    "llm_total": ("llm_start", "llm_end"),
+    "tts_ttfb": ("tts_start", "tts_first_audio"),
+    "llm_start_to_audio_out": ("llm_start", "audio_out"),
+}
+
+
+def summarize_turn_latencies(turns: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aggregate per-turn stage timestamps into latency percentiles.
+
+    Args:
+        turns: call_turn_metrics rows (``<stage>_at`` seconds per stage)
+
+    Returns:
+        Turn and interruption counts plus count/p50/p95/p99 in milliseconds for
+        each segment in TURN_LATENCY_SEGMENTS; turns missing either stage of a
+        segment are left out of it
+    """
+    segments = {}
+    for name, (start, end) in TURN_LATENCY_SEGMENTS.items():
+        samples = [
+            turn[f"{end}_at"] - turn[f"{start}_at"]
+            for turn in turns
+            if turn.get(f"{start}_at") is not None and turn.get(f"{end}_at") is not None
+        ]
+        segments[name] = {
+            "count": len(samples),
+            "p50_ms": round(percentile(samples, 50) * 1000, 1),
+            "p95_ms": round(percentile(samples, 95) * 1000, 1),
+            "p99_ms": round(percentile(samples, 99) * 1000, 1),
+        }
+    return {
+        "turns": len(turns),
+        "interrupted_turns": sum(1 for turn in turns if turn.get("interrupted")),
+        "segments": segments,
+    }
@@ -0,0 +1,99 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from pipecat.services.cartesia.tts import CartesiaTTSService
+from pipecat.services.deepgram.stt import DeepgramSTTService
+
+
+class PreconnectedDeepgramSTTService(DeepgramSTTService):
+    """
+    DeepgramSTTService whose live connection can be opened before the pipeline starts.
+
+    ``preconnect`` opens the connection with the sample rate the pipeline is
+    expected to use; ``start`` then reuses it instead of connecting again, or
+    waits for a pre-connection that is still opening. If the pipeline turns out
+    to use other settings the pre-connection is closed and a new one opened.
+    Deepgram's SDK keeps the connection alive while no audio is flowing.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._connect_lock = asyncio.Lock()
+        self._preconnected_settings: Optional[Dict[str, Any]] = None
+
+    @property
+    def preconnected(self) -> bool:
+        return self._preconnected_settings is not None
+
+    async def preconnect(self, sample_rate: int) -> bool:
+        async with self._connect_lock:
+            self._settings["sample_rate"] = self._init_sample_rate or sample_rate
+            await super()._connect()
+            if not await self._connection.is_connected():
+                return False
+            self._preconnected_settings = dict(self._settings)
+            return True
+
+    async def close_preconnection(self):
+        """Close a connection the pipeline never picked up."""
+        async with self._connect_lock:
+            if self._preconnected_settings is not None:
+                self._preconnected_settings = None
+                await self._disconnect()
+
+    async def _connect(self):
+        async with self._connect_lock:
+            if self._preconnected_settings is not None:
+                settings, self._preconnected_settings = self._preconnected_settings, None
+                if settings == self._settings:
+                    logger.debug(f"{self}: Using pre-connected Deepgram connection")
+                    return
+                await self._disconnect()
+            await super()._connect()
+
+    async def _on_error(self, *args, **kwargs):
+        # A pre-connection that failed is replaced, never reused
+        self._preconnected_settings = None
+        await super()._on_error(*args, **kwargs)
+
+
+class PreconnectedCartesiaTTSService(CartesiaTTSService):
+    """
+    CartesiaTTSService whose websocket can be opened before the pipeline starts.
+
+    The base service already reuses an open websocket when it starts; this
+    only makes ``start`` wait for a ``preconnect`` still in progress instead
+    of opening a second socket.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._connect_lock = asyncio.Lock()
+
+    @property
+    def started(self) -> bool:
+        return self._receive_task is not None
+
+    async def preconnect(self) -> bool:
+        await self._connect_websocket()
+        return self._websocket is not None
+
+    async def keep_alive(self):
+        """Ping a pre-connected websocket, reconnecting if it was dropped."""
+        async with self._connect_lock:
+            if self.started or not self._websocket or await self._verify_connection():
+                return
+            logger.warning(f"{self}: Pre-connected websocket dropped, reconnecting")
+            await self._disconnect_websocket()
+            await super()._connect_websocket()
+
+    async def close_preconnection(self):
+        """Close a websocket the pipeline never picked up."""
+        if not self.started and self._websocket:
+            await self._disconnect_websocket()
+
+    async def _connect_websocket(self):
+        async with self._connect_lock:
+            await super()._connect_websocket()
@@ -0,0 +1,107 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "1024"))
+PROFILE_CACHE_TTL_SECONDS = float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "300"))
+
+
+class ClientProfileCache:
+    """
+    In-process LRU/TTL cache of client profiles and latest-call metadata.
+
+    Entries are keyed by client id, with a secondary phone-number index so
+    /login can resolve a caller without a store lookup. The profile and the
+    latest-call metadata expire independently after ``ttl`` seconds and can
+    be invalidated separately: a registration replaces the profile, while a
+    new or finished call only makes the latest-call metadata stale. Cached
+    dicts are copied on the way in and out, so callers may modify them.
+    """
+
+    def __init__(self, max_size: int = PROFILE_CACHE_SIZE, ttl: float = PROFILE_CACHE_TTL_SECONDS):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._phones: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, client_id: str, field: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(client_id)
+            cached = entry.get(field) if entry else None
+            if cached is None or cached[1] <= time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(client_id)
+            self.hits += 1
+            return dict(cached[0])
+
+    def _store(self, client_id: str, field: str, value: Dict[str, Any]):
+        with self._lock:
+            entry = self._entries.setdefault(client_id, {})
+            entry[field] = (dict(value), time.monotonic() + self.ttl)
+            self._entries.move_to_end(client_id)
+            while len(self._entries) > self.max_size:
+                evicted_id, evicted = self._entries.popitem(last=False)
+                self._drop_phone(evicted_id, evicted)
+
+    def _drop_phone(self, client_id: str, entry: Dict[str, Any]):
+        client = entry.get("client")
+        phone = client[0].get("phone_number") if client else None
+        if phone and self._phones.get(phone) == client_id:
+            del self._phones[phone]
+
+    def get_client(self, client_id: str) -> Optional[Dict[str, Any]]:
+        """Return the cached profile (SQLite field names) for a client."""
+        return self._lookup(client_id, "client")
+
+    def get_client_id_by_phone(self, phone_number: str) -> Optional[str]:
+        """Return the id of the client with a phone number, if their profile is cached."""
+        with self._lock:
+            client_id = self._phones.get(phone_number)
+        if client_id and self.get_client(client_id) is not None:
+            return client_id
+        return None
+
+    def put_client(self, client_info: Dict[str, Any]):
+        """Cache a client profile; it must carry ``id`` and may carry ``phone_number``."""
+        client_id = client_info.get("id")
+        if not client_id:
+            return
+        self._store(client_id, "client", client_info)
+        phone = client_info.get("phone_number")
+        if phone:
+            with self._lock:
+                self._phones[phone] = client_id
+
+    def get_latest_call(self, client_id: str) -> Optional[Dict[str, Any]]:
+        return self._lookup(client_id, "latest_call")
+
+    def put_latest_call(self, client_id: str, latest_call: Dict[str, Any]):
+        self._store(client_id, "latest_call", latest_call)
+
+    def invalidate_latest_call(self, client_id: str):
+        """Forget a client's latest-call metadata (a call started or was processed)."""
+        with self._lock:
+            entry = self._entries.get(client_id)
+            if entry:
+                entry.pop("latest_call", None)
+
+    def invalidate(self, client_id: Optional[str] = None, phone_number: Optional[str] = None):
+        """Forget everything cached for a client, by id and/or phone number."""
+        with self._lock:
+            if phone_number:
+                client_id = client_id or self._phones.get(phone_number)
+                self._phones.pop(phone_number, None)
+            if client_id:
+                entry = self._entries.pop(client_id, None)
+                if entry:
+                    self._drop_phone(client_id, entry)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,123 @@
+import os
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from tokens import estimate_tokens
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class PromptFragment:
+    """A piece of prompt text with its content hash and token count."""
+
+    __slots__ = ("name", "text", "digest", "tokens")
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = text
+        self.digest = _digest(text)
+        self.tokens = estimate_tokens(text)
+
+
+class CompiledPrompt:
+    """
+    The assembled prompt plus per-section token accounting.
+
+    The prompt is a static prefix (identical across calls, so it can be cached
+    by the LLM provider) followed by a per-call dynamic suffix.
+    """
+
+    def __init__(self, static: List[PromptFragment], dynamic: List[PromptFragment], separator: str = "\n"):
+        self.fragments = static + dynamic
+        self.prefix_text = separator.join(fragment.text for fragment in static)
+        self.suffix_text = separator.join(fragment.text for fragment in dynamic)
+        self.text = separator.join(fragment.text for fragment in self.fragments)
+        self.digest = _digest(self.text)
+        self.prefix_digest = _digest(self.prefix_text)
+        self.total_tokens = estimate_tokens(self.text)
+        self.prefix_tokens = estimate_tokens(self.prefix_text)
+
+    @property
+    def section_tokens(self) -> Dict[str, int]:
+        return {fragment.name: fragment.tokens for fragment in self.fragments}
+
+    def report(self) -> str:
+        sections = ", ".join(f"{name}={tokens}" for name, tokens in self.section_tokens.items())
+        return f"{self.total_tokens} tokens, {self.prefix_tokens} static ({sections})"
+
+
+class PromptCompiler:
+    """
+    Assembles system prompts from cached, file-backed fragments.
+
+    File fragments are read once and re-read only when the file's mtime or
+    size changes, so static sections (persona, conversation strategy,
+    knowledge base) cost nothing per call and edits are still picked up
+    without a restart. Per-call text (client info, greeting, ...) is passed
+    to ``compile`` directly.
+    """
+
+    def __init__(self):
+        self._files: Dict[str, Tuple[Tuple[int, int], PromptFragment]] = {}
+        self._lock = threading.Lock()
+
+    def file_fragment(self, name: str, path, header: str = "", strip: bool = False) -> Optional[PromptFragment]:
+        """
+        Return the cached fragment for a file, reloading it if it changed.
+
+        Args:
+            name: Section name used in the token report
+            path: Path of the file
+            header: Text prepended to the file contents (e.g. a section heading)
+            strip: Whether to strip surrounding whitespace from the contents
+
+        Returns:
+            The fragment, or None if the file is missing or empty
+        """
+        path = Path(path)
+        key = f"{path}\0{header}\0{strip}"
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._files.pop(key, None)
+            return None
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._files.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        with open(path, "r") as f:
+            content = f.read()
+        if strip:
+            content = content.strip()
+        if not content:
+            return None
+
+        fragment = PromptFragment(name, header + content)
+        with self._lock:
+            self._files[key] = (signature, fragment)
+        if cached:
+            logger.info(f"Reloaded prompt fragment {name} from {path} ({fragment.tokens} tokens)")
+        return fragment
+
+    def text_fragment(self, name: str, text: str) -> Optional[PromptFragment]:
+        """Wrap per-call text as a fragment, or None if it is empty."""
+        return PromptFragment(name, text) if text else None
+
+    def compile(self, static: List[Optional[PromptFragment]], dynamic: List[Optional[PromptFragment]] = (),
+                separator: str = "\n") -> CompiledPrompt:
+        """Join the non-empty fragments in order, static prefix first."""
+        return CompiledPrompt(
+            [fragment for fragment in static if fragment is not None],
+            [fragment for fragment in dynamic if fragment is not None],
+            separator,
+        )
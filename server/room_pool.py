@@ -0,0 +1,188 @@
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from loguru import logger
+
+from pipecat.transports.services.helpers.daily_rest import DailyRESTHelper, DailyRoomParams, DailyRoomProperties
+
+ROOM_POOL_SIZE = int(os.getenv("ROOM_POOL_SIZE", "2"))
+ROOM_TTL_SECONDS = float(os.getenv("ROOM_TTL_SECONDS", str(3 * 60 * 60)))
+# A pooled room is only handed out while a whole call still fits before it expires
+ROOM_MIN_REMAINING_SECONDS = float(os.getenv("ROOM_MIN_REMAINING_SECONDS", str(60 * 60)))
+ROOM_POOL_REFILL_INTERVAL = float(os.getenv("ROOM_POOL_REFILL_INTERVAL", "30"))
+
+
+class PooledRoom:
+    """A Daily room with a participant token and a bot (owner) token, valid until ``expires_at``."""
+
+    def __init__(self, url: str, name: str, token: str, bot_token: str, expires_at: float):
+        self.url = url
+        self.name = name
+        self.token = token
+        self.bot_token = bot_token
+        self.expires_at = expires_at
+
+    def remaining(self, now: Optional[float] = None) -> float:
+        return self.expires_at - (now or time.time())
+
+
+class DailyRoomPool:
+    """
+    Keeps ``size`` Daily rooms, with their tokens, ready for /connect.
+
+    Creating a room and its two tokens takes two sequential Daily REST round
+    trips; the pool does that in the background so handing out a room costs
+    nothing. Rooms are created with an expiry ``ttl`` seconds out and stop
+    being handed out once less than ``min_remaining`` seconds are left; those
+    are deleted and replaced. Handed-out rooms are deleted when released, or
+    once they have expired. If the pool is empty a room is created on demand.
+
+    The REST base URL comes from the helper, so the pool can be pointed at a
+    local fake of the Daily API (see ``fake_daily_api.py``).
+    """
+
+    def __init__(self, size: int = ROOM_POOL_SIZE, ttl: float = ROOM_TTL_SECONDS,
+                 min_remaining: float = ROOM_MIN_REMAINING_SECONDS, refill_interval: float = ROOM_POOL_REFILL_INTERVAL):
+        self.size = max(0, size)
+        self.ttl = ttl
+        self.min_remaining = min(min_remaining, ttl)
+        self.refill_interval = refill_interval
+        self._helper: Optional[DailyRESTHelper] = None
+        self._idle: Deque[PooledRoom] = deque()
+        self._issued: Dict[str, PooledRoom] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.created_total = 0
+        self.deleted_total = 0
+        self.served_from_pool = 0
+        self.created_on_demand = 0
+        self.last_error: Optional[str] = None
+
+    async def start(self, helper: DailyRESTHelper):
+        self._helper = helper
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop refilling and delete the rooms nobody is using."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        idle, self._idle = list(self._idle), deque()
+        await asyncio.gather(*(self._delete(room) for room in idle), return_exceptions=True)
+
+    async def acquire(self) -> PooledRoom:
+        """Take a ready room out of the pool, or create one if none is left."""
+        now = time.time()
+        room = None
+        while self._idle:
+            candidate = self._idle.popleft()
+            if candidate.remaining(now) >= self.min_remaining:
+                room = candidate
+                break
+            # Too close to expiry to hand out; marked finished so the refill
+            # loop deletes it now rather than when Daily expires it
+            candidate.expires_at = min(candidate.expires_at, now)
+            self._issued[candidate.url] = candidate
+
+        if room is not None:
+            self.served_from_pool += 1
+        else:
+            logger.warning("Daily room pool empty, creating a room on demand")
+            room = await self._create()
+            self.created_on_demand += 1
+
+        self._issued[room.url] = room
+        self._wakeup.set()
+        return room
+
+    def release(self, room_url: Optional[str]):
+        """Mark a handed-out room as finished so the refill loop deletes it."""
+        room = self._issued.get(room_url) if room_url else None
+        if room is not None:
+            room.expires_at = min(room.expires_at, time.time())
+            self._wakeup.set()
+
+    async def _create(self) -> PooledRoom:
+        expires_at = time.time() + self.ttl
+        room = await self._helper.create_room(DailyRoomParams(properties=DailyRoomProperties(exp=expires_at)))
+        if not room.url:
+            raise RuntimeError("Daily returned a room without a URL")
+
+        token_ttl = expires_at - time.time()
+        token, bot_token = await asyncio.gather(
+            self._helper.get_token(room.url, token_ttl, owner=False),
+            self._helper.get_token(room.url, token_ttl, owner=True),
+        )
+        if not token or not bot_token:
+            raise RuntimeError(f"Failed to get tokens for room {room.url}")
+
+        self.created_total += 1
+        return PooledRoom(room.url, room.name, token, bot_token, expires_at)
+
+    async def _delete(self, room: PooledRoom):
+        try:
+            await self._helper.delete_room_by_name(room.name)
+            self.deleted_total += 1
+        except Exception as e:
+            logger.warning(f"Failed to delete Daily room {room.name}: {e}")
+            raise
+
+    async def _recycle(self):
+        now = time.time()
+        stale = [room for room in self._idle if room.remaining(now) < self.min_remaining]
+        for room in stale:
+            self._idle.remove(room)
+        finished = [room for room in self._issued.values() if room.remaining(now) <= 0]
+        for room in finished:
+            self._issued.pop(room.url, None)
+
+        results = await asyncio.gather(*(self._delete(room) for room in stale + finished), return_exceptions=True)
+        for room, result in zip(finished, results[len(stale):]):
+            if isinstance(result, Exception):
+                # Retried on the next pass
+                self._issued.setdefault(room.url, room)
+
+    async def _refill(self):
+        missing = self.size - len(self._idle)
+        if missing <= 0:
+            return
+        results = await asyncio.gather(*(self._create() for _ in range(missing)), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                self.last_error = str(result) or result.__class__.__name__
+                logger.error(f"Failed to create a pooled Daily room: {result}")
+            else:
+                self._idle.append(result)
+
+    async def _run(self):
+        while True:
+            try:
+                await self._recycle()
+                await self._refill()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Daily room pool maintenance failed: {e}")
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "idle": len(self._idle),
+            "issued": len(self._issued),
+            "size": self.size,
+            "created_total": self.created_total,
+            "deleted_total": self.deleted_total,
+            "served_from_pool": self.served_from_pool,
+            "created_on_demand": self.created_on_demand,
+            "last_error": self.last_error,
+        }
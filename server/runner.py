@@ -7,13 +7,24 @@ import aiohttp
 from pipecat.transports.services.helpers.daily_rest import DailyRESTHelper
 
 
-async def configure(aiohttp_session: aiohttp.ClientSession):
-    (url, token, _) = await configure_with_args(aiohttp_session)
+async def configure(aiohttp_session: Optional[aiohttp.ClientSession] = None,
+                    room_url: Optional[str] = None, token: Optional[str] = None):
+    """
+    Resolve the Daily room to join and a token for it.
+
+    A token passed in (or given with -t/--token or DAILY_SAMPLE_ROOM_TOKEN) is
+    used as is, with no Daily REST call; otherwise one is fetched with the
+    API key, using ``aiohttp_session`` or a short-lived session of its own.
+    """
+    (url, token, _) = await configure_with_args(aiohttp_session, room_url=room_url, token=token)
     return (url, token)
 
 
 async def configure_with_args(
-    aiohttp_session: aiohttp.ClientSession, parser: Optional[argparse.ArgumentParser] = None
+    aiohttp_session: Optional[aiohttp.ClientSession] = None,
+    parser: Optional[argparse.ArgumentParser] = None,
+    room_url: Optional[str] = None,
+    token: Optional[str] = None,
 ):
     if not parser:
         parser = argparse.ArgumentParser(description="Daily AI SDK Bot Sample")
@@ -27,10 +38,14 @@ async def configure_with_args(
         required=False,
         help="Daily API Key (needed to create an owner token for the room)",
     )
+    parser.add_argument(
+        "-t", "--token", type=str, required=False, help="Meeting token for the room (skips creating one)"
+    )
 
     args, unknown = parser.parse_known_args()
 
-    url = args.url or os.getenv("DAILY_SAMPLE_ROOM_URL")
+    url = room_url or args.url or os.getenv("DAILY_SAMPLE_ROOM_URL")
+    token = token or args.token or os.getenv("DAILY_SAMPLE_ROOM_TOKEN")
     key = args.apikey or os.getenv("DAILY_API_KEY")
 
     if not url:
@@ -38,19 +53,29 @@ async def configure_with_args(
             "No Daily room specified. use the -u/--url option from the command line, or set DAILY_SAMPLE_ROOM_URL in your environment to specify a Daily room URL."
         )
 
+    if token:
+        return (url, token, args)
+
     if not key:
         raise Exception(
             "No Daily API key specified. use the -k/--apikey option from the command line, or set DAILY_API_KEY in your environment to specify a Daily API key, available from https://dashboard.daily.co/developers."
         )
 
+    expiry_time: float = 60 * 60
+
+    if aiohttp_session is None:
+        async with aiohttp.ClientSession() as session:
+            token = await _get_token(session, key, url, expiry_time)
+    else:
+        token = await _get_token(aiohttp_session, key, url, expiry_time)
+
+    return (url, token, args)
+
+
+async def _get_token(aiohttp_session: aiohttp.ClientSession, key: str, url: str, expiry_time: float) -> str:
     daily_rest_helper = DailyRESTHelper(
         daily_api_key=key,
         daily_api_url=os.getenv("DAILY_API_URL", "https://api.daily.co/v1"),
         aiohttp_session=aiohttp_session,
     )
-
-    expiry_time: float = 60 * 60
-
-    token = await daily_rest_helper.get_token(url, expiry_time)
-
-    return (url, token, args)
\ No newline at end of file
+    return await daily_rest_helper.get_token(url, expiry_time)
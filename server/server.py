@@ -1,32 +1,97 @@
 import os
 import sys
+import asyncio
 import argparse
-import subprocess
+from datetime import datetime, timedelta
 from typing import Any, Dict, Tuple, Optional
 from contextlib import asynccontextmanager
 from pathlib import Path
 
 import aiohttp
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Request, Body, Query
+from fastapi import FastAPI, HTTPException, Request, Body, Query, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
-from pipecat.transports.services.helpers.daily_rest import DailyRESTHelper, DailyRoomParams
-from firestore_db import VoiceAgentDB
-from sqlite_db import SQLiteVoiceAgentDB
+from pipecat.transports.services.helpers.daily_rest import DailyRESTHelper
+from firestore_db import AsyncVoiceAgentDB
+from sqlite_db import AsyncSQLiteVoiceAgentDB
+from bot_pool import BotWorkerPool, BotWorkerPoolExhausted
+from session_registry import Session, SessionRegistry
+from job_queue import PostCallJobQueue
+from firestore_replicator import FirestoreReplicator
+from profile_cache import ClientProfileCache
+from room_pool import DailyRoomPool
+from metrics import latency_metrics, summarize_turn_latencies
+from greetings import initial_greeting_for, load_call_highlight
+from tts_cache import TTS_CACHE_ENABLED, TTS_PRESYNTHESIZE_GREETING, TTSAudioCache, presynthesize
 
 load_dotenv(dotenv_path=Path(__file__).parent.parent / '.env')
 
-firestore_db = VoiceAgentDB()
-sqlite_db = SQLiteVoiceAgentDB()
+firestore_db = AsyncVoiceAgentDB()
+sqlite_db = AsyncSQLiteVoiceAgentDB()
 
-bot_procs = {}
-daily_helpers = {}
+post_call_processor = None
+
+async def run_post_call_pipeline(call_id: str, client_id: str):
+    """Store the transcript, then run the analyzer and post-call processor in-process."""
+    global post_call_processor
+    import analyzer
+    from post_call_processor import PostCallProcessor
+
+    # The bot streams utterances into SQLite during the call; fall back to the
+    # transcript log if nothing arrived that way.
+    state = await sqlite_db.get_call_processing_state(call_id)
+    transcript_file = Path(__file__).parent.parent / "logs" / f"{call_id}.txt"
+    if not (state and state["utterance_count"]) and transcript_file.exists():
+        with open(transcript_file, "r") as f:
+            transcript_text = f.read()
+        # Update the transcript in the SQLite database
+        await sqlite_db.update_call_transcript(call_id, transcript_text)
+
+    if not await analyzer.run_analysis(call_id, client_id):
+        raise RuntimeError(f"Analysis failed for call {call_id}")
 
-current_call_id = None
-current_client_id = None
-current_client_name = None  
+    if post_call_processor is None:
+        post_call_processor = PostCallProcessor()
+    try:
+        if not await post_call_processor.process(call_id, client_id):
+            raise RuntimeError(f"Post-call processing failed for call {call_id}")
+    finally:
+        # The call's summary may have changed
+        profile_cache.invalidate_latest_call(client_id)
+
+# Transcripts of calls older than this many days are compressed into the
+# archive table; 0 disables archiving.
+TRANSCRIPT_ARCHIVE_DAYS = float(os.getenv("TRANSCRIPT_ARCHIVE_DAYS", "0"))
+TRANSCRIPT_ARCHIVE_INTERVAL = float(os.getenv("TRANSCRIPT_ARCHIVE_INTERVAL", "3600"))
+
+async def archive_old_transcripts():
+    while True:
+        try:
+            cutoff = (datetime.now() - timedelta(days=TRANSCRIPT_ARCHIVE_DAYS)).isoformat()
+            archived = await sqlite_db.archive_call_transcripts(cutoff)
+            if archived:
+                print(f"Archived transcripts for {archived} calls older than {cutoff}")
+        except Exception as e:
+            print(f"Error archiving transcripts: {e}")
+        await asyncio.sleep(TRANSCRIPT_ARCHIVE_INTERVAL)
+
+def release_call_resources(assignment: Dict[str, Any]):
+    """Called by the bot pool once the worker running a call has exited."""
+    # /analyze releases the room too, but the client may never call it
+    room_pool.release(assignment.get("room_url"))
+    sessions.call_ended(assignment.get("call_id"))
+
+bot_pool = BotWorkerPool(on_call_ended=release_call_resources)
+sessions = SessionRegistry()
+post_call_jobs = PostCallJobQueue(run_post_call_pipeline)
+replicator = FirestoreReplicator(firestore_db)
+profile_cache = ClientProfileCache()
+tts_audio_cache = TTSAudioCache() if TTS_CACHE_ENABLED else None
+presynthesis_tasks = set()
+room_pool = DailyRoomPool()
+daily_helpers = {}
 
 # Valid LLM models
 VALID_GEMINI_MODELS = ["gemini-2.0-flash", "gemini-2.0-flash-lite"]
@@ -34,12 +99,6 @@ VALID_GROQ_MODELS = ["llama-4-maverick-17b-128e-instruct",
                      "llama-4-scout-17b-16e-instruct", 
                      "llama-3.3-70b-versatile"]
 
-def cleanup():
-    for entry in bot_procs.values():
-        proc = entry[0]
-        proc.terminate()
-        proc.wait()
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     aiohttp_session = aiohttp.ClientSession()
@@ -48,9 +107,21 @@ async def lifespan(app: FastAPI):
         daily_api_url=os.getenv("DAILY_API_URL", "https://api.daily.co/v1"),
         aiohttp_session=aiohttp_session,
     )
+    await room_pool.start(daily_helpers["rest"])
+    await bot_pool.start()
+    sessions.start()
+    await post_call_jobs.start()
+    await replicator.start()
+    archive_task = asyncio.create_task(archive_old_transcripts()) if TRANSCRIPT_ARCHIVE_DAYS > 0 else None
     yield
+    if archive_task:
+        archive_task.cancel()
+    await post_call_jobs.stop()
+    await replicator.stop()
+    await sessions.stop()
+    await room_pool.stop()
     await aiohttp_session.close()
-    cleanup()
+    await bot_pool.stop()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -63,37 +134,67 @@ app.add_middleware(
     expose_headers=["*"], 
 )
 
-async def create_room_and_token() -> Tuple[str, str]:
-    room = await daily_helpers["rest"].create_room(DailyRoomParams())
-    if not room.url:
-        raise HTTPException(status_code=500, detail="Failed to create room")
+async def create_room_and_token() -> Tuple[str, str, str]:
+    # Rooms come pre-created with a participant token and a bot token, so
+    # neither /connect nor the bot makes a Daily REST call of its own.
+    try:
+        with latency_metrics.timer("daily.acquire_room"):
+            room = await room_pool.acquire()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create room: {e}")
 
-    token = await daily_helpers["rest"].get_token(room.url)
-    if not token:
-        raise HTTPException(status_code=500, detail=f"Failed to get token for room: {room.url}")
+    return room.url, room.token, room.bot_token
 
-    return room.url, token
+async def presynthesize_greeting(client_id: str, client_info: Optional[Dict[str, Any]], client_name: Optional[str],
+                                 is_returning: bool, previous_summary: str):
+    """Put the call's greeting in the TTS cache while the room is set up and the bot joins."""
+    try:
+        greeting, _ = await asyncio.to_thread(
+            initial_greeting_for, client_id, client_info, client_name, is_returning, previous_summary,
+            load_highlight=load_call_highlight
+        )
+        with latency_metrics.timer("tts.presynthesize_greeting"):
+            await presynthesize(tts_audio_cache, greeting)
+    except Exception as e:
+        print(f"Error pre-synthesizing greeting for client {client_id}: {e}")
+
+def require_session(session_token: Optional[str]) -> Session:
+    """Resolve the caller's session or reject the request."""
+    session = sessions.get(session_token)
+    if not session:
+        raise HTTPException(status_code=401, detail="Session not found or expired. Please login or register first.")
+    return session
+
+# How long a SQLite miss waits for Firestore before the caller is treated as unknown
+STORE_LOOKUP_DEADLINE = float(os.getenv("STORE_LOOKUP_DEADLINE", "2.0"))
 
-def get_client_latest_call(client_id: str) -> Dict[str, Any]:
+async def timed_store_call(name: str, coro):
+    with latency_metrics.timer(name):
+        return await coro
+
+async def get_client_latest_call(client_id: str) -> Dict[str, Any]:
     """Get the latest call info for a client from both databases with priority to SQLite."""
+    cached = profile_cache.get_latest_call(client_id)
+    if cached is not None:
+        return cached
+    
+    latest_call_info = await fetch_client_latest_call(client_id)
+    profile_cache.put_latest_call(client_id, latest_call_info)
+    return latest_call_info
+
+async def fetch_client_latest_call(client_id: str) -> Dict[str, Any]:
     latest_call_info = {}
     
     try:
-        sqlite_call = sqlite_db.get_latest_call(client_id)
+        sqlite_call = await timed_store_call("sqlite.get_latest_call", sqlite_db.get_latest_call(client_id))
         if sqlite_call:
             latest_call_info["timestamp"] = sqlite_call.get("timestamp")
-            latest_call_info["has_transcript"] = bool(sqlite_call.get("transcript"))
+            latest_call_info["has_transcript"] = sqlite_call.get("has_transcript", False)
             
-            # Get summary from SQLite
-            transcript = sqlite_call.get("transcript", "")
-            if transcript:
-                # Extract a simple summary from the transcript if available
-                # Just use the first few lines as a basic summary for now
-                lines = transcript.split('\n')
-                relevant_lines = [line for line in lines if line.strip() and 'user:' in line]
-                if relevant_lines:
-                    # Use the first user message as a simple summary
-                    latest_call_info["summary"] = relevant_lines[0].split('user:', 1)[1].strip()[:100]
+            # Use the first user message as a simple summary
+            first_user_message = (sqlite_call.get("first_user_message") or "").strip()
+            if first_user_message:
+                latest_call_info["summary"] = first_user_message[:100]
     except Exception as e:
         print(f"SQLite get_latest_call error: {e}")
     
@@ -103,7 +204,7 @@ def get_client_latest_call(client_id: str) -> Dict[str, Any]:
         
     # Fallback to Firestore for summary only if SQLite doesn't have it
     try:
-        firestore_call = firestore_db.get_latest_call_details(client_id) 
+        firestore_call = await timed_store_call("firestore.get_latest_call_details", firestore_db.get_latest_call_details(client_id))
         if firestore_call and firestore_call.get("summary"):
             latest_call_info["summary"] = firestore_call.get("summary")
     except Exception as e:
@@ -112,13 +213,41 @@ def get_client_latest_call(client_id: str) -> Dict[str, Any]:
         
     return latest_call_info
 
-def get_client_info(client_id: str) -> Dict[str, Any]:
-    """Get client info from both databases."""
+def firestore_customer_to_client_info(client_id: str, firestore_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a Firestore customer document to the SQLite client format."""
+    return {
+        'id': client_id,
+        'first_name': firestore_info.get('firstName', ''),
+        'last_name': firestore_info.get('lastName', ''),
+        'phone_number': firestore_info.get('phoneNumber', ''),
+        'email': firestore_info.get('email', ''),
+        'city': firestore_info.get('city', ''),
+        'job_business': firestore_info.get('jobBusiness', ''),
+        'investor_type': firestore_info.get('investorType', 'individual')
+    }
+
+def client_display_name(client_info: Optional[Dict[str, Any]]) -> str:
+    if not client_info:
+        return ""
+    return f"{client_info.get('first_name', '')} {client_info.get('last_name', '')}".strip()
+
+async def get_client_info(client_id: str) -> Dict[str, Any]:
+    """Get client info, from the profile cache or else from both databases."""
+    cached = profile_cache.get_client(client_id)
+    if cached is not None:
+        return cached
+    
+    client_info = await fetch_client_info(client_id)
+    if client_info:
+        profile_cache.put_client(client_info)
+    return client_info
+
+async def fetch_client_info(client_id: str) -> Dict[str, Any]:
     client_info = {}
     
     # Try SQLite first
     try:
-        sqlite_info = sqlite_db.get_customer_by_id(client_id)
+        sqlite_info = await timed_store_call("sqlite.get_customer_by_id", sqlite_db.get_customer_by_id(client_id))
         if sqlite_info:
             print(f"Found client info in SQLite: {sqlite_info.get('first_name')} {sqlite_info.get('last_name')}")
             return sqlite_info
@@ -127,18 +256,10 @@ def get_client_info(client_id: str) -> Dict[str, Any]:
     
     # If not found in SQLite, try Firestore
     try:
-        firestore_info = firestore_db.get_customer(client_id)
+        firestore_info = await timed_store_call("firestore.get_customer", firestore_db.get_customer(client_id))
         if firestore_info:
             # Convert Firestore format to match SQLite format
-            client_info = {
-                'id': client_id,
-                'first_name': firestore_info.get('firstName', ''),
-                'last_name': firestore_info.get('lastName', ''),
-                'phone_number': firestore_info.get('phoneNumber', ''),
-                'email': firestore_info.get('email', ''),
-                'city': firestore_info.get('city', ''),
-                'job_business': firestore_info.get('jobBusiness', '')
-            }
+            client_info = firestore_customer_to_client_info(client_id, firestore_info)
             print(f"Found client info in Firestore: {client_info.get('first_name')} {client_info.get('last_name')}")
             return client_info
     except Exception as e:
@@ -148,6 +269,54 @@ def get_client_info(client_id: str) -> Dict[str, Any]:
     print(f"WARNING: Client info not found in any database for ID: {client_id}")
     return client_info
 
+async def find_customer_by_phone(phone_number: str, deadline: float = STORE_LOOKUP_DEADLINE
+                                 ) -> Tuple[Optional[str], Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Look a caller up in both stores at once.
+    
+    SQLite is the system of record, so a SQLite hit is used immediately and
+    the Firestore lookup is cancelled. Only on a SQLite miss (or error) is the
+    Firestore answer awaited, and only until ``deadline`` seconds after the
+    lookups started.
+    
+    Returns:
+        (client_id, client_info in SQLite format, source store), or
+        (None, None, None) if neither store found the caller in time
+    """
+    started = asyncio.get_running_loop().time()
+    sqlite_task = asyncio.create_task(
+        timed_store_call("sqlite.get_customer_by_phone", sqlite_db.get_customer_by_phone(phone_number))
+    )
+    firestore_task = asyncio.create_task(
+        timed_store_call("firestore.get_customer_by_phone", firestore_db.get_customer_by_phone(phone_number))
+    )
+    # The Firestore result may go unused; don't let its errors go unretrieved
+    firestore_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+    
+    try:
+        sqlite_client_id, sqlite_client_data = await sqlite_task
+    except Exception as e:
+        print(f"SQLite lookup error: {e}")
+        sqlite_client_id, sqlite_client_data = None, None
+    
+    if sqlite_client_id:
+        firestore_task.cancel()
+        return sqlite_client_id, sqlite_client_data, "sqlite"
+    
+    remaining = max(0.0, deadline - (asyncio.get_running_loop().time() - started))
+    try:
+        firestore_client_id, firestore_client_data = await asyncio.wait_for(firestore_task, timeout=remaining)
+    except asyncio.TimeoutError:
+        print(f"Firestore lookup did not answer within {deadline}s")
+        return None, None, None
+    except Exception as e:
+        print(f"Firestore lookup error: {e}")
+        return None, None, None
+    
+    if firestore_client_id:
+        return firestore_client_id, firestore_customer_to_client_info(firestore_client_id, firestore_client_data), "firestore"
+    return None, None, None
+
 @app.get("/")
 async def root():
     """
@@ -155,9 +324,19 @@ async def root():
     """
     return {"status": "ok", "message": "Server is running"}
 
+@app.get("/health")
+async def health():
+    """
+    Readiness check: 503 while bot workers keep failing to start.
+    """
+    pool = bot_pool.stats()
+    return JSONResponse(
+        status_code=200 if pool["healthy"] else 503,
+        content={"status": "ok" if pool["healthy"] else "degraded", "bot_pool": pool},
+    )
+
 @app.post("/login")
 async def login(data: Dict[str, Any] = Body(...)):
-    global current_client_id, current_client_name
     try:
         print(f"Login attempt with data: {data}")
         phone_number = data.get("phoneNumber")
@@ -169,47 +348,28 @@ async def login(data: Dict[str, Any] = Body(...)):
                 content={"message": "Phone number is required"}
             )
         
-        # Check in Firestore
-        try:
-            firestore_client_id, firestore_client_data = firestore_db.get_customer_by_phone(phone_number)
-        except Exception as e:
-            print(f"Firestore lookup error: {e}")
-            firestore_client_id, firestore_client_data = None, None
+        # A cached profile answers without touching either store
+        client_id = profile_cache.get_client_id_by_phone(phone_number)
         
-        # Check in SQLite
-        try:
-            sqlite_client_id, sqlite_client_data = sqlite_db.get_customer_by_phone(phone_number)
-        except Exception as e:
-            print(f"SQLite lookup error: {e}")
-            sqlite_client_id, sqlite_client_data = None, None
-        
-        # Determine which client ID to use (prefer Firestore if both exist)
-        client_id = firestore_client_id or sqlite_client_id
+        if not client_id:
+            client_id, client_info, source = await find_customer_by_phone(phone_number)
+            if client_id:
+                print(f"Found client {client_id} in {source}")
+                profile_cache.put_client(client_info)
         
         if client_id:
-            current_client_id = client_id
-            
-            # Explicitly get client info from database using the ID
-            client_info = sqlite_db.get_customer_by_id(client_id)
-            if client_info:
-                current_client_name = f"{client_info.get('first_name', '')} {client_info.get('last_name', '')}".strip()
-                print(f"Retrieved client name from SQLite: {current_client_name}")
-            else:
-                # Fallback to Firestore if not in SQLite
-                firestore_info = firestore_db.get_customer(client_id)
-                if firestore_info:
-                    current_client_name = f"{firestore_info.get('firstName', '')} {firestore_info.get('lastName', '')}".strip()
-                    print(f"Retrieved client name from Firestore: {current_client_name}")
-                else:
-                    current_client_name = ""
-                    print("Warning: Could not retrieve client name from either database")
+            client_info = await get_client_info(client_id)
+            client_name = client_display_name(client_info)
+            if not client_name:
+                print("Warning: Could not retrieve client name from either database")
             
-            print(f"Client ID set to: {current_client_id}")
-            print(f"Client Name set to: {current_client_name}")
+            session = sessions.create(client_id, client_name)
+            print(f"Session started for client ID: {client_id}")
+            print(f"Client Name set to: {client_name}")
             
             return JSONResponse(
                 status_code=200,
-                content={"status": "success", "message": "Logged in successfully"}
+                content={"status": "success", "message": "Logged in successfully", "sessionToken": session.token}
             )
         else:
             print(f"Login failed: User with phone number {phone_number} not found")
@@ -226,7 +386,6 @@ async def login(data: Dict[str, Any] = Body(...)):
 
 @app.post("/register")
 async def register(data: Dict[str, Any] = Body(...)):
-    global current_client_id, current_client_name
     try:
         print(f"Registration attempt with data: {data}")
         phone_number = data.get("phoneNumber")
@@ -258,50 +417,17 @@ async def register(data: Dict[str, Any] = Body(...)):
             print(f"Invalid investor type: {investor_type}")
             investor_type = "individual"  # Default to individual if invalid
         
-        # Check if client exists in Firestore
-        try:
-            firestore_client_id, firestore_data = firestore_db.get_customer_by_phone(phone_number)
-            if firestore_client_id:
-                current_client_id = firestore_client_id
-                
-                # Ensure the client also exists in SQLite with the same ID
-                sqlite_client_id, sqlite_data = sqlite_db.get_customer_by_phone(phone_number)
-                if not sqlite_client_id:
-                    # If client exists in Firestore but not SQLite, add to SQLite with same ID
-                    print(f"User exists in Firestore but not SQLite. Adding to SQLite with ID: {firestore_client_id}")
-                    sqlite_db.add_customer_with_id(
-                        client_id=firestore_client_id,
-                        first_name=first_name,
-                        last_name=last_name,
-                        phone_number=phone_number,
-                        email=email,
-                        city=city,
-                        job_business=job_business,
-                        investor_type=investor_type
-                    )
-                
-                current_client_name = f"{first_name} {last_name}"
-                print(f"User already exists in Firestore: {firestore_client_id}")
-                return JSONResponse(
-                    status_code=200, 
-                    content={"status": "success", "message": "Logged in with existing account"}
-                )
-        except Exception as e:
-            print(f"Firestore check error: {e}")
-            firestore_client_id = None
+        # Registration may add or change this client's records
+        profile_cache.invalidate(phone_number=phone_number)
         
-        # Check if client exists in SQLite
-        try:
-            sqlite_client_id, sqlite_data = sqlite_db.get_customer_by_phone(phone_number)
-            if sqlite_client_id:
-                current_client_id = sqlite_client_id
-                
-                # Ensure the client also exists in Firestore with the same ID
-                if not firestore_client_id:
-                    # If client exists in SQLite but not Firestore, add to Firestore with same ID
-                    print(f"User exists in SQLite but not Firestore. Adding to Firestore with ID: {sqlite_client_id}")
-                    firestore_db.add_customer_with_id(
-                        client_id=sqlite_client_id,
+        existing_client_id, _, source = await find_customer_by_phone(phone_number)
+        if existing_client_id:
+            try:
+                if source == "firestore":
+                    # If client exists in Firestore but not SQLite, add to SQLite with same ID
+                    print(f"User exists in Firestore but not SQLite. Adding to SQLite with ID: {existing_client_id}")
+                    await sqlite_db.add_customer_with_id(
+                        client_id=existing_client_id,
                         first_name=first_name,
                         last_name=last_name,
                         phone_number=phone_number,
@@ -310,41 +436,30 @@ async def register(data: Dict[str, Any] = Body(...)):
                         job_business=job_business,
                         investor_type=investor_type
                     )
-                
-                current_client_name = f"{first_name} {last_name}"
-                print(f"User already exists in SQLite: {sqlite_client_id}")
-                return JSONResponse(
-                    status_code=200,
-                    content={"status": "success", "message": "Logged in with existing account"}
-                )
-        except Exception as e:
-            print(f"SQLite check error: {e}")
-            sqlite_client_id = None
+                else:
+                    # Replication is idempotent, so re-queue rather than wait for
+                    # Firestore to say whether it already has the client
+                    await sqlite_db.replicate_customer(existing_client_id)
+                replicator.notify()
+            except Exception as e:
+                print(f"Error syncing existing user {existing_client_id}: {e}")
+            
+            profile_cache.invalidate(client_id=existing_client_id)
+            session = sessions.create(existing_client_id, f"{first_name} {last_name}")
+            print(f"User already exists in {source}: {existing_client_id}")
+            return JSONResponse(
+                status_code=200,
+                content={"status": "success", "message": "Logged in with existing account", "sessionToken": session.token}
+            )
         
-        # Create new user in both databases with the same ID
+        # Create the new user in SQLite; the replicator copies it to Firestore
         import uuid
         shared_client_id = str(uuid.uuid4())
         print(f"Generated new shared client ID: {shared_client_id}")
         
-        # Add to Firestore with explicit ID
-        try:
-            firestore_db.add_customer_with_id(
-                client_id=shared_client_id,
-                first_name=first_name,
-                last_name=last_name,
-                phone_number=phone_number,
-                email=email,
-                city=city,
-                job_business=job_business,
-                investor_type=investor_type
-            )
-            print(f"User added to Firestore with ID: {shared_client_id}")
-        except Exception as e:
-            print(f"Failed to add user to Firestore: {e}")
-        
         # Add to SQLite with explicit ID
         try:
-            sqlite_db.add_customer_with_id(
+            await sqlite_db.add_customer_with_id(
                 client_id=shared_client_id,
                 first_name=first_name,
                 last_name=last_name,
@@ -355,27 +470,18 @@ async def register(data: Dict[str, Any] = Body(...)):
                 investor_type=investor_type
             )
             print(f"User added to SQLite with ID: {shared_client_id}")
+            replicator.notify()
         except Exception as e:
             print(f"Failed to add user to SQLite: {e}")
         
-        # Use the shared ID
-        current_client_id = shared_client_id
-        
-        if not current_client_id:
-            print("Registration failed: Could not create user in either database")
-            return JSONResponse(
-                status_code=500,
-                content={"message": "Failed to create user account"}
-            )
-        
-        # Set the client name using the provided first and last name
-        current_client_name = f"{first_name} {last_name}".strip()
-        print(f"Registration successful: {current_client_id}")
-        print(f"Client name set to: {current_client_name}")
+        # Start a session for the shared ID using the provided first and last name
+        session = sessions.create(shared_client_id, f"{first_name} {last_name}".strip())
+        print(f"Registration successful: {session.client_id}")
+        print(f"Client name set to: {session.client_name}")
         
         return JSONResponse(
             status_code=200,
-            content={"status": "success", "message": "Registration successful"}
+            content={"status": "success", "message": "Registration successful", "sessionToken": session.token}
         )
     except Exception as e:
         print(f"Unexpected registration error: {str(e)}")
@@ -388,17 +494,17 @@ async def register(data: Dict[str, Any] = Body(...)):
 async def bot_connect(
     request: Request,
     llm_type: str = Query("gemini", description="LLM type to use (gemini or groq)"),
-    model_name: str = Query("gemini-2.0-flash", description="Model name to use")
+    model_name: str = Query("gemini-2.0-flash", description="Model name to use"),
+    session_token: Optional[str] = Query(None, description="Session token issued at login/register"),
+    x_session_token: Optional[str] = Header(None),
 ) -> Dict[Any, Any]:
-    global current_call_id, current_client_id, current_client_name
-    print("#"*30, "Client ID", current_client_id)
-    
-    if not current_client_id:
-         raise HTTPException(status_code=400, detail="Client ID not set. Please login or register first.")
+    session = require_session(session_token or x_session_token)
+    client_id = session.client_id
+    print("#"*30, "Client ID", client_id)
 
     # --- Determine if client is returning BEFORE creating the new call --- 
     # Get latest call info to check if this is a returning client
-    latest_call = get_client_latest_call(current_client_id)
+    latest_call = await get_client_latest_call(client_id)
     previous_summary = latest_call.get("summary", "") # Get summary
     # Check if there's actual substantive data (timestamp or summary) in the latest_call
     is_returning = bool(latest_call.get("timestamp")) or bool(previous_summary)
@@ -410,37 +516,34 @@ async def bot_connect(
     shared_call_id = str(uuid.uuid4())
     print(f"Generated shared call ID for new call: {shared_call_id}")
     
-    # Create the new call record in both databases with the same ID
+    # Create the new call record in SQLite; the replicator creates it in Firestore
     try:
-        sqlite_call_id = sqlite_db.create_call_with_id(current_client_id, shared_call_id)
+        sqlite_call_id = await sqlite_db.create_call_with_id(client_id, shared_call_id)
         print(f"New call created in SQLite with ID: {sqlite_call_id}")
+        replicator.notify()
+        profile_cache.invalidate_latest_call(client_id)
     except Exception as e:
         print(f"Error creating new call in SQLite: {e}")
         sqlite_call_id = None
     
-    try:
-        firestore_call_id = firestore_db.create_call(current_client_id, call_id=shared_call_id)
-        print(f"New call created in Firestore with ID: {firestore_call_id}")
-    except Exception as e:
-        print(f"Error creating new call in Firestore: {e}")
-        firestore_call_id = None
-    
     # Use the shared call ID for the current session
-    current_call_id = shared_call_id
+    call_id = shared_call_id
     
-    # Use the global client name that was set during login/registration
-    client_name = current_client_name
+    # Use the client name that was set during login/registration
+    client_name = session.client_name
     
-    # If client_name is still empty/None, try one more time to get it
+    # The resolved profile is handed to the bot so it does not query it again
+    client_info = await get_client_info(client_id)
+    
+    # If client_name is still empty/None, take it from the profile
     if not client_name:
-        print("Warning: client_name not set from login/registration, attempting to fetch from database")
-        client_info = sqlite_db.get_customer_by_id(current_client_id)
-        if client_info:
-            client_name = f"{client_info.get('first_name', '')} {client_info.get('last_name', '')}".strip()
-            current_client_name = client_name  # Update the global variable
+        print("Warning: client_name not set from login/registration, using the stored profile")
+        client_name = client_display_name(client_info)
+        if client_name:
+            session.client_name = client_name  # Update the session
             print(f"Retrieved client name from database: {client_name}")
         else:
-            print(f"ERROR: Could not find client name for ID {current_client_id} in either database")
+            print(f"ERROR: Could not find client name for ID {client_id} in either database")
     
     # Validate LLM parameters
     if llm_type not in ["gemini", "groq"]:
@@ -466,40 +569,53 @@ async def bot_connect(
     print(f"Is Returning Client: {is_returning}")
     print(f"Previous Summary: {previous_summary}")
 
+    if tts_audio_cache is not None and TTS_PRESYNTHESIZE_GREETING:
+        # Runs alongside room creation; the bot plays the greeting from the cache
+        presynthesis = asyncio.create_task(
+            presynthesize_greeting(client_id, client_info, client_name, is_returning, previous_summary)
+        )
+        presynthesis_tasks.add(presynthesis)
+        presynthesis.add_done_callback(presynthesis_tasks.discard)
+
     print("Creating room for RTVI connection")
-    room_url, token = await create_room_and_token()
+    room_url, token, bot_token = await create_room_and_token()
     print(f"Room URL: {room_url}")
 
-    os.environ["DAILY_SAMPLE_ROOM_URL"] = room_url
     try:
-        # Pass client name, returning status, and summary to bot
-        bot_file = "bot"
-        cmd = (f"uv run -m {bot_file} --call_id {current_call_id} "
-              f"--client_id {current_client_id} --llm_type {llm_type} "
-              f"--model_name \"{model_name}\" "
-              f"--client_name \"{client_name}\" "
-              f"--returning_client {1 if is_returning else 0} "
-              f"--previous_summary \"{previous_summary}\"") # Pass summary
-        
-        print(f"Bot command: {cmd}")
-        
-        proc = subprocess.Popen(
-            [cmd],
-            shell=True,
-            bufsize=1,
-            cwd=os.path.dirname(os.path.abspath(__file__)),
-        )
-        bot_procs[proc.pid] = (proc, room_url)
+        # Hand the call to a pre-warmed bot worker
+        worker_pid = await bot_pool.assign({
+            "call_id": call_id,
+            "client_id": client_id,
+            "llm_type": llm_type,
+            "model_name": model_name,
+            "client_name": client_name,
+            "client_info": client_info or None,
+            "returning_client": is_returning,
+            "previous_summary": previous_summary,
+            "room_url": room_url,
+            "token": bot_token,
+        })
+        print(f"Call {call_id} assigned to bot worker {worker_pid}")
+        session.call_id = call_id
+        session.bot_pid = worker_pid
+        session.room_url = room_url
+    except BotWorkerPoolExhausted as e:
+        room_pool.release(room_url)
+        print(f"No bot worker available: {e}")
+        raise HTTPException(status_code=503, detail="All bot workers are busy, please try again shortly")
     except Exception as e:
-        print(f"Failed to start subprocess: {e}") # Added print statement
-        raise HTTPException(status_code=500, detail=f"Failed to start subprocess: {e}")
+        room_pool.release(room_url)
+        print(f"Failed to assign bot worker: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to start bot: {e}")
 
     return {"room_url": room_url, "token": token}
 
 @app.get("/join")
 async def join_call(
     llm_type: str = Query("gemini", description="LLM type to use (gemini or groq)"),
-    model_name: str = Query("gemini-2.0-flash", description="Model name to use")
+    model_name: str = Query("gemini-2.0-flash", description="Model name to use"),
+    session_token: Optional[str] = Query(None, description="Session token issued at login/register"),
+    x_session_token: Optional[str] = Header(None),
 ) -> Dict[Any, Any]:
     """
     Alternative endpoint for joining a call, better compatibility with the frontend.
@@ -507,54 +623,81 @@ async def join_call(
     return await bot_connect(
         Request(scope={"type": "http"}),
         llm_type=llm_type,
-        model_name=model_name
+        model_name=model_name,
+        session_token=session_token,
+        x_session_token=x_session_token,
     )
 
 @app.post("/analyze")
-async def analyze_transcript() -> Dict[str, str]:
-    global current_client_id, current_call_id
+async def analyze_transcript(
+    session_token: Optional[str] = Query(None, description="Session token issued at login/register"),
+    x_session_token: Optional[str] = Header(None),
+) -> Dict[str, str]:
+    session = require_session(session_token or x_session_token)
+    client_id, call_id = session.client_id, session.call_id
+    if not call_id:
+        raise HTTPException(status_code=400, detail="No active call to analyze for this session.")
     try:
-        # Create a transcript file path to save the transcript
-        transcript_file = Path(__file__).parent.parent / "logs" / f"{current_call_id}.txt"
-        transcript_text = ""
-        
-        # Read the transcript file if it exists
-        if transcript_file.exists():
-            with open(transcript_file, "r") as f:
-                transcript_text = f.read()
-                
-            # Update the transcript in the SQLite database
-            sqlite_db.update_call_transcript(current_call_id, transcript_text)
-            
-            # Note: You would need to implement a similar method in Firestore
-            # to store the transcript
-        
-        # Run the analyzer
-        analyzer_file = "analyzer"
-        subprocess.run(
-            [f"uv run -m {analyzer_file} --call_id={current_call_id} --client_id={current_client_id}"],
-            shell=True,
-            check=True,
-            cwd=os.path.dirname(os.path.abspath(__file__)),
-        )
-
-        # Run post processor
-        subprocess.run(
-            [f"uv run -m post_call_processor --call_id={current_call_id} --client_id={current_client_id}"],
-            shell=True,
-            check=True,
-            cwd=os.path.dirname(os.path.abspath(__file__)),
-        )
-
-        return {"status": "success", "message": "Transcript analysis completed successfully"}
-    except subprocess.CalledProcessError as e:
-        raise HTTPException(status_code=500, detail=f"Analysis failed with exit code {e.returncode}")
+        job_id = await post_call_jobs.enqueue(call_id, client_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to run analysis: {str(e)}")
-    finally:
-        current_client_id = None
-        current_call_id = None
-        current_client_name = None
+        # The session keeps its call so the client can retry /analyze
+        raise HTTPException(status_code=500, detail=f"Failed to queue analysis: {str(e)}")
+    
+    print(f"Queued post-call job {job_id} for call {call_id}")
+    profile_cache.invalidate_latest_call(client_id)
+    room_pool.release(session.room_url)
+    session.end_call()
+    return {"status": "queued", "message": "Transcript analysis queued", "job_id": job_id}
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str) -> Dict[str, Any]:
+    """
+    Status of a queued post-call job.
+    """
+    job = await post_call_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "job_id": job["id"],
+        "call_id": job["call_id"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "last_error": job["last_error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+@app.get("/metrics")
+async def get_metrics() -> Dict[str, Any]:
+    """
+    Per-store latency percentiles, profile cache, TTS cache, room pool and bot pool counters.
+    """
+    return {
+        "store_latency": latency_metrics.summary(),
+        "profile_cache": profile_cache.stats(),
+        "room_pool": room_pool.stats(),
+        "bot_pool": bot_pool.stats(),
+        "tts_cache": tts_audio_cache.stats() if tts_audio_cache is not None else None,
+    }
+
+@app.get("/metrics/latency")
+async def get_turn_latency(
+    call_id: Optional[str] = Query(None, description="Only this call's turns"),
+    since: Optional[str] = Query(None, description="Only turns started at or after this ISO timestamp"),
+    limit: int = Query(1000, ge=1, le=20000, description="Most recent turns to aggregate"),
+) -> Dict[str, Any]:
+    """
+    Voice-to-voice and per-stage (STT, LLM, TTS) latency percentiles across call turns.
+    """
+    turns = await sqlite_db.get_call_turn_metrics(call_id=call_id, since=since, limit=limit)
+    return summarize_turn_latencies(turns)
+
+@app.get("/replication")
+async def get_replication_status() -> Dict[str, Any]:
+    """
+    Firestore replication backlog and lag.
+    """
+    return await replicator.stats()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,123 @@
+import os
+import time
+import asyncio
+import secrets
+from typing import Dict, Optional
+
+from loguru import logger
+
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+
+
+class Session:
+    """State for one logged-in caller: who they are and the call they are on."""
+
+    def __init__(self, token: str, client_id: str, client_name: str = ""):
+        self.token = token
+        self.client_id = client_id
+        self.client_name = client_name
+        self.call_id: Optional[str] = None
+        self.bot_pid: Optional[int] = None
+        self.room_url: Optional[str] = None
+        self.created_at = time.monotonic()
+        self.last_seen = self.created_at
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    @property
+    def on_call(self) -> bool:
+        """Whether a bot worker is still running the session's call."""
+        return self.bot_pid is not None
+
+    def end_call(self):
+        self.call_id = None
+        self.bot_pid = None
+        self.room_url = None
+
+
+class SessionRegistry:
+    """
+    In-process registry of caller sessions keyed by an opaque session token.
+
+    Tokens are issued at /login and /register and sent back by the client on
+    /connect and /analyze, so concurrent callers never share state. Sessions
+    idle for longer than ``ttl`` seconds are evicted lazily on lookup and by a
+    periodic sweep. A session whose call is still running is never evicted,
+    however long the call; ``call_ended`` starts its TTL again once the bot
+    worker exits, leaving the call in place for /analyze.
+    """
+
+    def __init__(self, ttl: float = SESSION_TTL_SECONDS, sweep_interval: float = SESSION_SWEEP_INTERVAL):
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._sessions: Dict[str, Session] = {}
+        self._sweep_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def create(self, client_id: str, client_name: str = "") -> Session:
+        """Issue a new session token for a client."""
+        session = Session(secrets.token_urlsafe(32), client_id, client_name)
+        self._sessions[session.token] = session
+        return session
+
+    def get(self, token: Optional[str]) -> Optional[Session]:
+        """Return the live session for a token, refreshing its TTL."""
+        if not token:
+            return None
+        session = self._sessions.get(token)
+        if session is None:
+            return None
+        if self._expired(session, time.monotonic()):
+            self._sessions.pop(token, None)
+            return None
+        session.touch()
+        return session
+
+    def call_ended(self, call_id: Optional[str]) -> Optional[Session]:
+        """Mark a session's call as over once its bot worker has exited."""
+        if not call_id:
+            return None
+        for session in self._sessions.values():
+            if session.call_id == call_id:
+                session.bot_pid = None
+                session.touch()
+                return session
+        return None
+
+    def remove(self, token: str) -> Optional[Session]:
+        return self._sessions.pop(token, None)
+
+    def sweep(self) -> int:
+        """Evict expired sessions and return how many were removed."""
+        now = time.monotonic()
+        expired = [token for token, session in self._sessions.items() if self._expired(session, now)]
+        for token in expired:
+            self._sessions.pop(token, None)
+        if expired:
+            logger.info(f"Evicted {len(expired)} expired sessions ({len(self._sessions)} active)")
+        return len(expired)
+
+    def start(self):
+        if self._sweep_task is None:
+            self._sweep_task = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._sweep_task:
+            self._sweep_task.cancel()
+            try:
+                await self._sweep_task
+            except asyncio.CancelledError:
+                pass
+            self._sweep_task = None
+
+    def _expired(self, session: Session, now: float) -> bool:
+        return not session.on_call and now - session.last_seen > self.ttl
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.sweep()
@@ -0,0 +1,369 @@
+import os
+import re
+import time
+import asyncio
+from difflib import SequenceMatcher
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from google.generativeai.types import GenerationConfig
+from loguru import logger
+
+from pipecat.frames.frames import (
+    CancelFrame,
+    EndFrame,
+    Frame,
+    InterimTranscriptionFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+    TranscriptionFrame,
+)
+from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContext, OpenAILLMContextFrame
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.google.llm import GoogleLLMContext, GoogleLLMService
+from pipecat.services.openai.base_llm import BaseOpenAILLMService
+
+from context_window import SUMMARY_MARKER, get_standard_messages, is_system_copy, message_text, set_standard_messages
+from knowledge_retriever import KNOWLEDGE_MARKER
+
+SPECULATIVE_LLM_ENABLED = os.getenv("SPECULATIVE_LLM_ENABLED", "false").lower() in ("1", "true", "yes")
+# An interim transcript unchanged for this long is treated as stable
+SPECULATIVE_STABLE_SECONDS = float(os.getenv("SPECULATIVE_STABLE_SECONDS", "0.3"))
+# Word-level similarity (0-1) the final transcript needs to reuse a speculative response
+SPECULATIVE_MATCH_THRESHOLD = float(os.getenv("SPECULATIVE_MATCH_THRESHOLD", "0.9"))
+SPECULATIVE_MIN_WORDS = int(os.getenv("SPECULATIVE_MIN_WORDS", "2"))
+
+ContextHook = Callable[[OpenAILLMContext], None]
+
+
+def normalize_utterance(text: str) -> List[str]:
+    """Lower-cased words of an utterance, without punctuation."""
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def latest_user_text(context: OpenAILLMContext) -> str:
+    """
+    The caller's latest utterance in ``context``.
+
+    Skips the messages other processors add on the user role (knowledge base
+    excerpts, the running summary, Google's copies of the system prompt), and
+    returns "" if the assistant spoke after the caller.
+    """
+    system_message = getattr(context, "system_message", None)
+    for message in reversed(context.get_messages_for_persistent_storage()):
+        role = message.get("role")
+        if role == "assistant":
+            return ""
+        text = message_text(message)
+        if role != "user" or is_system_copy(message, system_message):
+            continue
+        if text.startswith((KNOWLEDGE_MARKER, SUMMARY_MARKER)):
+            continue
+        return text
+    return ""
+
+
+def utterance_similarity(a: str, b: str) -> float:
+    """Word-level similarity of two transcripts, from 0.0 to 1.0."""
+    words_a, words_b = normalize_utterance(a), normalize_utterance(b)
+    if words_a == words_b:
+        return 1.0
+    return SequenceMatcher(None, words_a, words_b, autojunk=False).ratio()
+
+
+def google_generation_config(llm: GoogleLLMService) -> Optional[GenerationConfig]:
+    """The GenerationConfig GoogleLLMService sends, so speculative responses are generated alike."""
+    params = {
+        "temperature": llm._settings["temperature"],
+        "top_p": llm._settings["top_p"],
+        "top_k": llm._settings["top_k"],
+        "max_output_tokens": llm._settings["max_tokens"],
+    }
+    params = {k: v for k, v in params.items() if v is not None}
+    return GenerationConfig(**params) if params else None
+
+
+class _Speculation:
+    """One speculative LLM response, streamed into a buffer in the background."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.started_at = time.monotonic()
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.task: Optional[asyncio.Task] = None
+        self._updated = asyncio.Event()
+
+    def append(self, chunk: str):
+        self.chunks.append(chunk)
+        self._updated.set()
+
+    def finish(self, error: Optional[Exception] = None):
+        self.done = True
+        self.error = error
+        self._updated.set()
+
+    async def stream(self) -> AsyncIterator[str]:
+        """Yield the buffered chunks, then the rest as they arrive."""
+        sent = 0
+        while True:
+            while sent < len(self.chunks):
+                sent += 1
+                yield self.chunks[sent - 1]
+            if self.done:
+                return
+            self._updated.clear()
+            await self._updated.wait()
+
+    def cancel(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+
+class _InterimListener(FrameProcessor):
+    def __init__(self, owner: "SpeculativeLLM", **kwargs):
+        super().__init__(**kwargs)
+        self._owner = owner
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, InterimTranscriptionFrame):
+            self._owner.on_interim(frame.text)
+        elif isinstance(frame, TranscriptionFrame):
+            self._owner.on_final(frame.text)
+        elif isinstance(frame, (EndFrame, CancelFrame)):
+            self._owner.reset()
+
+        await self.push_frame(frame, direction)
+
+
+class _ResponseGate(FrameProcessor):
+    def __init__(self, owner: "SpeculativeLLM", **kwargs):
+        super().__init__(**kwargs)
+        self._owner = owner
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, OpenAILLMContextFrame) and direction == FrameDirection.DOWNSTREAM:
+            speculation = self._owner.claim(frame.context)
+            if speculation:
+                if await self._replay(speculation):
+                    self._owner.record_hit(speculation)
+                    return
+                self._owner.record_miss(speculation, f"failed: {speculation.error}")
+
+        await self.push_frame(frame, direction)
+
+    async def _replay(self, speculation: _Speculation) -> bool:
+        """Push a speculative response in place of the LLM's; False if it failed before any text."""
+        pushed = False
+        try:
+            async for chunk in speculation.stream():
+                if not pushed:
+                    await self.push_frame(LLMFullResponseStartFrame())
+                    pushed = True
+                await self.push_frame(LLMTextFrame(chunk))
+        finally:
+            # Interrupted while replaying: the rest of the response is not needed
+            speculation.cancel()
+            if pushed:
+                await self.push_frame(LLMFullResponseEndFrame())
+
+        if speculation.error and pushed:
+            logger.error(f"Speculative response failed part way through: {speculation.error}")
+        return pushed
+
+
+class SpeculativeLLM:
+    """
+    Starts the LLM on the caller's words before their turn is final.
+
+    ``listener()`` sits before the user context aggregator and watches STT
+    results. Once an interim transcript has been stable for
+    ``stable_seconds`` (or a final one arrives), a request is sent for the
+    current context plus that text and its response is buffered. ``gate()``
+    sits just before the LLM: when the aggregated context arrives and its last
+    user message matches the speculated text within ``match_threshold``, the
+    buffered response is pushed downstream in place of the LLM's, and the
+    context frame never reaches the LLM. Otherwise the speculation is
+    cancelled and the LLM runs as usual.
+
+    ``context_hooks`` are applied to a copy of the context before a
+    speculative request, so per-turn injections (e.g. knowledge base
+    excerpts) match what the LLM would have been sent. Only plain-text
+    responses are speculated; hit and miss counts are logged on ``close()``.
+    """
+
+    def __init__(self, llm, context: OpenAILLMContext, context_hooks: Optional[List[ContextHook]] = None,
+                 stable_seconds: float = SPECULATIVE_STABLE_SECONDS,
+                 match_threshold: float = SPECULATIVE_MATCH_THRESHOLD,
+                 min_words: int = SPECULATIVE_MIN_WORDS):
+        self.llm = llm
+        self.context = context
+        self.context_hooks = context_hooks or []
+        self.stable_seconds = stable_seconds
+        self.match_threshold = match_threshold
+        self.min_words = max(1, min_words)
+
+        self._listener = _InterimListener(self)
+        self._gate = _ResponseGate(self)
+        self._finals: List[str] = []
+        self._interim = ""
+        self._stable_task: Optional[asyncio.Task] = None
+        self._speculation: Optional[_Speculation] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self.head_start_total = 0.0
+
+    def listener(self) -> FrameProcessor:
+        return self._listener
+
+    def gate(self) -> FrameProcessor:
+        return self._gate
+
+    def _utterance(self) -> str:
+        return " ".join(part for part in (*self._finals, self._interim) if part)
+
+    def on_interim(self, text: str):
+        if text.strip() == self._interim:
+            # Unchanged, so the stability timer keeps running
+            return
+        self._interim = text.strip()
+        self._cancel_stable_timer()
+        if self._speculation and utterance_similarity(self._speculation.text, self._utterance()) >= self.match_threshold:
+            return
+        self._stable_task = asyncio.create_task(self._speculate_when_stable(self._utterance()))
+
+    def on_final(self, text: str):
+        if not text.strip():
+            return
+        self._finals.append(text.strip())
+        self._interim = ""
+        self._cancel_stable_timer()
+        self._speculate(self._utterance())
+
+    async def _speculate_when_stable(self, text: str):
+        await asyncio.sleep(self.stable_seconds)
+        self._stable_task = None
+        self._speculate(text)
+
+    def _cancel_stable_timer(self):
+        if self._stable_task and not self._stable_task.done():
+            self._stable_task.cancel()
+        self._stable_task = None
+
+    def _speculate(self, text: str):
+        if len(normalize_utterance(text)) < self.min_words:
+            return
+        if self._speculation:
+            if utterance_similarity(self._speculation.text, text) >= self.match_threshold:
+                return
+            self._discard()
+
+        speculation = _Speculation(text)
+        speculation.task = asyncio.create_task(self._generate(speculation))
+        self._speculation = speculation
+        logger.debug(f"Speculating a response to: {text}")
+
+    async def _generate(self, speculation: _Speculation):
+        try:
+            messages = get_standard_messages(self.context) + [{"role": "user", "content": speculation.text}]
+            snapshot = OpenAILLMContext(messages)
+            for hook in self.context_hooks:
+                hook(snapshot)
+            async for chunk in self._stream(snapshot.get_messages()):
+                speculation.append(chunk)
+            speculation.finish()
+        except asyncio.CancelledError:
+            speculation.finish(asyncio.CancelledError())
+            raise
+        except Exception as e:
+            speculation.finish(e)
+
+    async def _stream(self, messages: List[Dict[str, Any]]) -> AsyncIterator[str]:
+        if isinstance(self.llm, GoogleLLMService):
+            context = GoogleLLMContext()
+            set_standard_messages(context, messages)
+            # The service's own client, so a cached prompt prefix is used too
+            response = await self.llm._client.generate_content_async(
+                contents=context.messages,
+                tools=self.llm._tools or [],
+                stream=True,
+                generation_config=google_generation_config(self.llm),
+                tool_config=self.llm._tool_config,
+            )
+            async for chunk in response:
+                for part in chunk.parts:
+                    if part.text:
+                        yield part.text
+        elif isinstance(self.llm, BaseOpenAILLMService):
+            chunks = await self.llm.get_chat_completions(OpenAILLMContext(messages), messages)
+            async for chunk in chunks:
+                if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        else:
+            raise ValueError(f"Speculation is not supported for {self.llm}")
+
+    def claim(self, context: OpenAILLMContext) -> Optional[_Speculation]:
+        """Hand over the speculation matching the context's latest user message, if any."""
+        speculation, self._speculation = self._speculation, None
+        self._finals = []
+        self._interim = ""
+        self._cancel_stable_timer()
+        if speculation is None:
+            return None
+
+        final_text = latest_user_text(context)
+        similarity = utterance_similarity(speculation.text, final_text) if final_text else 0.0
+        if similarity < self.match_threshold:
+            speculation.cancel()
+            self.record_miss(speculation, f"\"{speculation.text}\" vs \"{final_text}\" ({similarity:.2f})")
+            return None
+        return speculation
+
+    def record_hit(self, speculation: _Speculation):
+        head_start = time.monotonic() - speculation.started_at
+        self.hits += 1
+        self.head_start_total += head_start
+        logger.debug(f"Speculation hit, started {head_start * 1000:.0f}ms before the turn ended")
+
+    def record_miss(self, speculation: _Speculation, reason: str):
+        self.misses += 1
+        logger.debug(f"Speculation miss, falling back to the LLM: {reason}")
+
+    def _discard(self):
+        if self._speculation:
+            self._speculation.cancel()
+            self._speculation = None
+            self.discarded += 1
+
+    def reset(self):
+        self._cancel_stable_timer()
+        self._discard()
+        self._finals = []
+        self._interim = ""
+
+    def stats(self) -> Dict[str, Any]:
+        decided = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "discarded": self.discarded,
+            "hit_rate": round(self.hits / decided, 3) if decided else 0.0,
+            "avg_head_start_ms": round(self.head_start_total / self.hits * 1000, 1) if self.hits else 0.0,
+        }
+
+    def close(self):
+        """Cancel anything in flight and log the call's hit/miss rates."""
+        self.reset()
+        stats = self.stats()
+        logger.info(
+            f"Speculative LLM: {stats['hits']} hits, {stats['misses']} misses "
+            f"(hit rate {stats['hit_rate']:.0%}), {stats['discarded']} discarded, "
+            f"average head start {stats['avg_head_start_ms']:.0f}ms"
+        )
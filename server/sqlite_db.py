@@ -1,7 +1,14 @@
 import os
+import re
 import sqlite3
 import json
 import uuid
+import zlib
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, Tuple, List, Optional
@@ -11,65 +18,412 @@ DB_DIR.mkdir(exist_ok=True)
 
 DB_PATH = DB_DIR / "voice_agent.db"
 
-class SQLiteVoiceAgentDB:
-    
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384"))
+SQLITE_STATEMENT_CACHE_SIZE = int(os.getenv("SQLITE_STATEMENT_CACHE_SIZE", "256"))
+SQLITE_ASYNC_WORKERS = int(os.getenv("SQLITE_ASYNC_WORKERS", "4"))
+
+class SQLiteConnectionManager:
+    """
+    Hands out one long-lived connection per thread for a database file.
+
+    Connections are opened in WAL mode so readers in the server, the bot
+    workers and the post-call pipeline never block on a writer, with a busy
+    timeout instead of immediate ``database is locked`` errors. Each
+    connection keeps its own prepared statement cache, so reusing it across
+    calls avoids re-preparing the same SQL.
+    """
+
+    _managers: Dict[str, "SQLiteConnectionManager"] = {}
+    _managers_lock = threading.Lock()
+
     def __init__(self, db_path=DB_PATH):
-        self.db_path = db_path
-        self._init_db()
-    
-    def _get_connection(self):
-        conn = sqlite3.connect(self.db_path)
+        self.db_path = str(db_path)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+
+    @classmethod
+    def for_path(cls, db_path=DB_PATH) -> "SQLiteConnectionManager":
+        """Return the process-wide manager for a database file."""
+        key = str(db_path)
+        with cls._managers_lock:
+            if key not in cls._managers:
+                cls._managers[key] = cls(db_path)
+            return cls._managers[key]
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+            cached_statements=SQLITE_STATEMENT_CACHE_SIZE,
+        )
         conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
         return conn
+
+    @contextmanager
+    def transaction(self):
+        """Yield this thread's connection inside a transaction that commits on success."""
+        conn = self.connection()
+        with conn:
+            yield conn
+
+    def close_all(self):
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    # Connections can only be closed from their own thread;
+                    # those are released when the thread exits.
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
+
+TRANSCRIPT_LINE_PATTERN = re.compile(r'^(?:\[([^\]]*)\]\s+)?(user|assistant):\s?(.*)$')
+INTERRUPTED_MARKER = " [interrupted]"
+
+def parse_transcript_text(transcript: str) -> List[Dict[str, Any]]:
+    """
+    Split a "[timestamp] role: content" transcript log into utterances.
     
-    def _init_db(self):
-        """Initialize the database tables if they don't exist."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS clients (
-            id TEXT PRIMARY KEY,
-            first_name TEXT NOT NULL,
-            last_name TEXT NOT NULL,
-            phone_number TEXT UNIQUE NOT NULL,
-            email TEXT NOT NULL,
-            city TEXT NOT NULL,
-            job_business TEXT NOT NULL,
-            investor_type TEXT NOT NULL,
-            created_at TEXT NOT NULL
+    Lines that do not start a new utterance are treated as continuations of
+    the previous one.
+    
+    Args:
+        transcript: Transcript text as written by the bot's TranscriptHandler
+        
+    Returns:
+        List of utterance dicts with role, ts, content and interrupted keys
+    """
+    utterances = []
+    for line in (transcript or "").splitlines():
+        match = TRANSCRIPT_LINE_PATTERN.match(line)
+        if match:
+            ts, role, content = match.groups()
+            utterances.append({"role": role, "ts": ts, "content": content, "interrupted": False})
+        elif utterances:
+            utterances[-1]["content"] += "\n" + line
+    
+    for utterance in utterances:
+        utterance["content"] = utterance["content"].rstrip()
+        if utterance["content"].endswith(INTERRUPTED_MARKER):
+            utterance["content"] = utterance["content"][:-len(INTERRUPTED_MARKER)]
+            utterance["interrupted"] = True
+    return utterances
+
+def render_transcript_text(utterances: List[Dict[str, Any]]) -> str:
+    """Render utterances back into the "[timestamp] role: content" log format."""
+    lines = []
+    for utterance in utterances:
+        timestamp = f"[{utterance['ts']}] " if utterance.get("ts") else ""
+        marker = INTERRUPTED_MARKER if utterance.get("interrupted") else ""
+        lines.append(f"{timestamp}{utterance['role']}: {utterance['content']}{marker}")
+    return "\n".join(lines) + ("\n" if lines else "")
+
+# Firestore outbox operations, applied by firestore_replicator.FirestoreReplicator
+OUTBOX_CUSTOMER = "customer"
+OUTBOX_CALL_START = "call_start"
+OUTBOX_CALL_END = "call_end"
+OUTBOX_CLIENT_PROFILE = "client_profile"
+OUTBOX_CALL_MESSAGES = "call_messages"
+
+def enqueue_outbox(conn: sqlite3.Connection, op: str, payload: Dict[str, Any]):
+    """
+    Queue a Firestore write inside the caller's transaction.
+    
+    The write is only replicated if the SQLite change it belongs to commits,
+    so the two stores cannot diverge on a failed request.
+    """
+    now = time.time()
+    conn.execute(
+        "INSERT INTO firestore_outbox (op, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?)",
+        (op, json.dumps(payload, default=str), now, now)
+    )
+
+def _customer_payload(row) -> Dict[str, Any]:
+    return {
+        "client_id": row["id"],
+        "first_name": row["first_name"],
+        "last_name": row["last_name"],
+        "phone_number": row["phone_number"],
+        "email": row["email"],
+        "city": row["city"],
+        "job_business": row["job_business"],
+        "investor_type": row["investor_type"],
+        "created_at": row["created_at"],
+    }
+
+def _migration_base_tables(conn: sqlite3.Connection):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS clients (
+        id TEXT PRIMARY KEY,
+        first_name TEXT NOT NULL,
+        last_name TEXT NOT NULL,
+        phone_number TEXT UNIQUE NOT NULL,
+        email TEXT NOT NULL,
+        city TEXT NOT NULL,
+        job_business TEXT NOT NULL,
+        investor_type TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    )
+    ''')
+    
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS calls (
+        id TEXT PRIMARY KEY,
+        client_id TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        transcript TEXT,
+        summary TEXT,
+        FOREIGN KEY (client_id) REFERENCES clients (id)
+    )
+    ''')
+
+def _migration_legacy_columns(conn: sqlite3.Connection):
+    # Databases created before these columns existed
+    columns = [column[1] for column in conn.execute("PRAGMA table_info(calls)").fetchall()]
+    if "summary" not in columns:
+        conn.execute("ALTER TABLE calls ADD COLUMN summary TEXT")
+    
+    columns = [column[1] for column in conn.execute("PRAGMA table_info(clients)").fetchall()]
+    if "investor_type" not in columns:
+        conn.execute("ALTER TABLE clients ADD COLUMN investor_type TEXT DEFAULT 'individual'")
+
+def _migration_call_indexes(conn: sqlite3.Connection):
+    # Serves get_latest_call / get_call_history (WHERE client_id = ? ORDER BY
+    # timestamp DESC) without a table scan or sort. Phone number lookups are
+    # already served by the implicit index behind clients.phone_number UNIQUE.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_calls_client_timestamp ON calls (client_id, timestamp DESC)")
+
+def _migration_post_call_jobs(conn: sqlite3.Connection):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS post_call_jobs (
+        id TEXT PRIMARY KEY,
+        call_id TEXT NOT NULL,
+        client_id TEXT NOT NULL,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        next_run_at REAL NOT NULL,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+    ''')
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_post_call_jobs_status_next_run ON post_call_jobs (status, next_run_at)"
+    )
+
+def _migration_call_utterances(conn: sqlite3.Connection):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS call_utterances (
+        call_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        ts TEXT,
+        content TEXT NOT NULL,
+        interrupted INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (call_id, seq)
+    ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS call_transcript_archive (
+        call_id TEXT PRIMARY KEY,
+        encoding TEXT NOT NULL,
+        data BLOB NOT NULL,
+        utterance_count INTEGER NOT NULL,
+        archived_at TEXT NOT NULL
+    )
+    ''')
+    
+    # Move existing transcript blobs out of the calls rows
+    rows = conn.execute("SELECT id, transcript FROM calls WHERE transcript IS NOT NULL AND transcript != ''").fetchall()
+    for row in rows:
+        conn.executemany(
+            "INSERT OR REPLACE INTO call_utterances (call_id, seq, role, ts, content, interrupted) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (row["id"], seq, u["role"], u["ts"], u["content"], int(u["interrupted"]))
+                for seq, u in enumerate(parse_transcript_text(row["transcript"]))
+            ]
         )
-        ''')
+    conn.execute("UPDATE calls SET transcript = NULL WHERE transcript IS NOT NULL")
+
+def _migration_incremental_call_state(conn: sqlite3.Connection):
+    # Progress of the bot's in-call processing: how many utterances have been
+    # mirrored to Firestore and the latest rolling summary.
+    columns = [column[1] for column in conn.execute("PRAGMA table_info(calls)").fetchall()]
+    if "transcript_synced_count" not in columns:
+        conn.execute("ALTER TABLE calls ADD COLUMN transcript_synced_count INTEGER NOT NULL DEFAULT 0")
+    if "rolling_summary" not in columns:
+        conn.execute("ALTER TABLE calls ADD COLUMN rolling_summary TEXT")
+
+def _migration_call_highlights(conn: sqlite3.Connection):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS call_highlights (
+        call_id TEXT PRIMARY KEY,
+        client_id TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        client_type TEXT,
+        has_minimum_investment INTEGER,
+        investor_sophistication TEXT,
+        attitude TEXT,
+        summary TEXT,
+        notes TEXT,
+        highlight TEXT
+    )
+    ''')
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_call_highlights_client_created ON call_highlights (client_id, created_at DESC)"
+    )
+
+def _migration_firestore_outbox(conn: sqlite3.Connection):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS firestore_outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        op TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        next_attempt_at REAL NOT NULL,
+        created_at REAL NOT NULL
+    )
+    ''')
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_firestore_outbox_next_attempt ON firestore_outbox (next_attempt_at)"
+    )
+
+# Per-turn stage times in seconds on the call's pipeline clock (see
+# latency_observer.TurnLatencyObserver); NULL when a stage did not happen
+TURN_STAGES = (
+    "vad_end", "transcript", "llm_start", "llm_first_token", "llm_end",
+    "tts_start", "tts_first_audio", "audio_out",
+)
+
+def _migration_call_turn_metrics(conn: sqlite3.Connection):
+    stage_columns = ",\n".join(f"        {stage}_at REAL" for stage in TURN_STAGES)
+    conn.execute(f'''
+    CREATE TABLE IF NOT EXISTS call_turn_metrics (
+        call_id TEXT NOT NULL,
+        turn INTEGER NOT NULL,
+        started_at TEXT NOT NULL,
+{stage_columns},
+        interrupted INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (call_id, turn)
+    )
+    ''')
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_call_turn_metrics_started ON call_turn_metrics (started_at)"
+    )
+
+def _migration_transcript_closed(conn: sqlite3.Connection):
+    # Set by the bot once it has flushed the call's last utterances;
+    # post-call processing waits for it
+    columns = [column[1] for column in conn.execute("PRAGMA table_info(calls)").fetchall()]
+    if "transcript_closed_at" not in columns:
+        conn.execute("ALTER TABLE calls ADD COLUMN transcript_closed_at TEXT")
+
+# Ordered schema migrations: (version, description, function). Append new
+# entries with the next version number; never edit one that has shipped.
+MIGRATIONS = [
+    (1, "base clients and calls tables", _migration_base_tables),
+    (2, "summary and investor_type columns", _migration_legacy_columns),
+    (3, "calls (client_id, timestamp DESC) index", _migration_call_indexes),
+    (4, "post_call_jobs queue table", _migration_post_call_jobs),
+    (5, "per-utterance transcript storage", _migration_call_utterances),
+    (6, "incremental call processing state", _migration_incremental_call_state),
+    (7, "structured call highlights", _migration_call_highlights),
+    (8, "firestore replication outbox", _migration_firestore_outbox),
+    (9, "per-turn latency metrics", _migration_call_turn_metrics),
+    (10, "end-of-call transcript marker", _migration_transcript_closed),
+]
+
+_migrated_paths = set()
+_migration_lock = threading.Lock()
+
+def run_migrations(connections: SQLiteConnectionManager) -> int:
+    """
+    Apply any pending schema migrations to a database.
+    
+    Applied versions are recorded in the schema_version table. The check runs
+    once per process per database file, and the migrations themselves run
+    under an immediate write lock so concurrent processes apply each one once.
+    
+    Args:
+        connections: Connection manager for the database file
+        
+    Returns:
+        The number of migrations applied
+    """
+    with _migration_lock:
+        if connections.db_path in _migrated_paths:
+            return 0
         
-        # Create calls table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS calls (
-            id TEXT PRIMARY KEY,
-            client_id TEXT NOT NULL,
-            timestamp TEXT NOT NULL,
-            transcript TEXT,
-            summary TEXT,
-            FOREIGN KEY (client_id) REFERENCES clients (id)
+        conn = connections.connection()
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL
         )
         ''')
+        conn.commit()
         
-        # Check if summary column exists in calls table, add it if not
-        cursor.execute("PRAGMA table_info(calls)")
-        columns = [column[1] for column in cursor.fetchall()]
-        if "summary" not in columns:
-            cursor.execute("ALTER TABLE calls ADD COLUMN summary TEXT")
+        applied = 0
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            current = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+            for version, description, migrate in MIGRATIONS:
+                if version <= current:
+                    continue
+                migrate(conn)
+                conn.execute(
+                    "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                    (version, description, datetime.now().isoformat())
+                )
+                print(f"Applied SQLite migration {version}: {description}")
+                applied += 1
             conn.commit()
-            
-        # Check if investor_type column exists in clients table, add it if not
-        cursor.execute("PRAGMA table_info(clients)")
-        columns = [column[1] for column in cursor.fetchall()]
-        if "investor_type" not in columns:
-            cursor.execute("ALTER TABLE clients ADD COLUMN investor_type TEXT DEFAULT 'individual'")
+        except Exception:
+            conn.rollback()
+            raise
+        
+        if applied:
+            # Refresh planner statistics so the new indexes get used
+            conn.execute("ANALYZE")
             conn.commit()
-            print("Added investor_type column to clients table")
         
-        conn.commit()
-        conn.close()
+        _migrated_paths.add(connections.db_path)
+        return applied
+
+class SQLiteVoiceAgentDB:
+    
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._connections = SQLiteConnectionManager.for_path(db_path)
+        self._init_db()
+    
+    def _get_connection(self):
+        return self._connections.connection()
+    
+    def _init_db(self):
+        """Bring the database schema up to date."""
+        run_migrations(self._connections)
     
     def add_customer(self, first_name: str, last_name: str, phone_number: str, 
                      email: str, city: str, job_business: str,
@@ -91,28 +445,25 @@ class SQLiteVoiceAgentDB:
         """
         client_id = str(uuid.uuid4())
         conn = self._get_connection()
-        cursor = conn.cursor()
         
         try:
-            cursor.execute(
-                '''
-                INSERT INTO clients (id, first_name, last_name, phone_number, email, city, job_business, investor_type, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''',
-                (
-                    client_id, first_name, last_name, phone_number, 
-                    email, city, job_business, investor_type, datetime.now().isoformat()
+            with conn:
+                conn.execute(
+                    '''
+                    INSERT INTO clients (id, first_name, last_name, phone_number, email, city, job_business, investor_type, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''',
+                    (
+                        client_id, first_name, last_name, phone_number, 
+                        email, city, job_business, investor_type, datetime.now().isoformat()
+                    )
                 )
-            )
-            conn.commit()
+                self._enqueue_customer(conn, client_id)
             return client_id
         except sqlite3.IntegrityError:
             # If the phone number already exists, return the existing client ID
-            cursor.execute("SELECT id FROM clients WHERE phone_number = ?", (phone_number,))
-            existing_id = cursor.fetchone()
+            existing_id = conn.execute("SELECT id FROM clients WHERE phone_number = ?", (phone_number,)).fetchone()
             return existing_id["id"] if existing_id else None
-        finally:
-            conn.close()
     
     def add_customer_with_id(self, client_id: str, first_name: str, last_name: str, phone_number: str, 
                            email: str, city: str, job_business: str,
@@ -133,40 +484,53 @@ class SQLiteVoiceAgentDB:
         Returns:
             The ID of the created customer (same as the input client_id)
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
         try:
-            # First check if the client with this phone number already exists
-            cursor.execute("SELECT id FROM clients WHERE phone_number = ?", (phone_number,))
-            existing = cursor.fetchone()
-            if existing:
-                return existing["id"]
-            
-            # Also check if client with this ID already exists
-            cursor.execute("SELECT id FROM clients WHERE id = ?", (client_id,))
-            id_exists = cursor.fetchone()
-            if id_exists:
-                return client_id  # Client with this ID already exists
+            with self._connections.transaction() as conn:
+                # First check if the client with this phone number already exists
+                existing = conn.execute("SELECT id FROM clients WHERE phone_number = ?", (phone_number,)).fetchone()
+                if existing:
+                    return existing["id"]
                 
-            # Insert the new client with the specified ID
-            cursor.execute(
-                '''
-                INSERT INTO clients (id, first_name, last_name, phone_number, email, city, job_business, investor_type, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''',
-                (
-                    client_id, first_name, last_name, phone_number, 
-                    email, city, job_business, investor_type, datetime.now().isoformat()
+                # Also check if client with this ID already exists
+                id_exists = conn.execute("SELECT id FROM clients WHERE id = ?", (client_id,)).fetchone()
+                if id_exists:
+                    return client_id  # Client with this ID already exists
+                    
+                # Insert the new client with the specified ID
+                conn.execute(
+                    '''
+                    INSERT INTO clients (id, first_name, last_name, phone_number, email, city, job_business, investor_type, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''',
+                    (
+                        client_id, first_name, last_name, phone_number, 
+                        email, city, job_business, investor_type, datetime.now().isoformat()
+                    )
                 )
-            )
-            conn.commit()
+                self._enqueue_customer(conn, client_id)
             return client_id
         except Exception as e:
             print(f"Error in add_customer_with_id: {e}")
             return None
-        finally:
-            conn.close()
+    
+    def _enqueue_customer(self, conn: sqlite3.Connection, client_id: str) -> bool:
+        row = conn.execute("SELECT * FROM clients WHERE id = ?", (client_id,)).fetchone()
+        if not row:
+            return False
+        enqueue_outbox(conn, OUTBOX_CUSTOMER, _customer_payload(row))
+        return True
+    
+    def replicate_customer(self, client_id: str) -> bool:
+        """
+        Queue a customer for (re-)replication to Firestore.
+        
+        Used when a customer is found locally but is missing in Firestore.
+        
+        Returns:
+            True if the customer exists and was queued, False otherwise
+        """
+        with self._connections.transaction() as conn:
+            return self._enqueue_customer(conn, client_id)
     
     def get_customer_by_phone(self, phone_number: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
         """
@@ -179,11 +543,7 @@ class SQLiteVoiceAgentDB:
             A tuple containing the customer ID and customer data (or None, None if not found)
         """
         conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM clients WHERE phone_number = ?", (phone_number,))
-        row = cursor.fetchone()
-        conn.close()
+        row = conn.execute("SELECT * FROM clients WHERE phone_number = ?", (phone_number,)).fetchone()
         
         if row:
             client_data = dict(row)
@@ -202,11 +562,7 @@ class SQLiteVoiceAgentDB:
             Customer data or None if not found
         """
         conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM clients WHERE id = ?", (client_id,))
-        row = cursor.fetchone()
-        conn.close()
+        row = conn.execute("SELECT * FROM clients WHERE id = ?", (client_id,)).fetchone()
         
         return dict(row) if row else None
     
@@ -221,15 +577,13 @@ class SQLiteVoiceAgentDB:
             The ID of the created call
         """
         call_id = str(uuid.uuid4())
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "INSERT INTO calls (id, client_id, timestamp, transcript) VALUES (?, ?, ?, ?)",
-            (call_id, client_id, datetime.now().isoformat(), None)
-        )
-        conn.commit()
-        conn.close()
+        started_at = datetime.now().isoformat()
+        with self._connections.transaction() as conn:
+            conn.execute(
+                "INSERT INTO calls (id, client_id, timestamp) VALUES (?, ?, ?)",
+                (call_id, client_id, started_at)
+            )
+            enqueue_outbox(conn, OUTBOX_CALL_START, {"call_id": call_id, "client_id": client_id, "started_at": started_at})
         
         return call_id
     
@@ -244,31 +598,30 @@ class SQLiteVoiceAgentDB:
         Returns:
             The ID of the created call (same as input call_id)
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
         try:
-            # Check if call with this ID already exists
-            cursor.execute("SELECT id FROM calls WHERE id = ?", (call_id,))
-            existing = cursor.fetchone()
-            if existing:
-                return call_id  # Call already exists with this ID
-                
-            cursor.execute(
-                "INSERT INTO calls (id, client_id, timestamp, transcript, summary) VALUES (?, ?, ?, ?, ?)",
-                (call_id, client_id, datetime.now().isoformat(), None, None)
-            )
-            conn.commit()
+            with self._connections.transaction() as conn:
+                # Check if call with this ID already exists
+                existing = conn.execute("SELECT id FROM calls WHERE id = ?", (call_id,)).fetchone()
+                if existing:
+                    return call_id  # Call already exists with this ID
+                    
+                started_at = datetime.now().isoformat()
+                conn.execute(
+                    "INSERT INTO calls (id, client_id, timestamp, summary) VALUES (?, ?, ?, ?)",
+                    (call_id, client_id, started_at, None)
+                )
+                enqueue_outbox(conn, OUTBOX_CALL_START, {"call_id": call_id, "client_id": client_id, "started_at": started_at})
             return call_id
         except Exception as e:
             print(f"Error in create_call_with_id: {e}")
             return None
-        finally:
-            conn.close()
     
     def update_call_transcript(self, call_id: str, transcript: str) -> bool:
         """
-        Update the transcript for a call.
+        Replace the transcript for a call.
+        
+        The transcript text is split into utterances and stored in the
+        call_utterances table rather than on the calls row.
         
         Args:
             call_id: ID of the call
@@ -277,40 +630,157 @@ class SQLiteVoiceAgentDB:
         Returns:
             True if successful, False otherwise
         """
+        utterances = parse_transcript_text(transcript)
+        with self._connections.transaction() as conn:
+            if not conn.execute("SELECT 1 FROM calls WHERE id = ?", (call_id,)).fetchone():
+                return False
+            conn.execute("DELETE FROM call_utterances WHERE call_id = ?", (call_id,))
+            conn.execute("DELETE FROM call_transcript_archive WHERE call_id = ?", (call_id,))
+            # Whatever was mirrored to Firestore no longer matches
+            conn.execute("UPDATE calls SET transcript_synced_count = 0 WHERE id = ?", (call_id,))
+            conn.executemany(
+                "INSERT INTO call_utterances (call_id, seq, role, ts, content, interrupted) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (call_id, seq, u["role"], u["ts"], u["content"], int(u["interrupted"]))
+                    for seq, u in enumerate(utterances)
+                ]
+            )
+        
+        return True
+    
+    def add_call_utterances(self, call_id: str, utterances: List[Dict[str, Any]]) -> int:
+        """
+        Append utterances to a call's transcript.
+        
+        Used by the bot to stream the transcript in while the call is live.
+        
+        Args:
+            call_id: ID of the call
+            utterances: Utterance dicts with role, ts, content and interrupted keys
+            
+        Returns:
+            The number of utterances written
+        """
+        if not utterances:
+            return 0
+        with self._connections.transaction() as conn:
+            next_seq = conn.execute(
+                "SELECT COALESCE(MAX(seq) + 1, 0) FROM call_utterances WHERE call_id = ?",
+                (call_id,)
+            ).fetchone()[0]
+            conn.executemany(
+                "INSERT INTO call_utterances (call_id, seq, role, ts, content, interrupted) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (call_id, next_seq + n, u["role"], u.get("ts"), u["content"], int(bool(u.get("interrupted"))))
+                    for n, u in enumerate(utterances)
+                ]
+            )
+        return len(utterances)
+    
+    def get_call_transcript(self, call_id: str) -> List[Dict[str, Any]]:
+        """
+        Get the utterances of a call, including archived ones.
+        
+        Args:
+            call_id: ID of the call
+            
+        Returns:
+            List of utterance dicts ordered by seq (empty if none)
+        """
         conn = self._get_connection()
-        cursor = conn.cursor()
+        rows = conn.execute(
+            "SELECT seq, role, ts, content, interrupted FROM call_utterances WHERE call_id = ? ORDER BY seq",
+            (call_id,)
+        ).fetchall()
+        if rows:
+            return [dict(row, interrupted=bool(row["interrupted"])) for row in rows]
         
-        cursor.execute(
-            "UPDATE calls SET transcript = ? WHERE id = ?",
-            (transcript, call_id)
-        )
-        success = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+        archived = conn.execute(
+            "SELECT encoding, data FROM call_transcript_archive WHERE call_id = ?",
+            (call_id,)
+        ).fetchone()
+        if archived and archived["encoding"] == "zlib+json":
+            return json.loads(zlib.decompress(archived["data"]).decode("utf-8"))
+        return []
+    
+    def get_call_transcript_text(self, call_id: str) -> str:
+        """Get a call's transcript rendered as "[timestamp] role: content" lines."""
+        return render_transcript_text(self.get_call_transcript(call_id))
+    
+    def archive_call_transcripts(self, before: str) -> int:
+        """
+        Compress the transcripts of calls older than a cutoff.
         
-        return success
+        Utterance rows are folded into a single zlib-compressed JSON blob per
+        call in call_transcript_archive and removed from call_utterances.
+        
+        Args:
+            before: ISO timestamp; calls started before it are archived
+            
+        Returns:
+            The number of calls archived
+        """
+        conn = self._get_connection()
+        call_ids = [
+            row["id"] for row in conn.execute(
+                '''
+                SELECT c.id FROM calls c
+                WHERE c.timestamp < ? AND EXISTS (SELECT 1 FROM call_utterances u WHERE u.call_id = c.id)
+                ''',
+                (before,)
+            ).fetchall()
+        ]
+        
+        for call_id in call_ids:
+            utterances = self.get_call_transcript(call_id)
+            data = zlib.compress(json.dumps(utterances).encode("utf-8"), 9)
+            with self._connections.transaction() as conn:
+                conn.execute(
+                    '''
+                    INSERT OR REPLACE INTO call_transcript_archive (call_id, encoding, data, utterance_count, archived_at)
+                    VALUES (?, 'zlib+json', ?, ?, ?)
+                    ''',
+                    (call_id, data, len(utterances), datetime.now().isoformat())
+                )
+                conn.execute("DELETE FROM call_utterances WHERE call_id = ?", (call_id,))
+        
+        return len(call_ids)
     
     def get_latest_call(self, client_id: str) -> Optional[Dict[str, Any]]:
         """
         Get the latest call for a client.
         
+        Only call metadata is read: whether a transcript exists and the
+        caller's first utterance come from the utterance table, never from
+        the transcript itself.
+        
         Args:
             client_id: ID of the client
             
         Returns:
-            The latest call data or None if not found
+            The latest call data (id, client_id, timestamp, summary,
+            has_transcript, first_user_message) or None if not found
         """
         conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT * FROM calls WHERE client_id = ? ORDER BY timestamp DESC LIMIT 1",
+        row = conn.execute(
+            '''
+            SELECT c.id, c.client_id, c.timestamp, c.summary,
+                   (EXISTS (SELECT 1 FROM call_utterances u WHERE u.call_id = c.id)
+                    OR EXISTS (SELECT 1 FROM call_transcript_archive a WHERE a.call_id = c.id)) AS has_transcript,
+                   (SELECT u.content FROM call_utterances u
+                    WHERE u.call_id = c.id AND u.role = 'user' ORDER BY u.seq LIMIT 1) AS first_user_message
+            FROM calls c
+            WHERE c.client_id = ?
+            ORDER BY c.timestamp DESC LIMIT 1
+            ''',
             (client_id,)
-        )
-        row = cursor.fetchone()
-        conn.close()
+        ).fetchone()
         
-        return dict(row) if row else None
+        if not row:
+            return None
+        call = dict(row)
+        call["has_transcript"] = bool(call["has_transcript"])
+        return call
     
     def get_call_history(self, client_id: str, limit: int = 5) -> List[Dict[str, Any]]:
         """
@@ -321,20 +791,235 @@ class SQLiteVoiceAgentDB:
             limit: Maximum number of calls to return
             
         Returns:
-            List of call data
+            List of call metadata (transcripts are not included)
         """
         conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT * FROM calls WHERE client_id = ? ORDER BY timestamp DESC LIMIT ?",
+        rows = conn.execute(
+            "SELECT id, client_id, timestamp, summary FROM calls WHERE client_id = ? ORDER BY timestamp DESC LIMIT ?",
             (client_id, limit)
-        )
-        rows = cursor.fetchall()
-        conn.close()
+        ).fetchall()
         
         return [dict(row) for row in rows]
     
+    def get_call_history_with_transcripts(self, client_id: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Get call history for a client with each call's transcript.
+        
+        Calls, utterances and archived transcripts are read in one query.
+        
+        Args:
+            client_id: ID of the client
+            limit: Maximum number of calls to return
+            
+        Returns:
+            List of call metadata dicts, newest first, each with a
+            ``transcript`` list of utterance dicts
+        """
+        conn = self._get_connection()
+        rows = conn.execute(
+            """
+            WITH recent AS (
+                SELECT id, client_id, timestamp, summary FROM calls
+                WHERE client_id = ? ORDER BY timestamp DESC LIMIT ?
+            )
+            SELECT r.id, r.client_id, r.timestamp, r.summary,
+                   u.seq, u.role, u.ts, u.content, u.interrupted,
+                   a.encoding, a.data
+            FROM recent r
+            LEFT JOIN call_utterances u ON u.call_id = r.id
+            LEFT JOIN call_transcript_archive a ON a.call_id = r.id AND u.call_id IS NULL
+            ORDER BY r.timestamp DESC, r.id, u.seq
+            """,
+            (client_id, limit)
+        ).fetchall()
+        
+        calls: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            call = calls.get(row["id"])
+            if call is None:
+                call = calls[row["id"]] = {
+                    "id": row["id"],
+                    "client_id": row["client_id"],
+                    "timestamp": row["timestamp"],
+                    "summary": row["summary"],
+                    "transcript": [],
+                }
+            if row["seq"] is not None:
+                call["transcript"].append({
+                    "seq": row["seq"],
+                    "role": row["role"],
+                    "ts": row["ts"],
+                    "content": row["content"],
+                    "interrupted": bool(row["interrupted"]),
+                })
+            elif row["encoding"] == "zlib+json":
+                call["transcript"] = json.loads(zlib.decompress(row["data"]).decode("utf-8"))
+        
+        return list(calls.values())
+    
+    def mark_transcript_synced(self, call_id: str, synced_count: int) -> bool:
+        """
+        Record how many of a call's utterances have been written to Firestore.
+        
+        Args:
+            call_id: ID of the call
+            synced_count: Number of leading utterances already in Firestore
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        with self._connections.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE calls SET transcript_synced_count = ? WHERE id = ?",
+                (synced_count, call_id)
+            )
+            success = cursor.rowcount > 0
+        
+        return success
+    
+    def queue_transcript_sync(self, call_id: str, messages: List[Dict[str, Any]], synced_count: int) -> bool:
+        """
+        Queue utterances for the call's Firestore transcript and record the sync count.
+        
+        Both happen in one transaction, and the outbox entry replicates after
+        the call's own creation entry, so the count never runs ahead of what
+        Firestore will hold.
+        
+        Args:
+            call_id: ID of the call
+            messages: Firestore transcript entries to append
+            synced_count: Number of leading utterances queued for Firestore,
+                including ``messages``
+            
+        Returns:
+            True if the call exists, False otherwise
+        """
+        with self._connections.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE calls SET transcript_synced_count = ? WHERE id = ?",
+                (synced_count, call_id)
+            )
+            if cursor.rowcount == 0:
+                return False
+            enqueue_outbox(conn, OUTBOX_CALL_MESSAGES, {"call_id": call_id, "messages": messages})
+        return True
+    
+    def mark_transcript_closed(self, call_id: str) -> bool:
+        """
+        Record that the bot has written the last of a call's transcript.
+        
+        Args:
+            call_id: ID of the call
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        with self._connections.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE calls SET transcript_closed_at = ? WHERE id = ?",
+                (datetime.now().isoformat(), call_id)
+            )
+            success = cursor.rowcount > 0
+        
+        return success
+    
+    def update_rolling_summary(self, call_id: str, summary: str) -> bool:
+        """
+        Store the in-call rolling summary for a call.
+        
+        Args:
+            call_id: ID of the call
+            summary: Summary of the conversation so far
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        with self._connections.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE calls SET rolling_summary = ? WHERE id = ?",
+                (summary, call_id)
+            )
+            success = cursor.rowcount > 0
+        
+        return success
+    
+    def get_call_processing_state(self, call_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get what the bot already processed while the call was live.
+        
+        Args:
+            call_id: ID of the call
+            
+        Returns:
+            Dict with utterance_count, transcript_synced_count,
+            rolling_summary and transcript_closed_at, or None if the call
+            does not exist
+        """
+        conn = self._get_connection()
+        row = conn.execute(
+            '''
+            SELECT c.transcript_synced_count, c.rolling_summary, c.transcript_closed_at,
+                   (SELECT COUNT(*) FROM call_utterances u WHERE u.call_id = c.id) AS utterance_count
+            FROM calls c WHERE c.id = ?
+            ''',
+            (call_id,)
+        ).fetchone()
+        
+        return dict(row) if row else None
+    
+    def add_call_turn_metrics(self, call_id: str, turns: List[Dict[str, Any]]) -> int:
+        """
+        Store per-turn latency timestamps for a call.
+        
+        Args:
+            call_id: ID of the call
+            turns: Dicts with ``turn``, ``started_at``, ``interrupted`` and a
+                ``<stage>_at`` value for each stage in TURN_STAGES
+            
+        Returns:
+            The number of turns written
+        """
+        if not turns:
+            return 0
+        columns = ["call_id", "turn", "started_at", *(f"{stage}_at" for stage in TURN_STAGES), "interrupted"]
+        rows = [
+            (
+                call_id, turn["turn"], turn["started_at"],
+                *(turn.get(f"{stage}_at") for stage in TURN_STAGES),
+                int(bool(turn.get("interrupted"))),
+            )
+            for turn in turns
+        ]
+        with self._connections.transaction() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO call_turn_metrics ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                rows
+            )
+        return len(rows)
+    
+    def get_call_turn_metrics(self, call_id: Optional[str] = None, since: Optional[str] = None,
+                              limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Get per-turn latency rows, newest first.
+        
+        Args:
+            call_id: Only this call's turns
+            since: Only turns started at or after this ISO timestamp
+            limit: Maximum number of rows
+        """
+        query = "SELECT * FROM call_turn_metrics WHERE 1 = 1"
+        params: List[Any] = []
+        if call_id:
+            query += " AND call_id = ?"
+            params.append(call_id)
+        if since:
+            query += " AND started_at >= ?"
+            params.append(since)
+        query += " ORDER BY started_at DESC LIMIT ?"
+        params.append(limit)
+        rows = self._get_connection().execute(query, params).fetchall()
+        return [dict(row, interrupted=bool(row["interrupted"])) for row in rows]
+    
     def update_call_summary(self, call_id: str, summary: str) -> bool:
         """
         Update the summary for a call.
@@ -346,15 +1031,90 @@ class SQLiteVoiceAgentDB:
         Returns:
             True if successful, False otherwise
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._connections.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE calls SET summary = ? WHERE id = ?",
+                (summary, call_id)
+            )
+            success = cursor.rowcount > 0
         
-        cursor.execute(
-            "UPDATE calls SET summary = ? WHERE id = ?",
-            (summary, call_id)
-        )
-        success = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+        return success
+    
+    def complete_call(self, call_id: str, client_id: str, summary: str, tags: Optional[List[str]] = None,
+                      transcript: Optional[List[Dict[str, Any]]] = None,
+                      profile: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Record the outcome of a processed call and queue its Firestore writes.
+        
+        The summary is stored locally; ending the call in Firestore (summary,
+        tags, duration and, if given, the formatted transcript) and the client
+        profile update are queued in the same transaction.
         
-        return success 
\ No newline at end of file
+        Args:
+            call_id: ID of the call
+            client_id: ID of the client on the call
+            summary: Call summary
+            tags: Call tags
+            transcript: Formatted transcript to store in Firestore, or None if
+                it was already synced during the call
+            profile: Client profile fields extracted from the call
+            
+        Returns:
+            True if the call exists, False otherwise
+        """
+        ended_at = datetime.now()
+        with self._connections.transaction() as conn:
+            row = conn.execute("SELECT timestamp FROM calls WHERE id = ?", (call_id,)).fetchone()
+            if not row:
+                return False
+            conn.execute("UPDATE calls SET summary = ? WHERE id = ?", (summary, call_id))
+            
+            duration = None
+            try:
+                duration = (ended_at - datetime.fromisoformat(row["timestamp"])).total_seconds()
+            except (TypeError, ValueError):
+                pass
+            enqueue_outbox(conn, OUTBOX_CALL_END, {
+                "call_id": call_id,
+                "summary": summary,
+                "tags": tags or [],
+                "ended_at": ended_at.isoformat(),
+                "duration": duration,
+                "transcript": transcript,
+            })
+            if profile:
+                enqueue_outbox(conn, OUTBOX_CLIENT_PROFILE, {"client_id": client_id, "profile": profile})
+        return True
+
+class AsyncSQLiteVoiceAgentDB:
+    """
+    Awaitable facade over SQLiteVoiceAgentDB for use from async handlers.
+
+    Every method of the wrapped database is exposed as a coroutine that runs on
+    a small dedicated thread pool, so the event loop never blocks on SQLite and
+    each pool thread keeps reusing its own connection.
+    """
+
+    def __init__(self, db: Optional[SQLiteVoiceAgentDB] = None, max_workers: int = SQLITE_ASYNC_WORKERS):
+        self.db = db or SQLiteVoiceAgentDB()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sqlite")
+
+    async def run(self, func, *args, **kwargs):
+        """Run ``func(*args, **kwargs)`` on the SQLite thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: func(*args, **kwargs))
+
+    def __getattr__(self, name):
+        attr = getattr(self.db, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        async def method(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        method.__name__ = name
+        method.__doc__ = attr.__doc__
+        return method
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,48 @@
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class StageGraph:
+    """Runs named async stages, starting each one as soon as its dependencies finish.
+
+    A stage receives the results of the stages it depends on as positional
+    arguments, in the order they were declared. Wall-clock time spent inside
+    each stage (excluding time waiting on dependencies) is recorded in
+    ``timings``.
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, Tuple[Callable[..., Awaitable[Any]], Tuple[str, ...]]] = {}
+        self.timings: Dict[str, float] = {}
+
+    def add(self, name: str, func: Callable[..., Awaitable[Any]], *depends_on: str) -> None:
+        self._stages[name] = (func, depends_on)
+
+    async def run(self) -> Dict[str, Any]:
+        for name, (_, depends_on) in self._stages.items():
+            missing = [dep for dep in depends_on if dep not in self._stages]
+            if missing:
+                raise ValueError(f"Stage {name} depends on unknown stages: {missing}")
+
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(name: str) -> Any:
+            func, depends_on = self._stages[name]
+            args = [await tasks[dep] for dep in depends_on]
+            start = time.perf_counter()
+            try:
+                return await func(*args)
+            finally:
+                self.timings[name] = time.perf_counter() - start
+
+        for name in self._stages:
+            tasks[name] = asyncio.create_task(run_stage(name))
+
+        try:
+            results = await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        return dict(zip(tasks.keys(), results))
@@ -0,0 +1,28 @@
+import math
+
+# Rough characters-per-token ratio for English text with Gemini/Llama
+# tokenizers; good enough for budgeting prompt sections without a tokenizer
+# round trip.
+CHARS_PER_TOKEN = 4
+
+TRUNCATION_MARKER = " ..."
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of LLM tokens in a piece of text."""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text down to roughly ``max_tokens`` tokens, ending on a line or word boundary."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # Leave room for the marker so the result stays within the budget
+    limit = max(0, max_tokens * CHARS_PER_TOKEN - len(TRUNCATION_MARKER))
+    cut = text[:limit]
+    boundary = max(cut.rfind("\n"), cut.rfind(" "))
+    if boundary > limit // 2:
+        cut = cut[:boundary]
+    return cut.rstrip() + TRUNCATION_MARKER
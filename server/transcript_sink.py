@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import asyncio
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+TRANSCRIPT_FLUSH_BYTES = int(os.getenv("TRANSCRIPT_FLUSH_BYTES", "4096"))
+TRANSCRIPT_FLUSH_INTERVAL = float(os.getenv("TRANSCRIPT_FLUSH_INTERVAL", "2"))
+TRANSCRIPT_SQLITE_STREAMING = os.getenv("TRANSCRIPT_SQLITE_STREAMING", "true").lower() in ("1", "true", "yes")
+
+INTERRUPTED_MARKER = " [interrupted]"
+
+
+class TranscriptSink:
+    """
+    Buffered writer for a call's transcript.
+
+    Utterances are appended to an in-memory buffer and written out in batches
+    from a worker thread, so the pipeline's event loop never blocks on disk.
+    Each call produces the human-readable ``{call_id}.txt`` log (the format the
+    post-call pipeline parses) and a structured ``{call_id}.jsonl`` file. When a
+    SQLite database is given, each flushed batch is also appended to its
+    utterance store.
+
+    The buffer is flushed once it holds ``flush_bytes`` of text, every
+    ``flush_interval`` seconds while it is non-empty, and on ``close`` (which
+    also fsyncs both files).
+
+    A batch that fails to reach the files is put back at the front of the
+    buffer, and utterances SQLite rejected are kept apart from it, so the
+    next flush (or ``close``) retries each store without writing lines twice.
+    """
+
+    def __init__(self, call_id: str, log_dir, sqlite_db=None,
+                 flush_bytes: int = TRANSCRIPT_FLUSH_BYTES,
+                 flush_interval: float = TRANSCRIPT_FLUSH_INTERVAL):
+        self.call_id = call_id
+        self.text_path = Path(log_dir) / f"{call_id}.txt"
+        self.jsonl_path = Path(log_dir) / f"{call_id}.jsonl"
+        self.sqlite_db = sqlite_db
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+
+        self._text_file = None
+        self._jsonl_file = None
+        self._pending: List[Dict[str, Any]] = []
+        self._pending_bytes = 0
+        # Written to the files but not yet stored in SQLite
+        self._unstored: List[Dict[str, Any]] = []
+        self._last_flush = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def open(self):
+        """Create (or truncate) the transcript files and start the flush timer."""
+        await asyncio.to_thread(self._open_files)
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        logger.debug(f"Transcript sink writing to {self.text_path}")
+
+    def _open_files(self):
+        self.text_path.parent.mkdir(parents=True, exist_ok=True)
+        self._text_file = open(self.text_path, "w", encoding="utf-8")
+        self._jsonl_file = open(self.jsonl_path, "w", encoding="utf-8")
+
+    async def write(self, role: str, content: str, timestamp: Optional[str] = None, interrupted: bool = False):
+        """
+        Buffer one utterance.
+
+        Args:
+            role: "user" or "assistant"
+            content: Utterance text, without the interruption marker
+            timestamp: Timestamp string shown in the text log
+            interrupted: Whether the bot was cut off while speaking
+        """
+        if self._closed:
+            logger.warning(f"Dropping transcript message for closed call {self.call_id}")
+            return
+
+        utterance = {"role": role, "ts": timestamp, "content": content, "interrupted": interrupted}
+        self._pending.append(utterance)
+        self._pending_bytes += len(content)
+
+        if self._pending_bytes >= self.flush_bytes:
+            await self.flush()
+
+    async def flush(self):
+        """Write buffered utterances to disk (and SQLite, if enabled)."""
+        async with self._lock:
+            if not self._pending and not self._unstored:
+                return
+            batch, self._pending, self._pending_bytes = self._pending, [], 0
+            self._last_flush = time.monotonic()
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                # Put the batch back ahead of anything buffered meanwhile
+                self._pending[:0] = batch
+                self._pending_bytes += sum(len(utterance["content"]) for utterance in batch)
+                logger.error(f"Error flushing transcript for call {self.call_id}, retrying on the next flush: {e}")
+
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        if batch and self._text_file:
+            lines = []
+            for utterance in batch:
+                timestamp = f"[{utterance['ts']}] " if utterance["ts"] else ""
+                marker = INTERRUPTED_MARKER if utterance["interrupted"] else ""
+                lines.append(f"{timestamp}{utterance['role']}: {utterance['content']}{marker}\n")
+            self._text_file.write("".join(lines))
+            self._text_file.flush()
+            self._jsonl_file.write("".join(json.dumps(utterance) + "\n" for utterance in batch))
+            self._jsonl_file.flush()
+
+        if self.sqlite_db is not None:
+            # The files already hold this batch, so a SQLite failure must not
+            # send it back through the file writes
+            self._unstored.extend(batch)
+            try:
+                self.sqlite_db.add_call_utterances(self.call_id, self._unstored)
+                self._unstored = []
+            except Exception as e:
+                logger.error(
+                    f"Error storing {len(self._unstored)} utterances of call {self.call_id} in SQLite, "
+                    f"retrying on the next flush: {e}"
+                )
+
+    async def close(self):
+        """Flush remaining utterances, fsync and close the files."""
+        if self._closed:
+            return
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        if self._pending or self._unstored:
+            # Last chance for a batch an earlier flush failed to write
+            await self.flush()
+        if self._pending or self._unstored:
+            logger.error(
+                f"Transcript for call {self.call_id} is incomplete: {len(self._pending)} utterances not written, "
+                f"{len(self._unstored)} not stored in SQLite"
+            )
+        self._closed = True
+        await asyncio.to_thread(self._close_files)
+        logger.debug(f"Transcript sink for call {self.call_id} closed")
+
+    def _close_files(self):
+        for f in (self._text_file, self._jsonl_file):
+            if f is None:
+                continue
+            try:
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                f.close()
+        self._text_file = self._jsonl_file = None
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if (self._pending or self._unstored) and time.monotonic() - self._last_flush >= self.flush_interval:
+                await self.flush()
@@ -0,0 +1,202 @@
+import os
+import json
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from loguru import logger
+
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+TTS_CACHE_DIR = Path(os.getenv("TTS_CACHE_DIR", str(Path(__file__).parent.parent / "tts_cache")))
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Longer utterances are one-offs; caching them only churns the cache
+TTS_CACHE_MAX_TEXT_CHARS = int(os.getenv("TTS_CACHE_MAX_TEXT_CHARS", "400"))
+# A sentence synthesized this many times is fetched on its own and cached
+TTS_CACHE_PROMOTE_AFTER = int(os.getenv("TTS_CACHE_PROMOTE_AFTER", "2"))
+TTS_PRESYNTHESIZE_GREETING = os.getenv("TTS_PRESYNTHESIZE_GREETING", "true").lower() in ("1", "true", "yes")
+
+# The bot's voice. The server pre-synthesizes with the same settings, so they
+# live here rather than in bot.py.
+CARTESIA_VOICE_ID = "f8f5f1b2-f02d-4d8e-a40d-fd850a487b3d"
+CARTESIA_MODEL = "sonic-2-2025-04-16"
+CARTESIA_SPEED = -0.3
+CARTESIA_EMOTION = ["positivity", "curiosity"]
+CARTESIA_LANGUAGE = "en"
+CARTESIA_VERSION = "2024-06-10"
+CARTESIA_API_URL = os.getenv("CARTESIA_API_URL", "https://api.cartesia.ai")
+TTS_SAMPLE_RATE = 24000
+TTS_OUTPUT_FORMAT = {"container": "raw", "encoding": "pcm_s16le", "sample_rate": TTS_SAMPLE_RATE}
+
+
+def tts_cache_key(text: str, voice_id: str, model: str, speed: Any, emotion: Optional[List[str]],
+                  output_format: Dict[str, Any], language: str = CARTESIA_LANGUAGE) -> str:
+    """Content address of the audio for ``text`` under one set of voice settings."""
+    material = json.dumps(
+        {
+            "text": text.strip(),
+            "voice_id": voice_id,
+            "model": model,
+            "speed": speed,
+            "emotion": list(emotion or []),
+            "output_format": output_format,
+            "language": language,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def default_cache_key(text: str) -> str:
+    """Cache key for ``text`` spoken with the bot's voice settings."""
+    return tts_cache_key(text, CARTESIA_VOICE_ID, CARTESIA_MODEL, CARTESIA_SPEED, CARTESIA_EMOTION, TTS_OUTPUT_FORMAT)
+
+
+class TTSAudioCache:
+    """
+    On-disk, content-addressed cache of synthesized speech.
+
+    Each entry is the raw audio for one utterance in a file named after its
+    ``tts_cache_key``. Files are written atomically, so bot workers and the
+    server can share the directory. The least recently used entries are
+    deleted once the cache grows past ``max_bytes``; the size accounting is
+    per process, so with several writers the directory can briefly exceed it.
+    """
+
+    def __init__(self, directory: Path = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._miss_counts: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        files = sorted(self.directory.glob("*.pcm"), key=lambda path: path.stat().st_mtime)
+        for path in files:
+            size = path.stat().st_size
+            self._entries[path.stem] = size
+            self._total_bytes += size
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.pcm"
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached audio for ``key`` and mark it as recently used."""
+        path = self._path(key)
+        try:
+            audio = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                size = self._entries.pop(key, None)
+                if size is not None:
+                    self._total_bytes -= size
+                self.misses += 1
+            return None
+
+        with self._lock:
+            if key not in self._entries:
+                # Written by another process
+                self._entries[key] = len(audio)
+                self._total_bytes += len(audio)
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return audio
+
+    def contains(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def put(self, key: str, audio: bytes):
+        if not audio or len(audio) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(audio)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._total_bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(audio)
+            self._total_bytes += len(audio)
+            self._miss_counts.pop(key, None)
+            evicted = []
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                evicted_key, size = self._entries.popitem(last=False)
+                self._total_bytes -= size
+                evicted.append(evicted_key)
+
+        for evicted_key in evicted:
+            try:
+                self._path(evicted_key).unlink()
+            except FileNotFoundError:
+                pass
+        if evicted:
+            logger.debug(f"Evicted {len(evicted)} entries from the TTS cache")
+
+    def note_miss(self, key: str) -> int:
+        """Count a synthesis of an uncached utterance; returns how many were seen."""
+        with self._lock:
+            count = self._miss_counts.pop(key, 0) + 1
+            self._miss_counts[key] = count
+            while len(self._miss_counts) > 4096:
+                self._miss_counts.popitem(last=False)
+            return count
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._total_bytes, "hits": self.hits, "misses": self.misses}
+
+
+async def synthesize_cartesia(text: str, api_key: str, voice_id: str = CARTESIA_VOICE_ID, model: str = CARTESIA_MODEL,
+                              speed: Any = CARTESIA_SPEED, emotion: Optional[List[str]] = None,
+                              output_format: Optional[Dict[str, Any]] = None,
+                              language: str = CARTESIA_LANGUAGE) -> bytes:
+    """Synthesize one utterance through Cartesia's REST API; returns the raw audio."""
+    emotion = CARTESIA_EMOTION if emotion is None else emotion
+    voice: Dict[str, Any] = {"mode": "id", "id": voice_id}
+    if speed or emotion:
+        # Same controls the websocket service sends
+        voice["__experimental_controls"] = {}
+        if speed:
+            voice["__experimental_controls"]["speed"] = speed
+        if emotion:
+            voice["__experimental_controls"]["emotion"] = emotion
+
+    payload = {
+        "model_id": model,
+        "transcript": text,
+        "voice": voice,
+        "output_format": output_format or TTS_OUTPUT_FORMAT,
+        "language": language,
+    }
+    headers = {"X-API-Key": api_key, "Cartesia-Version": CARTESIA_VERSION}
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f"{CARTESIA_API_URL}/tts/bytes", json=payload, headers=headers) as response:
+            if response.status != 200:
+                raise RuntimeError(f"Cartesia returned {response.status}: {await response.text()}")
+            return await response.read()
+
+
+async def presynthesize(cache: TTSAudioCache, text: str, api_key: Optional[str] = None) -> bool:
+    """
+    Make sure ``text`` in the bot's voice is in the cache.
+
+    Returns:
+        True if the audio is cached, False if synthesis failed
+    """
+    key = default_cache_key(text)
+    if cache.contains(key):
+        return True
+    try:
+        audio = await synthesize_cartesia(text, api_key or os.getenv("CARTESIA_API_KEY", ""))
+        await asyncio.to_thread(cache.put, key, audio)
+        return True
+    except Exception as e:
+        logger.warning(f"Could not pre-synthesize \"{text[:40]}...\": {e}")
+        return False
@@ -0,0 +1,204 @@
+"""
+In-memory stand-in for Firestore's AsyncClient.
+
+Implements the part of the interface the server uses for writes: documents
+under ``collection(...).document(...)``, ``get``/``set``/``update`` and
+atomic write batches, including the SERVER_TIMESTAMP, DELETE_FIELD,
+ArrayUnion, ArrayRemove and Increment transforms. Pass one to
+``AsyncVoiceAgentDB(client=FakeAsyncClient())``.
+
+Where firebase-admin is not installed, importing this module registers a
+minimal ``firebase_admin`` package in its place, holding only the write
+sentinels and transforms, so ``firestore_db`` can still be imported and
+tested against the fake. Anything that would reach real Firestore raises.
+"""
+import sys
+import copy
+import uuid
+import datetime
+from types import ModuleType
+from typing import Any, Dict, List, Optional
+
+from google.api_core.exceptions import NotFound
+
+
+def _install_firebase_admin_stand_in() -> ModuleType:
+    class Sentinel:
+        def __init__(self, description: str):
+            self.description = description
+
+        def __repr__(self):
+            return f"Sentinel: {self.description}"
+
+    class _ValueList:
+        def __init__(self, values):
+            self._values = list(values)
+
+        @property
+        def values(self):
+            return self._values
+
+        def __eq__(self, other):
+            return type(other) is type(self) and other._values == self._values
+
+        def __repr__(self):
+            return f"{type(self).__name__}({self._values!r})"
+
+    class ArrayUnion(_ValueList):
+        pass
+
+    class ArrayRemove(_ValueList):
+        pass
+
+    class Increment:
+        def __init__(self, value):
+            self._value = value
+
+        @property
+        def value(self):
+            return self._value
+
+        def __eq__(self, other):
+            return type(other) is type(self) and other._value == self._value
+
+    class FieldFilter:
+        def __init__(self, field_path, op_string, value):
+            self.field_path, self.op_string, self.value = field_path, op_string, value
+
+    def unavailable(*args, **kwargs):
+        raise RuntimeError("firebase-admin is not installed; pass a FakeAsyncClient instead")
+
+    firebase_admin = ModuleType("firebase_admin")
+    firestore = ModuleType("firebase_admin.firestore")
+    firestore.SERVER_TIMESTAMP = Sentinel("Value used to set a document field to the server timestamp.")
+    firestore.DELETE_FIELD = Sentinel("Value used to delete a field in a document.")
+    firestore.ArrayUnion, firestore.ArrayRemove, firestore.Increment = ArrayUnion, ArrayRemove, Increment
+    firestore.FieldFilter = FieldFilter
+    firestore.client = unavailable
+    firestore_async = ModuleType("firebase_admin.firestore_async")
+    firestore_async.client = unavailable
+    credentials = ModuleType("firebase_admin.credentials")
+    credentials.Certificate = unavailable
+    firebase_admin.firestore, firebase_admin.firestore_async, firebase_admin.credentials = (
+        firestore, firestore_async, credentials
+    )
+    firebase_admin.get_app = firebase_admin.initialize_app = unavailable
+    for module in (firebase_admin, firestore, firestore_async, credentials):
+        sys.modules[module.__name__] = module
+    return firestore
+
+
+try:
+    from firebase_admin import firestore
+except ImportError:
+    firestore = _install_firebase_admin_stand_in()
+
+
+def _transformed(current: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    document = copy.deepcopy(current)
+    for key, value in data.items():
+        if value is firestore.DELETE_FIELD:
+            document.pop(key, None)
+        elif value is firestore.SERVER_TIMESTAMP:
+            document[key] = datetime.datetime.now(datetime.timezone.utc)
+        elif isinstance(value, firestore.ArrayUnion):
+            existing = list(document.get(key) or [])
+            document[key] = existing + [v for v in value.values if v not in existing]
+        elif isinstance(value, firestore.ArrayRemove):
+            document[key] = [v for v in document.get(key) or [] if v not in value.values]
+        elif isinstance(value, firestore.Increment):
+            document[key] = (document.get(key) or 0) + value.value
+        else:
+            document[key] = copy.deepcopy(value)
+    return document
+
+
+class FakeSnapshot:
+    def __init__(self, reference: "FakeDocumentReference", data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data)
+
+
+class FakeDocumentReference:
+    def __init__(self, client: "FakeAsyncClient", path: str):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    async def get(self) -> FakeSnapshot:
+        self._client.reads += 1
+        return FakeSnapshot(self, self._client.documents.get(self.path))
+
+    async def set(self, data: Dict[str, Any], merge: bool = False):
+        batch = self._client.batch()
+        batch.set(self, data, merge=merge)
+        await batch.commit()
+
+    async def update(self, data: Dict[str, Any]):
+        batch = self._client.batch()
+        batch.update(self, data)
+        await batch.commit()
+
+
+class FakeCollectionReference:
+    def __init__(self, client: "FakeAsyncClient", name: str):
+        self._client = client
+        self.name = name
+
+    def document(self, document_id: Optional[str] = None) -> FakeDocumentReference:
+        return FakeDocumentReference(self._client, f"{self.name}/{document_id or uuid.uuid4().hex}")
+
+
+class FakeWriteBatch:
+    def __init__(self, client: "FakeAsyncClient"):
+        self._client = client
+        self._writes: List[tuple] = []
+
+    def set(self, ref: FakeDocumentReference, data: Dict[str, Any], merge: bool = False):
+        self._writes.append((ref.path, "merge" if merge else "set", dict(data)))
+
+    def update(self, ref: FakeDocumentReference, data: Dict[str, Any]):
+        self._writes.append((ref.path, "update", dict(data)))
+
+    async def commit(self):
+        """Apply every write, or none of them."""
+        self._client.commits.append(list(self._writes))
+        if self._client.fail_commits > 0:
+            self._client.fail_commits -= 1
+            raise RuntimeError("Injected commit failure")
+
+        documents = dict(self._client.documents)
+        for path, kind, data in self._writes:
+            current = documents.get(path)
+            if kind == "update" and current is None:
+                raise NotFound(f"No document to update: {path}")
+            documents[path] = _transformed({} if kind == "set" else current or {}, data)
+        self._client.documents = documents
+
+
+class FakeAsyncClient:
+    """
+    Documents are kept in ``documents`` by path ("calls/<id>"). ``commits``
+    records the writes of every commit attempt, ``reads`` counts document
+    reads, and setting ``fail_commits`` makes that many commits fail.
+    """
+
+    def __init__(self):
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.commits: List[List[tuple]] = []
+        self.reads = 0
+        self.fail_commits = 0
+
+    def collection(self, name: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, name)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def document(self, path: str) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self.documents.get(path))
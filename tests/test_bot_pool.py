@@ -0,0 +1,112 @@
+import asyncio
+
+from bot_pool import BotWorkerPool, _BotWorker
+
+
+class FakeProcess:
+    """A worker process that exits with ``returncode`` as soon as it is waited on."""
+
+    def __init__(self, pid, returncode=1):
+        self.pid = pid
+        self.returncode = returncode
+
+    async def wait(self):
+        return self.returncode
+
+
+def make_pool():
+    pool = BotWorkerPool(min_size=1, max_size=2, socket_path="unused.sock", respawn_backoff_base=0.01,
+                         respawn_backoff_max=0.04, max_startup_failures=4)
+    pool.spawned = []
+
+    async def spawn():
+        # Starting the process yields to the event loop, as the real one does
+        await asyncio.sleep(0)
+        worker = _BotWorker(FakeProcess(len(pool.spawned) + 1))
+        pool._workers[worker.pid] = worker
+        pool.spawned.append(worker)
+
+    pool._spawn = spawn
+    return pool
+
+
+async def crash_during_warmup(pool, times):
+    delays = []
+    for _ in range(times):
+        await pool._watch(pool.spawned[-1])
+        delays.append(pool._respawn_delay())
+    return delays
+
+
+def test_warmup_crashes_back_off_exponentially_up_to_the_cap():
+    pool = make_pool()
+
+    async def run():
+        await pool._replenish()
+        return await crash_during_warmup(pool, 3)
+
+    assert asyncio.run(run()) == [0.01, 0.02, 0.04]
+    assert len(pool.spawned) == 4
+    assert pool.healthy
+
+
+def test_pool_stops_respawning_and_reports_unhealthy():
+    pool = make_pool()
+
+    async def run():
+        await pool._replenish()
+        await crash_during_warmup(pool, 4)
+
+    asyncio.run(run())
+
+    assert len(pool.spawned) == 4
+    stats = pool.stats()
+    assert not stats["healthy"]
+    assert stats["startup_failures"] == 4
+    assert stats["last_error"] == "Bot worker 4 exited with code 1 during warm-up"
+
+
+def test_workers_that_exit_after_a_call_are_replaced_immediately():
+    pool = make_pool()
+    worker = _BotWorker(FakeProcess(100, returncode=0))
+    worker.state = "busy"
+    pool._workers[worker.pid] = worker
+
+    asyncio.run(pool._watch(worker))
+
+    assert len(pool.spawned) == 1
+    assert pool.startup_failures == 0
+
+
+def test_concurrent_top_ups_do_not_overshoot_the_pool_size():
+    pool = make_pool()
+    pool.min_size = 2
+
+    async def run():
+        await asyncio.gather(*(pool._replenish() for _ in range(4)))
+
+    asyncio.run(run())
+
+    assert len(pool.spawned) == 2
+    assert pool.size == 2
+
+
+def test_a_finished_call_is_reported_with_its_assignment():
+    pool = make_pool()
+    ended = []
+    pool.on_call_ended = ended.append
+    busy = _BotWorker(FakeProcess(100, returncode=0))
+    busy.state = "busy"
+    busy.assignment = {"call_id": "call-1", "room_url": "https://example.daily.co/room-1"}
+    # A worker that dies before it is assigned a call has nothing to release
+    starting = _BotWorker(FakeProcess(101))
+    for worker in (busy, starting):
+        pool._workers[worker.pid] = worker
+
+    async def run():
+        await pool._watch(busy)
+        await pool._watch(starting)
+
+    asyncio.run(run())
+
+    assert ended == [busy.assignment]
@@ -0,0 +1,69 @@
+import asyncio
+
+import connection_warmup
+from connection_warmup import ConnectionWarmup
+
+
+class FakeService:
+    """Pre-connectable STT/TTS service that records what the warm-up does with it."""
+
+    def __init__(self):
+        self.started = False
+        self.connected = False
+        self.preconnects = 0
+        self.pings = 0
+
+    async def preconnect(self, *args):
+        self.preconnects += 1
+        self.connected = True
+        return True
+
+    async def keep_alive(self):
+        self.pings += 1
+
+    async def close_preconnection(self):
+        self.connected = False
+
+
+def make_warmup(monkeypatch, max_idle):
+    monkeypatch.setattr(connection_warmup, "WARMUP_KEEPALIVE_INTERVAL", 0.01)
+    stt, tts = FakeService(), FakeService()
+    return stt, tts, ConnectionWarmup(stt, tts, max_idle=max_idle)
+
+
+def test_idle_worker_closes_its_connections_and_reopens_them_for_a_call(monkeypatch):
+    stt, tts, warmup = make_warmup(monkeypatch, max_idle=0.05)
+
+    async def run():
+        warmup.start()
+        await asyncio.sleep(0.15)
+        assert not stt.connected and not tts.connected
+        pings = tts.pings
+        await asyncio.sleep(0.05)
+        # No more keep-alive pings once closed
+        assert tts.pings == pings
+
+        warmup.begin_call("call-1")
+        await asyncio.sleep(0.02)
+        assert stt.connected and tts.connected
+        assert stt.preconnects == tts.preconnects == 2
+        await warmup.close()
+
+    asyncio.run(run())
+
+
+def test_connections_stay_open_once_a_call_is_assigned(monkeypatch):
+    stt, tts, warmup = make_warmup(monkeypatch, max_idle=0.05)
+
+    async def run():
+        warmup.start()
+        warmup.begin_call("call-1")
+        await asyncio.sleep(0.15)
+        assert stt.connected and tts.connected
+        assert tts.pings > 0
+        tts.started = True
+        await warmup.close()
+
+    asyncio.run(run())
+
+    assert stt.preconnects == tts.preconnects == 1
@@ -0,0 +1,186 @@
+import json
+import asyncio
+
+import google.ai.generativelanguage as glm
+import google.generativeai as gai
+import pytest
+
+from cached_google_llm import DYNAMIC_SUFFIX_ACK, DYNAMIC_SUFFIX_HEADER, CachedPrefixGoogleLLMService
+from context_cache import ContextCacheProvider, ContextCacheRegistry, InMemoryContextCacheProvider
+from prompt_compiler import PromptCompiler
+
+MODEL = "gemini-2.0-flash"
+
+
+def write_file(path, text):
+    path.write_text(text)
+    return path
+
+
+def make_registry(tmp_path, min_tokens=0):
+    provider = InMemoryContextCacheProvider(min_tokens=min_tokens)
+    return provider, ContextCacheRegistry(provider, path=tmp_path / "context_cache.json")
+
+
+def compile_prefix(compiler, persona_path):
+    return compiler.compile(
+        [compiler.file_fragment("persona", persona_path)],
+        [compiler.text_fragment("client_info", "Client name: Asha")],
+    )
+
+
+def test_provider_interface_is_abstract():
+    with pytest.raises(TypeError):
+        ContextCacheProvider()
+
+
+def test_prefix_is_registered_once_and_the_handle_reused(tmp_path):
+    provider, registry = make_registry(tmp_path)
+    compiled = compile_prefix(PromptCompiler(), write_file(tmp_path / "persona.txt", "You are Neha."))
+
+    handle = registry.get_or_create(MODEL, compiled.prefix_text, compiled.prefix_digest, compiled.prefix_tokens)
+
+    assert provider.entries[handle]["system_instruction"] == compiled.prefix_text
+    saved = json.loads((tmp_path / "context_cache.json").read_text())
+    assert [entry["handle"] for entry in saved.values()] == [handle]
+
+    assert registry.get_or_create(MODEL, compiled.prefix_text, compiled.prefix_digest) == handle
+    # Another worker process reads the same registry file
+    other = ContextCacheRegistry(provider, path=tmp_path / "context_cache.json")
+    assert other.get_or_create(MODEL, compiled.prefix_text, compiled.prefix_digest) == handle
+    assert provider.created == 1
+
+
+def test_changed_prompt_file_replaces_the_cache(tmp_path):
+    provider, registry = make_registry(tmp_path)
+    compiler = PromptCompiler()
+    persona = write_file(tmp_path / "persona.txt", "You are Neha.")
+    old = compile_prefix(compiler, persona)
+    old_handle = registry.get_or_create(MODEL, old.prefix_text, old.prefix_digest)
+
+    write_file(persona, "You are Neha, a senior relationship manager.")
+    new = compile_prefix(compiler, persona)
+    new_handle = registry.get_or_create(MODEL, new.prefix_text, new.prefix_digest)
+
+    assert new.prefix_digest != old.prefix_digest
+    assert new_handle != old_handle
+    assert list(provider.entries) == [new_handle]
+    assert provider.entries[new_handle]["system_instruction"] == new.prefix_text
+
+
+def test_prefix_below_the_provider_minimum_is_not_cached(tmp_path):
+    provider, registry = make_registry(tmp_path, min_tokens=4096)
+    compiled = compile_prefix(PromptCompiler(), write_file(tmp_path / "persona.txt", "You are Neha."))
+
+    assert registry.get_or_create(MODEL, compiled.prefix_text, compiled.prefix_digest, compiled.prefix_tokens) is None
+    assert provider.created == 0
+
+
+def test_expired_handle_is_recreated(tmp_path):
+    provider, registry = make_registry(tmp_path)
+    handle = registry.get_or_create(MODEL, "You are Neha.", "digest")
+    provider.entries.clear()
+    entries = json.loads(registry.path.read_text())
+    for entry in entries.values():
+        entry["expires_at"] = 0
+    registry.path.write_text(json.dumps(entries))
+
+    assert registry.get_or_create(MODEL, "You are Neha.", "digest") not in (None, handle)
+
+
+class FakeStream:
+    def __init__(self, texts, error=None):
+        self._texts = texts
+        self._error = error
+        self.usage_metadata = None
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for text in self._texts:
+            yield type("Chunk", (), {"parts": [type("Part", (), {"text": text})()]})()
+        if self._error:
+            raise self._error
+
+
+class FakeModel:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    async def generate_content_async(self, contents, **kwargs):
+        self.requests.append((list(contents), kwargs))
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def uncached_models(monkeypatch):
+    models = []
+
+    def make_model(model_name, system_instruction=None):
+        model = FakeModel(FakeStream(["Fallback ", "answer."]))
+        model.system_instruction = system_instruction
+        models.append(model)
+        return model
+
+    monkeypatch.setattr(gai, "GenerativeModel", make_model)
+    return models
+
+
+def make_service(cached_model):
+    return CachedPrefixGoogleLLMService(
+        api_key="test", model=MODEL, system_instruction="STATIC\nDYNAMIC",
+        cached_model=cached_model, dynamic_suffix="DYNAMIC", tools=[],
+    )
+
+
+def user(text):
+    return glm.Content(role="user", parts=[glm.Part(text=text)])
+
+
+def stream_text(service, contents):
+    async def run():
+        response = await service._client.generate_content_async(
+            contents=contents, tools=[], stream=True, generation_config=None, tool_config=None
+        )
+        return "".join([chunk.parts[0].text async for chunk in response])
+
+    return asyncio.run(run())
+
+
+def test_dynamic_suffix_is_sent_as_a_framed_opening_exchange(uncached_models):
+    cached = FakeModel(FakeStream(["Hello."]))
+    service = make_service(cached)
+
+    assert stream_text(service, [user("Hi")]) == "Hello."
+
+    contents, kwargs = cached.requests[0]
+    assert [content.role for content in contents] == ["user", "model", "user"]
+    assert contents[0].parts[0].text == DYNAMIC_SUFFIX_HEADER + "DYNAMIC"
+    assert contents[1].parts[0].text == DYNAMIC_SUFFIX_ACK
+    assert contents[2].parts[0].text == "Hi"
+    # Cached requests cannot set tools or a tool config
+    assert "tools" not in kwargs and "tool_config" not in kwargs
+
+
+def test_stream_failing_before_any_text_falls_back(uncached_models):
+    service = make_service(FakeModel(FakeStream([], error=RuntimeError("cache expired"))))
+
+    assert stream_text(service, [user("Hi")]) == "Fallback answer."
+
+    fallback = uncached_models[-1]
+    assert fallback.system_instruction == "STATIC\nDYNAMIC"
+    assert [content.role for content in fallback.requests[0][0]] == ["user"]
+    # Later requests skip the cache
+    assert service._client is fallback
+
+
+def test_stream_failing_part_way_is_continued_by_the_uncached_model(uncached_models):
+    service = make_service(FakeModel(FakeStream(["The fund ", "targets "], error=RuntimeError("stream reset"))))
+
+    assert stream_text(service, [user("Returns?")]) == "The fund targets Fallback answer."
+
+    contents = uncached_models[-1].requests[0][0]
+    assert [content.role for content in contents] == ["user", "model"]
+    assert contents[1].parts[0].text == "The fund targets "
@@ -0,0 +1,73 @@
+from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContext
+from pipecat.services.google.llm import GoogleLLMContext
+
+from context_window import SUMMARY_MARKER, RollingContextWindow, get_standard_messages, message_text
+
+SYSTEM_PROMPT = "You are Neha, a sales agent for Mosaic Asset Management."
+
+
+def make_context(google: bool):
+    context = OpenAILLMContext([
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": "Begin the conversation."},
+    ])
+    if google:
+        context = GoogleLLMContext.upgrade_to_google(context)
+    context.add_messages([{"role": "assistant", "content": "Hello, is this a good time?"}])
+    return context
+
+
+def add_turn(context, n: int):
+    context.add_messages([
+        {"role": "user", "content": f"Question number {n} from the client"},
+        {"role": "assistant", "content": f"Answer number {n} from Neha"},
+    ])
+
+
+def make_window(**kwargs):
+    window = RollingContextWindow(**kwargs)
+    # Summarizing runs as a pipeline task; the tests only look at the context
+    window._start_summary = lambda: None
+    return window
+
+
+def test_trim_keeps_recent_turns_and_summarizes_older_ones():
+    context = make_context(google=False)
+    window = make_window(max_turns=2, token_budget=10_000)
+    for n in range(5):
+        add_turn(context, n)
+        window._trim(context)
+
+    messages = get_standard_messages(context)
+    assert messages[0] == {"role": "system", "content": SYSTEM_PROMPT}
+    assert message_text(messages[1]).startswith(SUMMARY_MARKER)
+    users = [message_text(m) for m in messages[2:] if m["role"] == "user"]
+    assert users == ["Question number 3 from the client", "Question number 4 from the client"]
+
+
+def test_trim_on_google_context_does_not_copy_the_system_prompt():
+    context = make_context(google=True)
+    window = make_window(max_turns=2, token_budget=10_000)
+    for n in range(5):
+        add_turn(context, n)
+        window._trim(context)
+
+    assert context.system_message == SYSTEM_PROMPT
+    stored = context.get_messages_for_persistent_storage()
+    assert not any(message_text(m) == SYSTEM_PROMPT for m in stored)
+    assert message_text(stored[0]).startswith(SUMMARY_MARKER)
+    assert SYSTEM_PROMPT not in message_text(stored[0])
+    users = [message_text(m) for m in stored[1:] if m["role"] == "user"]
+    assert users == ["Question number 3 from the client", "Question number 4 from the client"]
+    assert message_text(stored[-1]) == "Answer number 4 from Neha"
+
+
+def test_trim_never_drops_the_latest_turn():
+    context = make_context(google=True)
+    window = make_window(max_turns=8, token_budget=5)
+    for n in range(3):
+        add_turn(context, n)
+        window._trim(context)
+
+    stored = context.get_messages_for_persistent_storage()
+    assert [message_text(m) for m in stored[1:]] == ["Question number 2 from the client", "Answer number 2 from Neha"]
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+from google.api_core.exceptions import NotFound
+
+from fake_firestore import FakeAsyncClient, firestore
+from firestore_db import AsyncVoiceAgentDB
+
+
+def make_db():
+    client = FakeAsyncClient()
+    return client, AsyncVoiceAgentDB(client=client)
+
+
+def test_batched_transcript_appends_keep_every_message():
+    client, db = make_db()
+    client.documents["customers/client-1"] = {"firstName": "Asha"}
+    asyncio.run(db.create_call("client-1", call_id="call-1"))
+
+    async def sync():
+        async with db.batch() as batch:
+            await db.add_messages_to_call("call-1", [{"content": "one"}], batch=batch)
+            await db.add_messages_to_call("call-1", [{"content": "two"}, {"content": "three"}], batch=batch)
+            assert len(batch) == 1
+
+    asyncio.run(sync())
+
+    transcript = client.document("calls/call-1")["transcript"]
+    assert [message["content"] for message in transcript] == ["one", "two", "three"]
+
+
+def test_array_union_onto_a_queued_list_extends_it():
+    client, db = make_db()
+    ref = client.collection("calls").document("call-1")
+
+    async def write():
+        batch = db.batch()
+        batch.set(ref, {"tags": ["a"]})
+        batch.update(ref, {"tags": firestore.ArrayUnion(["a", "b"]), "status": "completed"})
+        assert len(batch) == 1
+        assert await batch.commit() == 1
+
+    asyncio.run(write())
+
+    assert client.document("calls/call-1") == {"tags": ["a", "b"], "status": "completed"}
+
+
+def test_transforms_that_cannot_be_combined_are_queued_separately():
+    client, db = make_db()
+    client.documents["calls/call-1"] = {"tags": ["a", "b"]}
+    ref = client.collection("calls").document("call-1")
+
+    async def write():
+        batch = db.batch()
+        batch.update(ref, {"tags": firestore.ArrayUnion(["c"])})
+        batch.update(ref, {"tags": firestore.ArrayRemove(["a"])})
+        assert len(batch) == 2
+        assert await batch.commit() == 1
+
+    asyncio.run(write())
+
+    assert client.document("calls/call-1")["tags"] == ["b", "c"]
+    assert len(client.commits) == 1
+
+
+def test_plain_set_replaces_queued_writes():
+    client, db = make_db()
+    ref = client.collection("customers").document("client-1")
+
+    async def write():
+        batch = db.batch()
+        batch.set(ref, {"firstName": "Asha", "city": "Pune"}, merge=True)
+        batch.set(ref, {"firstName": "Asha"})
+        await batch.commit()
+
+    asyncio.run(write())
+
+    assert client.document("customers/client-1") == {"firstName": "Asha"}
+
+
+def test_failed_batch_applies_nothing():
+    client, db = make_db()
+
+    async def write():
+        batch = db.batch()
+        batch.set(client.collection("customers").document("client-1"), {"firstName": "Asha"})
+        await db.add_call_transcript("missing-call", [], batch=batch)
+        await batch.commit()
+
+    with pytest.raises(NotFound):
+        asyncio.run(write())
+    assert client.documents == {}
@@ -0,0 +1,126 @@
+import asyncio
+
+from fake_firestore import FakeAsyncClient
+from firestore_db import AsyncVoiceAgentDB
+from firestore_replicator import FirestoreReplicator
+from incremental_processor import IncrementalCallProcessor
+from sqlite_db import OUTBOX_CALL_START, SQLiteVoiceAgentDB, enqueue_outbox
+
+
+def make_replicator(tmp_path):
+    db_path = tmp_path / "voice_agent.db"
+    db = SQLiteVoiceAgentDB(db_path)
+    client = FakeAsyncClient()
+    replicator = FirestoreReplicator(AsyncVoiceAgentDB(client=client), db_path=db_path, retry_base_seconds=60)
+    return db, client, replicator
+
+
+def add_customer(db, client_id="client-1"):
+    return db.add_customer_with_id(client_id, "Asha", "Rao", "+919800000001", "asha@example.com", "Pune", "Doctor")
+
+
+def test_outbox_entries_are_applied_in_one_batch_and_removed(tmp_path):
+    db, client, replicator = make_replicator(tmp_path)
+    add_customer(db)
+    call_id = db.create_call("client-1")
+    db.complete_call(call_id, "client-1", "Interested in the fund", tags=["interested"],
+                     transcript=[{"speaker": "user", "content": "Yes"}], profile={"wantsZoomCall": True})
+
+    assert asyncio.run(replicator.drain_once()) == 4
+    assert len(client.commits) == 1
+
+    call = client.document(f"calls/{call_id}")
+    assert call["status"] == "completed"
+    assert call["summary"] == "Interested in the fund"
+    assert call["tags"] == ["interested"]
+    assert call["transcript"] == [{"speaker": "user", "content": "Yes"}]
+    assert client.document("customers/client-1")["firstName"] == "Asha"
+    assert client.document("clientProfiles/client-1")["wantsZoomCall"] is True
+
+    stats = asyncio.run(replicator.stats())
+    assert stats["pending"] == 0
+    assert stats["replicated_total"] == 4
+    assert asyncio.run(replicator.drain_once()) == 0
+
+
+def test_failed_entries_back_off_without_holding_back_the_rest(tmp_path):
+    db, client, replicator = make_replicator(tmp_path)
+    add_customer(db)
+    call_id = db.create_call("client-1")
+    # The batch fails, then the first entry fails again when retried alone
+    client.fail_commits = 2
+
+    assert asyncio.run(replicator.drain_once()) == 1
+    assert "firstName" not in client.document("customers/client-1")
+    assert client.document(f"calls/{call_id}")["customerId"] == "client-1"
+
+    stats = asyncio.run(replicator.stats())
+    assert stats["pending"] == 1
+    assert stats["failed_attempts_total"] == 1
+    assert stats["last_error"] == "Injected commit failure"
+    # Not due again until the backoff has passed
+    assert asyncio.run(replicator.drain_once()) == 0
+
+
+def test_new_documents_get_their_baseline_fields(tmp_path):
+    db, client, replicator = make_replicator(tmp_path)
+    add_customer(db)
+    call_id = db.create_call("client-1")
+
+    asyncio.run(replicator.drain_once())
+
+    call = client.document(f"calls/{call_id}")
+    assert call["status"] == "active"
+    assert call["transcript"] == []
+    assert (call["endTime"], call["duration"], call["summary"], call["tags"]) == (None, None, None, [])
+
+    profile = client.document("clientProfiles/client-1")
+    assert profile["languagePreference"] == "English"
+    assert profile["notes"] == ""
+    assert profile["wantsZoomCall"] is None
+    assert "dateGenerated" in profile
+
+
+def test_replayed_entries_do_not_reset_later_updates(tmp_path):
+    db, client, replicator = make_replicator(tmp_path)
+    add_customer(db)
+    call_id = db.create_call("client-1")
+    db.complete_call(call_id, "client-1", "Call back next week", tags=["callback"],
+                     transcript=[{"speaker": "user", "content": "Later"}], profile={"notes": "Prefers mornings"})
+    asyncio.run(replicator.drain_once())
+
+    # The customer and call start are replicated again, e.g. after a lost acknowledgement
+    with db._connections.transaction() as conn:
+        db._enqueue_customer(conn, "client-1")
+        enqueue_outbox(conn, OUTBOX_CALL_START, {"call_id": call_id, "client_id": "client-1", "started_at": None})
+    assert asyncio.run(replicator.drain_once()) == 2
+
+    call = client.document(f"calls/{call_id}")
+    assert call["status"] == "completed"
+    assert call["summary"] == "Call back next week"
+    assert call["transcript"] == [{"speaker": "user", "content": "Later"}]
+    assert client.document("clientProfiles/client-1")["notes"] == "Prefers mornings"
+
+
+def test_live_transcript_sync_is_replicated_after_the_call_document(tmp_path):
+    db, client, replicator = make_replicator(tmp_path)
+    add_customer(db)
+    call_id = db.create_call("client-1")
+    processor = IncrementalCallProcessor(call_id, db, batch_size=2, summary_every=0)
+
+    async def record():
+        for content in ("Hello, is this Asha?", "Yes", "I wanted to tell you about"):
+            processor.add({"role": "assistant", "ts": None, "content": content, "interrupted": False})
+        await processor.close()
+
+    asyncio.run(record())
+
+    # Nothing reached Firestore yet, but the count already covers every utterance
+    assert client.commits == []
+    assert db.get_call_processing_state(call_id)["transcript_synced_count"] == 3
+
+    asyncio.run(replicator.drain_once())
+
+    call = client.document(f"calls/{call_id}")
+    assert call["status"] == "active"
+    assert [entry["content"] for entry in call["transcript"]] == ["Hello, is this Asha?", "Yes", "I wanted to tell you about"]
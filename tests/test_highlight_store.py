@@ -0,0 +1,61 @@
+from highlight_store import CallHighlightStore
+from tokens import estimate_tokens
+
+
+def make_store(tmp_path, retention=5):
+    return CallHighlightStore(tmp_path / "voice_agent.db", retention=retention)
+
+
+def test_upsert_keeps_fields_the_other_writer_stored(tmp_path):
+    store = make_store(tmp_path)
+    # The analyzer and the post-call processor write in either order
+    store.upsert("call-1", "client-1", highlight="Asked about lock-in periods.")
+    store.upsert("call-1", "client-1", client_type="HNI", has_minimum_investment=True, summary="Interested")
+    store.upsert("call-1", "client-1", summary=None, notes="Call back on Monday")
+
+    [record] = store.get_recent("client-1")
+    assert record["highlight"] == "Asked about lock-in periods."
+    assert record["client_type"] == "HNI"
+    assert record["has_minimum_investment"] == 1
+    assert record["summary"] == "Interested"
+    assert record["notes"] == "Call back on Monday"
+    assert store.latest_summary("client-1") == "Interested"
+
+
+def test_only_the_newest_records_per_client_are_kept(tmp_path):
+    store = make_store(tmp_path, retention=2)
+    for n in range(1, 4):
+        store.upsert(f"call-{n}", "client-1", summary=f"Call {n}")
+    store.upsert("other-call", "client-2", summary="Other client")
+
+    assert [r["call_id"] for r in store.get_recent("client-1")] == ["call-3", "call-2"]
+    assert [r["call_id"] for r in store.get_recent("client-2")] == ["other-call"]
+
+
+def test_render_fits_the_newest_calls_into_the_token_budget(tmp_path):
+    store = make_store(tmp_path)
+    store.upsert("call-1", "client-1", client_type="HNI", attitude="Curious", summary="Oldest call " + "x" * 200)
+    store.upsert("call-2", "client-1", summary="Middle call", notes="Asked for a brochure")
+    store.upsert("call-3", "client-1", summary="Newest call", highlight="Wants a Zoom call.\n")
+
+    full = store.render("client-1", token_budget=1000)
+    assert full.startswith("# Client Profile\nClient Type: HNI\nMinimum Investment Capacity: Unknown")
+    assert full.index("Newest call") < full.index("Middle call") < full.index("Oldest call")
+    assert "Wants a Zoom call.\n\n" in full
+
+    budget = estimate_tokens(full[:full.index("Oldest call")])
+    trimmed = store.render("client-1", token_budget=budget)
+    assert "Middle call" in trimmed and "Oldest call" not in trimmed
+    assert estimate_tokens(trimmed) <= budget
+
+
+def test_render_truncates_a_newest_call_that_does_not_fit(tmp_path):
+    store = make_store(tmp_path)
+    store.upsert("call-1", "client-1", summary="Discussed the fund. " * 50)
+
+    rendered = store.render("client-1", token_budget=40)
+
+    assert rendered.startswith("# Call on ")
+    assert rendered.endswith(" ...")
+    assert estimate_tokens(rendered) <= 40
+    assert store.render("client-2") == ""
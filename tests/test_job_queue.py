@@ -0,0 +1,61 @@
+import asyncio
+
+from job_queue import PostCallJobQueue
+from sqlite_db import SQLiteVoiceAgentDB
+
+
+async def noop_handler(call_id, client_id):
+    pass
+
+
+def make_queue(tmp_path, **kwargs):
+    db_path = tmp_path / "voice_agent.db"
+    db = SQLiteVoiceAgentDB(db_path)
+    queue = PostCallJobQueue(noop_handler, db_path=db_path, **kwargs)
+    return db, queue
+
+
+def test_job_waits_for_the_transcript_to_be_closed(tmp_path):
+    db, queue = make_queue(tmp_path)
+    call_id = db.create_call("client-1")
+    job_id = asyncio.run(queue.enqueue(call_id, "client-1"))
+
+    assert queue._claim() is None
+
+    assert db.mark_transcript_closed(call_id)
+    job = queue._claim()
+    assert job["id"] == job_id
+    assert job["transcript_closed_at"]
+    assert queue._select_job(job_id)["status"] == "running"
+
+
+def test_job_runs_without_the_marker_after_the_wait(tmp_path):
+    db, queue = make_queue(tmp_path, transcript_wait_seconds=0)
+    call_id = db.create_call("client-1")
+    asyncio.run(queue.enqueue(call_id, "client-1"))
+
+    job = queue._claim()
+    assert job is not None
+    assert job["transcript_closed_at"] is None
+
+
+def test_failed_job_is_retried_then_marked_failed(tmp_path):
+    db, queue = make_queue(tmp_path, max_attempts=2, retry_base_seconds=0)
+    call_id = db.create_call("client-1")
+    db.mark_transcript_closed(call_id)
+    job_id = asyncio.run(queue.enqueue(call_id, "client-1"))
+
+    assert queue._finish(queue._claim(), "boom") == "queued"
+    assert queue._finish(queue._claim(), "boom") == "failed"
+    job = queue._select_job(job_id)
+    assert job["status"] == "failed"
+    assert job["attempts"] == 2
+    assert job["last_error"] == "boom"
+
+
+def test_processing_state_reports_the_marker(tmp_path):
+    db, _ = make_queue(tmp_path)
+    call_id = db.create_call("client-1")
+    assert db.get_call_processing_state(call_id)["transcript_closed_at"] is None
+    db.mark_transcript_closed(call_id)
+    assert db.get_call_processing_state(call_id)["transcript_closed_at"]
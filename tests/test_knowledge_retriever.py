@@ -0,0 +1,77 @@
+from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContext
+from pipecat.services.google.llm import GoogleLLMContext
+
+from context_window import get_standard_messages, message_text
+from knowledge_index import BM25Index
+from knowledge_retriever import KNOWLEDGE_MARKER, KnowledgeRetriever
+
+SYSTEM_PROMPT = "You are Neha, a sales agent for Mosaic Asset Management. Answer questions about our funds."
+
+CHUNKS = [
+    "The private credit fund targets a net IRR of 12 to 14 percent over a five year term.",
+    "The minimum investment in the real estate fund is one crore rupees.",
+    "Redemptions from the long short equity fund are allowed quarterly with 30 days notice.",
+]
+
+QUESTIONS = [
+    ("What returns does the private credit fund target?", CHUNKS[0]),
+    ("What is the minimum investment for real estate?", CHUNKS[1]),
+    ("How often can I redeem from the equity fund?", CHUNKS[2]),
+    ("Tell me about the credit fund term again", CHUNKS[0]),
+]
+
+
+def make_context(google: bool):
+    context = OpenAILLMContext([
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": "Begin the conversation."},
+    ])
+    if google:
+        context = GoogleLLMContext.upgrade_to_google(context)
+    context.add_messages([{"role": "assistant", "content": "Hello, is this a good time?"}])
+    return context
+
+
+def run_turns(google: bool):
+    context = make_context(google)
+    retriever = KnowledgeRetriever(BM25Index(CHUNKS), top_k=1, min_score=0.1)
+    for question, expected in QUESTIONS:
+        context.add_messages([{"role": "user", "content": question}])
+        retriever.inject(context)
+
+        messages = get_standard_messages(context)
+        markers = [n for n, m in enumerate(messages) if message_text(m).startswith(KNOWLEDGE_MARKER)]
+        assert len(markers) == 1
+        # The excerpts for this question sit right before it, and the question is last
+        assert message_text(messages[markers[0]]) == f"{KNOWLEDGE_MARKER}\n{expected}"
+        assert message_text(messages[markers[0] + 1]) == question
+        assert markers[0] + 1 == len(messages) - 1
+
+        context.add_messages([{"role": "assistant", "content": "Let me explain."}])
+    return context
+
+
+def test_inject_places_excerpts_before_the_latest_question():
+    run_turns(google=False)
+
+
+def test_inject_on_google_context():
+    context = run_turns(google=True)
+
+    assert context.system_message == SYSTEM_PROMPT
+    stored = context.get_messages_for_persistent_storage()
+    assert not any(message_text(m) == SYSTEM_PROMPT for m in stored)
+    assert message_text(stored[-2]) == QUESTIONS[-1][0]
+
+
+def test_inject_removes_stale_excerpts_when_nothing_matches():
+    context = make_context(google=True)
+    retriever = KnowledgeRetriever(BM25Index(CHUNKS), top_k=1, min_score=0.1)
+    context.add_messages([{"role": "user", "content": QUESTIONS[0][0]}])
+    retriever.inject(context)
+    context.add_messages([{"role": "user", "content": "Okay"}])
+    retriever.inject(context)
+
+    stored = context.get_messages_for_persistent_storage()
+    assert not any(message_text(m).startswith(KNOWLEDGE_MARKER) for m in stored)
+    assert message_text(stored[-1]) == "Okay"
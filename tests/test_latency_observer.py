@@ -0,0 +1,156 @@
+import asyncio
+
+from pytest import approx
+
+from pipecat.frames.frames import (
+    BotStartedSpeakingFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+    StartInterruptionFrame,
+    TranscriptionFrame,
+    TTSAudioRawFrame,
+    TTSStartedFrame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+)
+
+from latency_observer import TurnLatencyObserver
+from metrics import summarize_turn_latencies
+from sqlite_db import SQLiteVoiceAgentDB
+
+
+def transcription(text):
+    return TranscriptionFrame(text=text, user_id="user", timestamp="")
+
+
+def bot_response(text):
+    return [
+        LLMFullResponseStartFrame(),
+        LLMTextFrame(text),
+        TTSStartedFrame(),
+        TTSAudioRawFrame(audio=b"\x00\x00", sample_rate=24000, num_channels=1),
+        LLMFullResponseEndFrame(),
+        BotStartedSpeakingFrame(),
+    ]
+
+
+async def observe(observer, timeline):
+    """
+    Feed (milliseconds, frame) pairs; each frame is seen at two hops, 5ms apart.
+
+    Times must be non-zero: a frame without a pipeline timestamp is timed by
+    the observer's own clock.
+    """
+    for at_ms, frame in timeline:
+        for hop_ms in (0, 5):
+            await observer.on_push_frame(None, None, frame, None, (at_ms + hop_ms) * 1_000_000)
+
+
+def spaced(start_ms, frames, step_ms=100):
+    return [(start_ms + i * step_ms, frame) for i, frame in enumerate(frames)]
+
+
+def test_user_pause_before_the_answer_stays_one_turn():
+    observer = TurnLatencyObserver("call-1")
+    timeline = [
+        (100, UserStartedSpeakingFrame()),
+        (1000, UserStoppedSpeakingFrame()),
+        (1200, transcription("I was wondering")),
+        (1500, UserStartedSpeakingFrame()),
+        (2500, UserStoppedSpeakingFrame()),
+        (2700, transcription("about the fund")),
+        *spaced(3000, bot_response("Sure.")),
+    ]
+
+    asyncio.run(observe(observer, timeline))
+    asyncio.run(observer.close())
+
+    [turn] = observer.turns
+    # The user-side stages are the last sightings before the LLM started
+    assert turn["vad_end_at"] == approx(2.505)
+    assert turn["transcript_at"] == approx(2.705)
+    # The bot-side stages keep their first sighting
+    assert turn["llm_start_at"] == approx(3.0)
+    assert turn["llm_first_token_at"] == approx(3.1)
+    assert turn["audio_out_at"] == approx(3.5)
+    assert not turn["interrupted"]
+
+
+def test_greeting_without_user_input_is_its_own_turn():
+    observer = TurnLatencyObserver("call-1")
+    timeline = [
+        *spaced(100, bot_response("Hello, is this Asha?")),
+        # A follow-up response with no user input in between
+        *spaced(2000, bot_response("Is this a good time?")),
+        (5000, UserStartedSpeakingFrame()),
+        (6000, UserStoppedSpeakingFrame()),
+        *spaced(6400, bot_response("Great.")),
+    ]
+
+    asyncio.run(observe(observer, timeline))
+    asyncio.run(observer.close())
+
+    assert [turn["turn"] for turn in observer.turns] == [1, 2, 3]
+    greeting, follow_up, answer = observer.turns
+    assert greeting.get("vad_end_at") is None and greeting["llm_start_at"] == approx(0.1)
+    assert follow_up["llm_start_at"] == approx(2.0)
+    assert answer["vad_end_at"] == approx(6.005) and answer["audio_out_at"] == approx(6.9)
+
+
+def test_interruption_marks_the_turn_once_the_bot_is_speaking():
+    observer = TurnLatencyObserver("call-1")
+    timeline = [
+        (100, UserStartedSpeakingFrame()),
+        (800, UserStoppedSpeakingFrame()),
+        # The user talks over the bot before it says anything: not an interruption
+        (850, StartInterruptionFrame()),
+        *spaced(1000, bot_response("Our fund")),
+        (2000, StartInterruptionFrame()),
+        (2000, UserStartedSpeakingFrame()),
+        (3000, UserStoppedSpeakingFrame()),
+    ]
+
+    asyncio.run(observe(observer, timeline))
+    asyncio.run(observer.close())
+
+    first, second = observer.turns
+    assert first["interrupted"]
+    assert not second["interrupted"]
+    assert second["vad_end_at"] == approx(3.005)
+
+
+def test_finished_turns_are_stored(tmp_path):
+    db = SQLiteVoiceAgentDB(tmp_path / "voice_agent.db")
+    call_id = db.create_call("client-1")
+    observer = TurnLatencyObserver(call_id, sqlite_db=db)
+
+    async def run():
+        await observe(observer, [(100, UserStoppedSpeakingFrame()), *spaced(500, bot_response("Hi."))])
+        await observer.close()
+
+    asyncio.run(run())
+
+    [stored] = db.get_call_turn_metrics(call_id)
+    assert stored["vad_end_at"] == approx(0.105)
+    assert stored["audio_out_at"] == approx(1.0)
+
+
+def test_turn_latencies_are_summarized_as_percentiles_per_segment():
+    turns = [
+        {"vad_end_at": 0.0, "transcript_at": 0.2, "llm_start_at": 0.3, "llm_first_token_at": 0.3 + ttfb,
+         "audio_out_at": 1.0 + i / 10, "interrupted": i == 3}
+        for i, ttfb in enumerate([0.1, 0.2, 0.3, 0.4])
+    ]
+    # A greeting has no user stages, so it is left out of the segments that need them
+    turns.append({"llm_start_at": 10.0, "llm_first_token_at": 10.5, "audio_out_at": 11.0, "interrupted": False})
+
+    summary = summarize_turn_latencies(turns)
+
+    assert summary["turns"] == 5
+    assert summary["interrupted_turns"] == 1
+    segments = summary["segments"]
+    assert segments["voice_to_voice"] == {"count": 4, "p50_ms": 1100.0, "p95_ms": 1300.0, "p99_ms": 1300.0}
+    assert segments["transcript_after_vad"]["count"] == 4
+    assert segments["llm_ttfb"] == {"count": 5, "p50_ms": 300.0, "p95_ms": 500.0, "p99_ms": 500.0}
+    assert segments["llm_total"] == {"count": 0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
@@ -0,0 +1,57 @@
+import sqlite3
+
+import sqlite_db
+from sqlite_db import MIGRATIONS, SQLiteConnectionManager, run_migrations
+
+
+def columns(conn, table):
+    return {column[1] for column in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+
+
+def test_fresh_database_gets_every_migration(tmp_path):
+    connections = SQLiteConnectionManager.for_path(tmp_path / "voice_agent.db")
+
+    assert run_migrations(connections) == len(MIGRATIONS)
+
+    conn = connections.connection()
+    versions = [row[0] for row in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+    assert versions == [version for version, _, _ in MIGRATIONS]
+    assert {"summary", "transcript_closed_at"} <= columns(conn, "calls")
+
+
+def test_migrations_run_once_per_database(tmp_path):
+    connections = SQLiteConnectionManager.for_path(tmp_path / "voice_agent.db")
+    run_migrations(connections)
+
+    assert run_migrations(connections) == 0
+    # A new process re-checks the schema but finds nothing left to apply
+    sqlite_db._migrated_paths.discard(connections.db_path)
+    assert run_migrations(connections) == 0
+
+
+def test_legacy_database_is_upgraded_in_place(tmp_path):
+    db_path = tmp_path / "voice_agent.db"
+    legacy = sqlite3.connect(db_path)
+    legacy.execute(
+        "CREATE TABLE clients (id TEXT PRIMARY KEY, first_name TEXT NOT NULL, last_name TEXT NOT NULL, "
+        "phone_number TEXT UNIQUE NOT NULL, email TEXT NOT NULL, city TEXT NOT NULL, "
+        "job_business TEXT NOT NULL, created_at TEXT NOT NULL)"
+    )
+    legacy.execute("CREATE TABLE calls (id TEXT PRIMARY KEY, client_id TEXT NOT NULL, timestamp TEXT NOT NULL, transcript TEXT)")
+    legacy.execute(
+        "INSERT INTO calls VALUES ('call-1', 'client-1', '2025-01-01T10:00:00', "
+        "'[10:00:01] assistant: Hello\n[10:00:03] user: Hi there')"
+    )
+    legacy.commit()
+    legacy.close()
+
+    connections = SQLiteConnectionManager.for_path(db_path)
+    assert run_migrations(connections) == len(MIGRATIONS)
+
+    conn = connections.connection()
+    assert "investor_type" in columns(conn, "clients")
+    assert {"summary", "transcript_closed_at"} <= columns(conn, "calls")
+    # The transcript blob is moved into per-utterance rows
+    assert conn.execute("SELECT transcript FROM calls WHERE id = 'call-1'").fetchone()[0] is None
+    rows = conn.execute("SELECT seq, role, content FROM call_utterances WHERE call_id = 'call-1' ORDER BY seq").fetchall()
+    assert [tuple(row) for row in rows] == [(0, "assistant", "Hello"), (1, "user", "Hi there")]
@@ -0,0 +1,101 @@
+import os
+from pathlib import Path
+
+from prompt_compiler import PromptCompiler
+
+PROMPTS_DIR = Path(__file__).parent.parent / "prompts"
+GREETING = "Hello Asha, I'm Neha from Mosaic Asset Management. Is this a good time?"
+
+
+def baseline_system_prompt(persona, client_name, call_highlight, expert_suggestion, strategy, knowledge_base,
+                           initial_greeting):
+    """How bot.build_system_prompt assembled the prompt before it was compiled from fragments."""
+    prompt_parts = [persona]
+    if client_name:
+        prompt_parts.append(f"\n\n# CLIENT INFORMATION\nClient name: {client_name}")
+    if call_highlight:
+        prompt_parts.append("\n\n# PREVIOUS CALL HIGHLIGHT\n" + call_highlight)
+    if expert_suggestion:
+        prompt_parts.append("\n\n# EXPERT SUGGESTIONS\n" + expert_suggestion)
+    if strategy:
+        prompt_parts.append("\n\n# CONVERSATION STRATEGY\n" + strategy)
+    if knowledge_base:
+        prompt_parts.append("\n\n# KNOWLEDGE BASE\n" + knowledge_base)
+    if initial_greeting:
+        prompt_parts.append(f"\n\n# INITIAL GREETING - MANDATORY\nYou MUST use this EXACT greeting to start the conversation: \"{initial_greeting}\"\nDo not modify or rephrase this greeting in any way. Use it exactly as provided.\nYOUR FIRST RESPONSE MUST START WITH THIS EXACT GREETING.\n\nIMPORTANT FOR RETURNING CLIENTS: Always acknowledge you are calling them again and reference the previous conversation summary if provided.")
+    return "\n".join(prompt_parts)
+
+
+def compile_like_the_bot(compiler, expert_path, client_name, call_highlight, initial_greeting):
+    greeting_text = ""
+    if initial_greeting:
+        greeting_text = f"\n\n# INITIAL GREETING - MANDATORY\nYou MUST use this EXACT greeting to start the conversation: \"{initial_greeting}\"\nDo not modify or rephrase this greeting in any way. Use it exactly as provided.\nYOUR FIRST RESPONSE MUST START WITH THIS EXACT GREETING.\n\nIMPORTANT FOR RETURNING CLIENTS: Always acknowledge you are calling them again and reference the previous conversation summary if provided."
+    return compiler.compile([
+        compiler.file_fragment("persona", PROMPTS_DIR / "bot_persona.txt"),
+        compiler.text_fragment("client_info", f"\n\n# CLIENT INFORMATION\nClient name: {client_name}" if client_name else ""),
+        compiler.text_fragment("call_highlight", "\n\n# PREVIOUS CALL HIGHLIGHT\n" + call_highlight if call_highlight else ""),
+        compiler.file_fragment("expert_suggestions", expert_path, header="\n\n# EXPERT SUGGESTIONS\n", strip=True),
+        compiler.file_fragment("strategy", PROMPTS_DIR / "conversation_strategy.txt", header="\n\n# CONVERSATION STRATEGY\n"),
+        compiler.file_fragment("knowledge_base", PROMPTS_DIR / "bot_knowledge.txt", header="\n\n# KNOWLEDGE BASE\n"),
+        compiler.text_fragment("greeting", greeting_text),
+    ])
+
+
+def test_compiled_prompt_matches_the_baseline_assembly(tmp_path):
+    expert_path = tmp_path / "client-1_exp_opinion.txt"
+    expert_path.write_text("\nLead with the fund's downside protection.\n")
+    compiler = PromptCompiler()
+
+    for client_name, call_highlight, expert, greeting in [
+        ("Asha", "Asked about lock-in periods.", expert_path, GREETING),
+        (None, "", tmp_path / "missing.txt", None),
+    ]:
+        compiled = compile_like_the_bot(compiler, expert, client_name, call_highlight, greeting)
+        expected = baseline_system_prompt(
+            (PROMPTS_DIR / "bot_persona.txt").read_text(),
+            client_name,
+            call_highlight,
+            expert.read_text().strip() if expert.exists() else "",
+            (PROMPTS_DIR / "conversation_strategy.txt").read_text(),
+            (PROMPTS_DIR / "bot_knowledge.txt").read_text(),
+            greeting,
+        )
+        assert compiled.text == expected
+
+
+def test_prefix_and_suffix_join_to_the_full_prompt(tmp_path):
+    compiler = PromptCompiler()
+    compiled = compiler.compile(
+        [compiler.file_fragment("persona", PROMPTS_DIR / "bot_persona.txt"), compiler.text_fragment("empty", "")],
+        [compiler.text_fragment("client_info", "Client name: Asha"), None],
+    )
+
+    assert compiled.text == compiled.prefix_text + "\n" + compiled.suffix_text
+    assert list(compiled.section_tokens) == ["persona", "client_info"]
+    assert compiled.prefix_tokens < compiled.total_tokens
+
+
+def test_file_fragment_is_reread_only_when_the_file_changes(tmp_path):
+    path = tmp_path / "persona.txt"
+    path.write_text("You are Neha.")
+    compiler = PromptCompiler()
+    first = compiler.file_fragment("persona", path)
+    first_mtime_ns = os.stat(path).st_mtime_ns
+
+    assert compiler.file_fragment("persona", path) is first
+
+    # Same size, newer mtime
+    path.write_text("You are Ravi.")
+    os.utime(path, ns=(first_mtime_ns, first_mtime_ns + 1_000_000))
+    edited = compiler.file_fragment("persona", path)
+    assert edited.text == "You are Ravi."
+    assert edited.digest != first.digest
+
+    # Same mtime, different size
+    mtime_ns = os.stat(path).st_mtime_ns
+    path.write_text("You are Ravi, a relationship manager.")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+    assert compiler.file_fragment("persona", path).text == "You are Ravi, a relationship manager."
+
+    path.unlink()
+    assert compiler.file_fragment("persona", path) is None
@@ -0,0 +1,110 @@
+import time
+import asyncio
+from contextlib import asynccontextmanager
+
+import aiohttp
+import uvicorn
+from pipecat.transports.services.helpers.daily_rest import DailyRESTHelper
+
+import fake_daily_api
+from room_pool import DailyRoomPool
+
+
+@asynccontextmanager
+async def daily_api():
+    """Serve the fake Daily API on a free local port and yield a DailyRESTHelper for it."""
+    fake_daily_api.reset()
+    server = uvicorn.Server(uvicorn.Config(fake_daily_api.app, host="127.0.0.1", port=0, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        async with aiohttp.ClientSession() as session:
+            yield DailyRESTHelper(daily_api_key="fake", daily_api_url=f"http://127.0.0.1:{port}",
+                                  aiohttp_session=session)
+    finally:
+        server.should_exit = True
+        await task
+
+
+def run_with_pool(scenario, size=2):
+    async def run():
+        async with daily_api() as helper:
+            pool = DailyRoomPool(size=size, ttl=3600, min_remaining=600)
+            pool._helper = helper
+            return pool, await scenario(pool)
+
+    return asyncio.run(run())
+
+
+def test_acquire_hands_out_a_ready_room():
+    async def scenario(pool):
+        await pool._refill()
+        assert pool.stats()["idle"] == 2
+        return await pool.acquire()
+
+    pool, room = run_with_pool(scenario)
+
+    assert fake_daily_api.tokens[room.token]["is_owner"] is False
+    assert fake_daily_api.tokens[room.bot_token]["is_owner"] is True
+    assert fake_daily_api.tokens[room.token]["room_name"] == room.name
+    stats = pool.stats()
+    assert (stats["idle"], stats["issued"], stats["served_from_pool"]) == (1, 1, 1)
+
+
+def test_empty_pool_creates_a_room_on_demand():
+    async def scenario(pool):
+        return await pool.acquire()
+
+    pool, room = run_with_pool(scenario, size=0)
+
+    assert room.name in fake_daily_api.rooms
+    assert fake_daily_api.rooms[room.name]["url"] == room.url
+    assert pool.stats()["created_on_demand"] == 1
+
+
+def test_released_rooms_are_deleted_and_the_pool_refilled():
+    async def scenario(pool):
+        await pool._refill()
+        room = await pool.acquire()
+        pool.release(room.url)
+        await pool._recycle()
+        await pool._refill()
+        return room
+
+    pool, room = run_with_pool(scenario, size=1)
+
+    assert room.name not in fake_daily_api.rooms
+    assert len(fake_daily_api.rooms) == 1
+    stats = pool.stats()
+    assert (stats["idle"], stats["issued"], stats["deleted_total"]) == (1, 0, 1)
+
+
+def test_failed_room_creation_is_reported():
+    async def scenario(pool):
+        fake_daily_api.failures["create_room"] = 1
+        await pool._refill()
+
+    pool, _ = run_with_pool(scenario)
+
+    stats = pool.stats()
+    assert stats["idle"] == 1
+    assert "503" in stats["last_error"]
+
+
+def test_stale_rooms_skipped_by_acquire_are_deleted():
+    async def scenario(pool):
+        await pool._refill()
+        stale = pool._idle[0]
+        stale.expires_at = time.time() + 60
+        room = await pool.acquire()
+        await pool._recycle()
+        return stale, room
+
+    pool, (stale, room) = run_with_pool(scenario)
+
+    assert room is not stale
+    assert stale.name not in fake_daily_api.rooms
+    assert list(pool._issued) == [room.url]
+    assert pool.stats()["deleted_total"] == 1
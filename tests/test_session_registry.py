@@ -0,0 +1,46 @@
+from session_registry import SessionRegistry
+
+
+def start_call(session, call_id):
+    session.call_id = call_id
+    session.bot_pid = 4242
+    session.room_url = f"https://example.daily.co/{call_id}"
+
+
+def test_idle_sessions_expire():
+    registry = SessionRegistry(ttl=60)
+    session = registry.create("client-1")
+    session.last_seen -= 61
+
+    assert registry.get(session.token) is None
+    assert len(registry) == 0
+
+
+def test_sessions_on_a_call_outlive_the_ttl():
+    registry = SessionRegistry(ttl=60)
+    on_call = registry.create("client-1")
+    start_call(on_call, "call-1")
+    idle = registry.create("client-2")
+    for session in (on_call, idle):
+        # No HTTP request from either client for the length of a long call
+        session.last_seen -= 3600
+
+    assert registry.sweep() == 1
+    assert registry.get(on_call.token) is on_call
+    assert registry.get(idle.token) is None
+
+
+def test_ended_call_restarts_the_ttl_and_keeps_the_call_for_analyze():
+    registry = SessionRegistry(ttl=60)
+    session = registry.create("client-1")
+    start_call(session, "call-1")
+    session.last_seen -= 3600
+
+    assert registry.call_ended("call-1") is session
+    assert registry.call_ended("unknown-call") is None
+    assert not session.on_call
+    assert session.call_id == "call-1"
+    assert registry.sweep() == 0
+
+    session.last_seen -= 61
+    assert registry.sweep() == 1
@@ -0,0 +1,113 @@
+import asyncio
+
+from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContext
+from pipecat.services.google.llm import GoogleLLMContext, GoogleLLMService
+
+from knowledge_index import BM25Index
+from knowledge_retriever import KnowledgeRetriever
+from speculative_llm import SpeculativeLLM, latest_user_text, utterance_similarity
+
+SYSTEM_PROMPT = "You are Neha, a sales agent for Mosaic Asset Management."
+CHUNKS = ["The private credit fund targets a net IRR of 12 to 14 percent over a five year term."]
+QUESTION = "What returns does the private credit fund target?"
+
+
+class FakeResponse:
+    def __init__(self, texts):
+        self._texts = texts
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for text in self._texts:
+            yield type("Chunk", (), {"parts": [type("Part", (), {"text": text})()]})()
+
+
+class FakeModel:
+    def __init__(self):
+        self.requests = []
+
+    async def generate_content_async(self, contents, **kwargs):
+        self.requests.append((contents, kwargs))
+        return FakeResponse(["About 12 ", "to 14 percent."])
+
+
+def make_google_llm():
+    llm = GoogleLLMService(
+        api_key="test",
+        model="gemini-2.0-flash",
+        system_instruction=SYSTEM_PROMPT,
+        params=GoogleLLMService.InputParams(temperature=0.4, max_tokens=256),
+    )
+    llm._client = FakeModel()
+    return llm
+
+
+def make_context():
+    context = GoogleLLMContext.upgrade_to_google(OpenAILLMContext([
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": "Begin the conversation."},
+    ]))
+    context.add_messages([{"role": "assistant", "content": "Hello, is this a good time?"}])
+    return context
+
+
+def test_latest_user_text_skips_injected_messages():
+    context = make_context()
+    context.add_messages([{"role": "user", "content": QUESTION}])
+    KnowledgeRetriever(BM25Index(CHUNKS), min_score=0.1).inject(context)
+    # What GoogleLLMContext.set_messages leaves behind
+    context.add_messages([{"role": "user", "content": SYSTEM_PROMPT}])
+
+    assert latest_user_text(context) == QUESTION
+
+    context.add_messages([{"role": "assistant", "content": "Let me check."}])
+    assert latest_user_text(context) == ""
+
+
+def test_speculation_is_claimed_on_a_google_context_with_excerpts():
+    async def run():
+        llm = make_google_llm()
+        context = make_context()
+        retriever = KnowledgeRetriever(BM25Index(CHUNKS), min_score=0.1)
+        speculative = SpeculativeLLM(llm, context, context_hooks=[retriever.inject], min_words=1)
+
+        speculative.on_final(QUESTION)
+        await speculative._speculation.task
+
+        context.add_messages([{"role": "user", "content": QUESTION}])
+        retriever.inject(context)
+        speculation = speculative.claim(context)
+        assert speculation is not None
+        assert "".join(speculation.chunks) == "About 12 to 14 percent."
+        assert speculative.misses == 0
+
+        contents, kwargs = llm._client.requests[0]
+        # Same generation settings as the service's own requests
+        assert kwargs["generation_config"].temperature == 0.4
+        assert kwargs["generation_config"].max_output_tokens == 256
+        # The speculated utterance is last, with no copy of the system prompt
+        assert contents[-1].parts[0].text == QUESTION
+        assert not any(part.text == SYSTEM_PROMPT for content in contents for part in content.parts)
+
+    asyncio.run(run())
+
+
+def test_mismatched_speculation_is_a_miss():
+    async def run():
+        context = make_context()
+        speculative = SpeculativeLLM(make_google_llm(), context, min_words=1)
+        speculative.on_final("What is the minimum investment?")
+        await speculative._speculation.task
+
+        context.add_messages([{"role": "user", "content": QUESTION}])
+        assert speculative.claim(context) is None
+        assert speculative.misses == 1
+
+    asyncio.run(run())
+
+
+def test_utterance_similarity_ignores_case_and_punctuation():
+    assert utterance_similarity("What returns, exactly?", "what returns exactly") == 1.0
+    assert utterance_similarity("buy the fund", "sell the house") < 0.5
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from stage_graph import StageGraph
+
+
+def test_stages_get_their_dependencies_results_in_declared_order():
+    graph = StageGraph()
+    order = []
+
+    def stage(name, result):
+        async def run(*args):
+            order.append((name, args))
+            return result
+        return run
+
+    # Declared before the stages it depends on
+    graph.add("report", stage("report", "done"), "summary", "tags")
+    graph.add("summary", stage("summary", "Interested"), "transcript")
+    graph.add("tags", stage("tags", ["hni"]), "transcript")
+    graph.add("transcript", stage("transcript", "user: yes"))
+
+    results = asyncio.run(graph.run())
+
+    assert results == {"report": "done", "summary": "Interested", "tags": ["hni"], "transcript": "user: yes"}
+    assert order[0] == ("transcript", ())
+    assert order[-1] == ("report", ("Interested", ["hni"]))
+    assert set(graph.timings) == set(results)
+
+
+def test_independent_stages_run_concurrently():
+    graph = StageGraph()
+    running = 0
+    peak = 0
+
+    async def fetch():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+
+    for name in ("previous_data", "previous_suggestion", "highlight"):
+        graph.add(name, fetch)
+
+    asyncio.run(graph.run())
+
+    assert peak == 3
+    # Each stage's timing covers only its own work
+    assert all(0.04 < elapsed < 0.5 for elapsed in graph.timings.values())
+
+
+def test_failing_stage_stops_its_dependents_and_cancels_the_rest():
+    graph = StageGraph()
+    ran = []
+    cancelled = asyncio.Event()
+
+    async def highlight():
+        raise RuntimeError("model unavailable")
+
+    async def write_highlight(highlight):
+        ran.append("write_highlight")
+
+    async def slow_fetch():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    graph.add("highlight", highlight)
+    graph.add("write_highlight", write_highlight, "highlight")
+    graph.add("previous_data", slow_fetch)
+
+    async def run():
+        with pytest.raises(RuntimeError, match="model unavailable"):
+            await graph.run()
+        await asyncio.sleep(0)
+        return cancelled.is_set()
+
+    assert asyncio.run(run())
+    assert ran == []
+
+
+def test_unknown_dependency_is_rejected_before_anything_runs():
+    graph = StageGraph()
+    ran = []
+
+    async def stage(*args):
+        ran.append(args)
+
+    graph.add("fetch", stage)
+    graph.add("analysis", stage, "fetch", "missing")
+
+    with pytest.raises(ValueError, match="missing"):
+        asyncio.run(graph.run())
+    assert ran == []
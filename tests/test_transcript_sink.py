@@ -0,0 +1,108 @@
+import json
+import asyncio
+
+from sqlite_db import SQLiteVoiceAgentDB, parse_transcript_text
+from transcript_sink import TranscriptSink
+
+
+def test_close_flushes_every_format(tmp_path):
+    db = SQLiteVoiceAgentDB(tmp_path / "voice_agent.db")
+    call_id = db.create_call("client-1")
+    sink = TranscriptSink(call_id, tmp_path / "logs", sqlite_db=db, flush_bytes=10_000, flush_interval=60)
+
+    async def record():
+        await sink.open()
+        await sink.write("assistant", "Hello, am I speaking with Asha?", "10:00:01")
+        await sink.write("user", "Yes, speaking", "10:00:04")
+        await sink.write("assistant", "I wanted to tell you about", "10:00:06", interrupted=True)
+        # Nothing reaches disk below the flush threshold
+        assert sink.text_path.read_text() == ""
+        await sink.close()
+
+    asyncio.run(record())
+
+    utterances = parse_transcript_text(sink.text_path.read_text())
+    assert [u["role"] for u in utterances] == ["assistant", "user", "assistant"]
+    assert utterances[2] == {"role": "assistant", "ts": "10:00:06", "content": "I wanted to tell you about", "interrupted": True}
+
+    lines = [json.loads(line) for line in sink.jsonl_path.read_text().splitlines()]
+    assert lines == utterances
+
+    stored = db.get_call_transcript(call_id)
+    assert [(u["role"], u["content"], bool(u["interrupted"])) for u in stored] == [
+        (u["role"], u["content"], u["interrupted"]) for u in utterances
+    ]
+
+
+def test_buffer_is_flushed_once_it_reaches_the_threshold(tmp_path):
+    sink = TranscriptSink("call-1", tmp_path, flush_bytes=20, flush_interval=60)
+
+    async def record():
+        await sink.open()
+        await sink.write("user", "short")
+        assert sink.text_path.read_text() == ""
+        await sink.write("assistant", "long enough to flush")
+        assert sink.text_path.read_text() == "user: short\nassistant: long enough to flush\n"
+        await sink.close()
+        await sink.write("user", "after close")
+
+    asyncio.run(record())
+
+    assert "after close" not in sink.text_path.read_text()
+
+
+class FlakyDB:
+    """Utterance store whose first ``failures`` writes raise."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.stored = []
+
+    def add_call_utterances(self, call_id, utterances):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database is locked")
+        self.stored.extend(u["content"] for u in utterances)
+
+
+def test_failed_sqlite_write_is_retried_without_duplicating_file_lines(tmp_path):
+    db = FlakyDB(failures=1)
+    sink = TranscriptSink("call-1", tmp_path, sqlite_db=db, flush_bytes=10_000, flush_interval=60)
+
+    async def record():
+        await sink.open()
+        await sink.write("user", "first")
+        await sink.flush()
+        assert db.stored == []
+        await sink.write("assistant", "second")
+        await sink.flush()
+        await sink.close()
+
+    asyncio.run(record())
+
+    assert db.stored == ["first", "second"]
+    assert sink.text_path.read_text() == "user: first\nassistant: second\n"
+
+
+def test_failed_file_write_is_put_back_and_written_on_close(tmp_path):
+    sink = TranscriptSink("call-1", tmp_path, flush_bytes=10_000, flush_interval=60)
+    write_batch = sink._write_batch
+    failures = [RuntimeError("disk full")]
+
+    def flaky_write_batch(batch):
+        if failures:
+            raise failures.pop()
+        write_batch(batch)
+
+    sink._write_batch = flaky_write_batch
+
+    async def record():
+        await sink.open()
+        await sink.write("user", "first")
+        await sink.flush()
+        await sink.write("assistant", "second")
+        await sink.close()
+
+    asyncio.run(record())
+
+    assert sink.text_path.read_text() == "user: first\nassistant: second\n"
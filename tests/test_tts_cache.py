@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+import cached_cartesia_tts
+import tts_cache
+from cached_cartesia_tts import CachedCartesiaTTSService
+from tts_cache import TTSAudioCache, default_cache_key, tts_cache_key
+
+SETTINGS = dict(voice_id="voice", model="sonic-2", speed=-0.3, emotion=["positivity"],
+                output_format={"container": "raw", "encoding": "pcm_s16le", "sample_rate": 24000})
+
+
+def test_cache_key_depends_on_the_text_and_every_voice_setting():
+    key = tts_cache_key("Is this a good time?", **SETTINGS)
+
+    assert tts_cache_key("  Is this a good time?\n", **SETTINGS) == key
+    assert tts_cache_key("Is this a good time?", **{**SETTINGS, "emotion": ("positivity",)}) == key
+    assert tts_cache_key("Is now a good time?", **SETTINGS) != key
+    for name, value in [("voice_id", "other"), ("model", "sonic"), ("speed", 0), ("emotion", []),
+                        ("output_format", {**SETTINGS["output_format"], "sample_rate": 16000})]:
+        assert tts_cache_key("Is this a good time?", **{**SETTINGS, name: value}) != key
+    assert tts_cache_key("Is this a good time?", **SETTINGS, language="hi") != key
+    assert default_cache_key("Hello") == default_cache_key("Hello")
+
+
+def test_least_recently_used_entries_are_evicted_by_size(tmp_path):
+    cache = TTSAudioCache(tmp_path, max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"
+
+    cache.put("c", b"cccc")
+
+    assert cache.get("b") is None
+    assert not (tmp_path / "b.pcm").exists()
+    assert cache.get("a") == b"aaaa" and cache.get("c") == b"cccc"
+    assert cache.stats()["bytes"] == 8
+    # Audio larger than the whole cache is not stored
+    cache.put("d", b"d" * 11)
+    assert not cache.contains("d")
+
+
+def test_entries_written_by_another_process_are_loaded(tmp_path):
+    TTSAudioCache(tmp_path, max_bytes=100).put("a", b"aaaa")
+
+    cache = TTSAudioCache(tmp_path, max_bytes=100)
+
+    assert cache.stats()["bytes"] == 4
+    assert cache.get("a") == b"aaaa"
+
+
+def test_put_replaces_an_entry_atomically(tmp_path, monkeypatch):
+    cache = TTSAudioCache(tmp_path, max_bytes=100)
+    cache.put("a", b"old")
+    assert [path.name for path in tmp_path.iterdir()] == ["a.pcm"]
+
+    def crash(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(tts_cache.os, "replace", crash)
+    with pytest.raises(OSError):
+        cache.put("a", b"new audio")
+
+    # Readers never see a partly written file
+    assert cache.get("a") == b"old"
+
+
+def test_recurring_sentence_is_promoted_once(tmp_path, monkeypatch):
+    cache = TTSAudioCache(tmp_path)
+    service = CachedCartesiaTTSService(audio_cache=cache, promote_after=2, api_key="test", voice_id="voice")
+    tasks = []
+    service.create_task = tasks.append
+    synthesized = []
+
+    async def synthesize(text, api_key, **kwargs):
+        synthesized.append(text)
+        return b"audio"
+
+    monkeypatch.setattr(cached_cartesia_tts, "synthesize_cartesia", synthesize)
+    text = "Our minimum investment is one crore."
+
+    service._note_miss(text)
+    assert tasks == []
+    service._note_miss(text)
+    service._note_miss(text)
+    assert len(tasks) == 1
+
+    asyncio.run(tasks[0])
+
+    assert synthesized == [text]
+    assert cache.get(service.cache_key(text)) == b"audio"